@@ -23,6 +23,7 @@ from rich import box as rich_box
 from rich.console import Console
 from rich.live import Live
 from rich.markdown import Markdown
+from rich.markup import escape
 from rich.panel import Panel
 from rich.rule import Rule
 from rich.text import Text
@@ -38,7 +39,17 @@ from .lc_graph import (
     get_checkpointer,
 )
 from .lc_models import build_model
-from .lc_tools import ALL_TOOLS, DANGEROUS_TOOL_NAMES
+from .prompt_cache import SystemPrompt, cache_token_usage
+from ..utils import background
+from ..utils.diff_display import render_stored_diff
+from .lc_tools import (
+    ALL_TOOLS,
+    DANGEROUS_TOOL_NAMES,
+    _event_queue,
+    _output_listener,
+    _plan_tls,
+    _session_key,
+)
 
 _rc = Console()
 
@@ -72,21 +83,49 @@ def _resolve_provider_model(
     return provider, api_key, model
 
 
-def _build_system_prompt() -> str:
-    """Inject live context (cwd, git) into the base system prompt."""
-    from ..utils.shell import get_git_info, get_working_directory  # noqa: PLC0415
+def _build_system_prompt() -> SystemPrompt:
+    """Inject live context (cwd, git, repository map) into the base system prompt.
+
+    The parts are ordered from most to least stable so provider prompt
+    caches keep matching when only the cwd or git status changes.
+    """
+    from ..utils.git_context import get_git_context  # noqa: PLC0415
+    from ..utils.repo_map import get_repo_map  # noqa: PLC0415
+    from ..utils.shell import get_working_directory  # noqa: PLC0415
+    from ..utils.walker import find_project_root  # noqa: PLC0415
 
     cwd = get_working_directory()
-    git = get_git_info()
+    # Cached and refreshed in the background; never hold up the first token.
+    git = get_git_context(cwd, wait=0.25).replace("\n", "; ")
+
+    stable = SYSTEM_PROMPT + (
+        "\n## Working directory\n"
+        "- Use `cd_tool` BEFORE starting work to navigate to the correct project folder\n"
+        "- NEVER create project files in the Commandor tool directory — always `cd_tool` into a dedicated project directory first\n"
+    )
+
+    cfg = get_config()
+    budget = cfg.config.agent.repo_map_tokens if cfg.config else 1500
+    try:
+        # Built in the background as well; the first prompt may go without it.
+        repo_map = get_repo_map(cwd, max_tokens=budget, wait=0.25)
+    except Exception:
+        repo_map = ""
+    project = ""
+    if repo_map:
+        project = (
+            f"\n## Repository map (`{find_project_root(cwd)}`)\n"
+            f"Files with sizes and top-level definitions — use it instead of exploring "
+            f"with list_directory_tool/glob_tool:\n"
+            f"```\n{repo_map}\n```\n"
+        )
 
-    context_block = (
+    volatile = (
         f"\n## Current context\n"
         f"- **Working directory: `{cwd}`**  ← THIS is where all file operations happen by default\n"
-        f"- Use `cd_tool` BEFORE starting work to navigate to the correct project folder\n"
-        f"- NEVER create project files in the Commandor tool directory — always `cd_tool` into a dedicated project directory first\n"
         f"- Git: {git}\n"
     )
-    return SYSTEM_PROMPT + context_block
+    return SystemPrompt(stable, project, volatile)
 
 
 def _extract_final_answer(state: dict) -> str:
@@ -165,6 +204,49 @@ def _approx_tokens(messages: list) -> int:
     return len(get_buffer_string(messages)) // 4
 
 
+def _record_command_usage(metrics: dict | None, usage: dict) -> None:
+    """Add one command's ``command_usage`` payload to the run metrics.
+
+    Keeps the per-command records under ``commands`` plus running totals:
+    ``command_wall`` and ``command_cpu`` (seconds) and ``command_peak_rss_kb``.
+    """
+    if metrics is None:
+        return
+    metrics.setdefault("commands", []).append(usage)
+    metrics["command_wall"] = metrics.get("command_wall", 0.0) + usage["duration"]
+    if usage.get("cpu") is not None:
+        metrics["command_cpu"] = metrics.get("command_cpu", 0.0) + usage["cpu"]
+    if usage.get("max_rss_kb") is not None:
+        metrics["command_peak_rss_kb"] = max(
+            metrics.get("command_peak_rss_kb", 0), usage["max_rss_kb"]
+        )
+
+
+def _record_cache_usage(metrics: dict | None, usage: dict) -> None:
+    """Sum a chunk's prompt-cache reads/writes into ``cache_read_tokens`` /
+    ``cache_write_tokens`` (chunk usage is additive across a response)."""
+    if metrics is None:
+        return
+    read, write = cache_token_usage(usage)
+    if read:
+        metrics["cache_read_tokens"] = metrics.get("cache_read_tokens", 0) + read
+    if write:
+        metrics["cache_write_tokens"] = metrics.get("cache_write_tokens", 0) + write
+
+
+def _command_usage_summary(metrics: dict) -> str:
+    """``3 cmds 12.4s · cpu 9.8s · peak 512 MB``, or "" if no command ran."""
+    commands = metrics.get("commands")
+    if not commands:
+        return ""
+    parts = [f"{len(commands)} cmd{'s' if len(commands) != 1 else ''} {metrics['command_wall']:.1f}s"]
+    if "command_cpu" in metrics:
+        parts.append(f"cpu {metrics['command_cpu']:.1f}s")
+    if "command_peak_rss_kb" in metrics:
+        parts.append(f"peak {metrics['command_peak_rss_kb'] / 1024:,.0f} MB")
+    return " · ".join(parts)
+
+
 def _make_summarize_hook(llm, metrics: dict | None = None):
     """Return a pre_model_hook that compresses history when context grows large.
 
@@ -264,10 +346,19 @@ def _print_run_footer(metrics: dict, elapsed: float) -> None:
     if ctx:
         parts.append(f"[dim]~{ctx:,} tok[/dim]")
 
+    c_read = metrics.get("cache_read_tokens", 0)
+    c_write = metrics.get("cache_write_tokens", 0)
+    if c_read or c_write:
+        parts.append(f"[dim]cache read {c_read:,} · write {c_write:,}[/dim]")
+
     cond = metrics.get("condensations", 0)
     if cond:
         parts.append(f"[dim]condensed {cond}×[/dim]")
 
+    cmds = _command_usage_summary(metrics)
+    if cmds:
+        parts.append(f"[dim]{cmds}[/dim]")
+
     parts.append(f"[dim]{elapsed:.1f}s[/dim]")
     title = "  [dim]·[/dim]  ".join(parts)
     _rc.print()
@@ -348,6 +439,53 @@ def _stream_graph(
             padding=(0, 2),
         )
 
+    # Tools push file-diff (and plan) events here instead of printing from
+    # their own threads; diffs are rendered below the tool call that made them.
+    tool_events: list = []
+    queue_token = _event_queue.set(tool_events)
+    _plan_tls.queue = tool_events
+
+    # A running command's latest output line is shown in a transient
+    # spinner; it is updated from the command's reader threads.
+    command_status = None
+
+    def _on_command_output(command: str, stream: str, text: str) -> None:
+        nonlocal command_status
+        lines = [ln for ln in text.splitlines() if ln.strip()]
+        if not lines:
+            return
+        msg = f"[dim]  {escape(lines[-1][:100])}[/dim]"
+        if command_status is None:
+            command_status = _rc.status(msg, spinner="dots", spinner_style="cyan")
+            try:
+                command_status.start()
+            except Exception:  # another live display is active
+                command_status = None
+        else:
+            command_status.update(msg)
+
+    def _stop_command_status() -> None:
+        nonlocal command_status
+        if command_status is not None:
+            command_status.stop()
+            command_status = None
+
+    listener_token = _output_listener.set(None if silent else _on_command_output)
+    # Commands share one shell per conversation when agent.persistent_shell is on.
+    session_token = _session_key.set(
+        ((config or {}).get("configurable") or {}).get("thread_id")
+    )
+
+    def _flush_tool_events() -> None:
+        while tool_events:
+            kind, payload = tool_events.pop(0)
+            if kind == "file_diff":
+                panel = render_stored_diff(*payload)
+                if panel is not None:
+                    _rc.print(panel)
+            elif kind == "command_usage":
+                _record_command_usage(metrics, payload)
+
     try:
         for chunk, _meta in graph.stream(input_data, config, stream_mode="messages"):
 
@@ -355,7 +493,9 @@ def _stream_graph(
             # Tool output (ToolMessage) — printed below its matching tool call
             # ----------------------------------------------------------------
             if isinstance(chunk, ToolMessage):
+                _stop_command_status()
                 _stop_live_response()
+                _flush_tool_events()
                 call_id = getattr(chunk, "tool_call_id", "") or ""
                 tool_name = seen_call_ids.get(call_id, "tool")
                 content = chunk.content or ""
@@ -395,6 +535,7 @@ def _stream_graph(
             usage = getattr(chunk, "usage_metadata", None)
             if usage:
                 last_usage = usage
+                _record_cache_usage(metrics, usage)
 
             # -- Detect & stream thinking blocks (Gemini / Anthropic extended thinking) --
             if isinstance(chunk.content, list):
@@ -469,6 +610,12 @@ def _stream_graph(
         _stop_live_thinking()
         _stop_live_response()
         _stop_spinner()
+        _stop_command_status()
+        _flush_tool_events()
+        _plan_tls.queue = None
+        _event_queue.reset(queue_token)
+        _output_listener.reset(listener_token)
+        _session_key.reset(session_token)
 
     if not silent:
         # Finalized thinking panel with Markdown rendering
@@ -534,7 +681,7 @@ def _stream_graph(
 # ---------------------------------------------------------------------------
 
 def _run_agent(
-    llm, task: str, system_prompt: str, config: dict,
+    llm, task: str, system_prompt: SystemPrompt, config: dict,
     verbose: bool, metrics: dict, session_name: Optional[str] = None,
 ) -> AgentResult:
     """Fully autonomous agent run (streaming)."""
@@ -557,7 +704,7 @@ def _run_agent(
 
 
 def _run_chat(
-    llm, task: str, system_prompt: str, config: dict,
+    llm, task: str, system_prompt: SystemPrompt, config: dict,
     verbose: bool, metrics: dict, session_name: Optional[str] = None,
 ) -> AgentResult:
     """Chat-only (no tools) run (streaming)."""
@@ -579,7 +726,7 @@ def _run_chat(
 
 
 def _run_assist(
-    llm, task: str, system_prompt: str, config: dict,
+    llm, task: str, system_prompt: SystemPrompt, config: dict,
     verbose: bool, metrics: dict, session_name: Optional[str] = None,
 ) -> AgentResult:
     """Human-in-the-loop assist run (streaming)."""
@@ -662,7 +809,7 @@ def _run_assist(
 
 
 def _run_plan(
-    llm, task: str, system_prompt: str, config: dict,
+    llm, task: str, system_prompt: SystemPrompt, config: dict,
     verbose: bool, metrics: dict, resolved_tid: str | None = None,
     session_name: Optional[str] = None,
 ) -> AgentResult:
@@ -673,7 +820,7 @@ def _run_plan(
 
     Phase 2 — Execution: agent graph with approved plan injected into system prompt.
     """
-    planning_prompt = system_prompt + PLANNING_SUFFIX
+    planning_prompt = system_prompt.with_suffix(PLANNING_SUFFIX)
 
     def _generate_plan(prompt_text: str, extra_context: str = "") -> str:
         """Run one planning pass. silent=True prevents the duplicate panel."""
@@ -756,9 +903,8 @@ def _run_plan(
     # ------------------------------------------------------------------ #
     # Phase 2: execution                                                  #
     # ------------------------------------------------------------------ #
-    execution_prompt = (
-        system_prompt
-        + "\n\n## Approved Plan\n"
+    execution_prompt = system_prompt.with_suffix(
+        "\n\n## Approved Plan\n"
         "Follow this plan step by step to complete the task:\n\n"
         + plan_text
         + "\n"
@@ -886,6 +1032,10 @@ def run_agent(
             final_answer=f"Error: {e}",
             steps=[],
         )
+    finally:
+        # The CLI runs one task at a time: whatever is still running in the
+        # background belongs to this run.
+        background.cleanup()
 
 
 # Alias kept for backward compatibility
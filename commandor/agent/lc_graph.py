@@ -12,6 +12,9 @@ terminal restarts (stored at ~/.commandor/checkpoints.db).
 Constants:
   - SYSTEM_PROMPT   → base system prompt for all modes
   - PLANNING_SUFFIX → appended for plan-mode Phase 1 (planning only, no tools)
+
+Graphs accept the system prompt as a plain string or as a prompt_cache.SystemPrompt,
+which is laid out for provider prompt caching (see prompt_cache.prepare).
 """
 
 import sqlite3
@@ -22,6 +25,8 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.tools import BaseTool
 from langgraph.graph.state import CompiledStateGraph
 
+from .prompt_cache import SystemPrompt, prepare
+
 with warnings.catch_warnings():
     warnings.simplefilter("ignore")
     from langgraph.prebuilt import create_react_agent
@@ -79,11 +84,18 @@ codebases, and manage files — efficiently and correctly. ALWAYS complete the t
 5. **Report** — summarise what you did, what changed, and any caveats.
 
 ## File editing rules
-- Always read a file before editing it.
+- Always read a file before editing it. Read related files together with `read_many_files_tool`.
 - Use `edit_file_tool` for surgical replacements; use `write_file_tool` only when creating a new file
   or when the entire content needs to be replaced.
+- When changing several places in one file, batch them into a single `multi_edit_file_tool` call.
 - Never leave partial/broken code in a file.
 - Preserve the existing code style, indentation, and formatting conventions.
+- Run independent checks (lint, type-check, tests) together with `run_commands_tool`
+  rather than one `run_command_tool` call each.
+- Start servers and watchers with `start_background_tool` and wait for them with
+  `wait_for_output_tool`; never run them with `run_command_tool`.
+- Large tool results are cut to their head and tail. If the part you need was omitted,
+  narrow the command or read range, or page through the full output with `read_spill_tool`.
 
 ## Code quality
 - Write clean, idiomatic code for the language in use.
@@ -160,7 +172,7 @@ One or two sentences describing the overall approach and any key assumptions.
 def build_agent_graph(
     llm: BaseChatModel,
     tools: list[BaseTool],
-    system_prompt: str | None = None,
+    system_prompt: str | SystemPrompt | None = None,
     pre_model_hook=None,
 ) -> CompiledStateGraph:
     """Build a fully autonomous agent graph.
@@ -172,12 +184,13 @@ def build_agent_graph(
         pre_model_hook: Optional ``RunnableLike`` called before every LLM
             invocation (e.g. a context-summarization hook).
     """
+    llm, prompt = prepare(llm, system_prompt or SystemPrompt(SYSTEM_PROMPT), tools=bool(tools))
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
         return create_react_agent(
             llm,
             tools=tools,
-            prompt=system_prompt or SYSTEM_PROMPT,
+            prompt=prompt,
             checkpointer=_checkpointer,
             pre_model_hook=pre_model_hook,
         )
@@ -185,18 +198,19 @@ def build_agent_graph(
 
 def build_chat_graph(
     llm: BaseChatModel,
-    system_prompt: str | None = None,
+    system_prompt: str | SystemPrompt | None = None,
 ) -> CompiledStateGraph:
     """Build a chat-only graph with no tools.
 
     Used for questions, explanations, and general conversation.
     """
+    llm, prompt = prepare(llm, system_prompt or SystemPrompt(SYSTEM_PROMPT), tools=False)
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
         return create_react_agent(
             llm,
             tools=[],
-            prompt=system_prompt or SYSTEM_PROMPT,
+            prompt=prompt,
             checkpointer=_checkpointer,
         )
 
@@ -204,7 +218,7 @@ def build_chat_graph(
 def build_assist_graph(
     llm: BaseChatModel,
     tools: list[BaseTool],
-    system_prompt: str | None = None,
+    system_prompt: str | SystemPrompt | None = None,
     pre_model_hook=None,
 ) -> CompiledStateGraph:
     """Build a human-in-the-loop assist graph.
@@ -216,12 +230,13 @@ def build_assist_graph(
         pre_model_hook: Optional ``RunnableLike`` called before every LLM
             invocation (e.g. a context-summarization hook).
     """
+    llm, prompt = prepare(llm, system_prompt or SystemPrompt(SYSTEM_PROMPT), tools=bool(tools))
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
         return create_react_agent(
             llm,
             tools=tools,
-            prompt=system_prompt or SYSTEM_PROMPT,
+            prompt=prompt,
             checkpointer=_checkpointer,
             interrupt_before=["tools"],
             pre_model_hook=pre_model_hook,
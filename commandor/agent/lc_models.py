@@ -1,10 +1,110 @@
-"""Factory for building LangChain BaseChatModel instances from provider name."""
+"""Factory for building LangChain BaseChatModel instances from provider name.
+
+Chat models are pooled for the whole process.  Building a client is not
+free: it validates settings and creates an HTTP connection pool, and a
+fresh pool pays DNS and TLS again on its first request.  ``build_model``
+therefore returns the same instance for the same provider, model and API
+key.  The key is only stored as a fingerprint in the pool key.  The
+instances are stateless; ``bind_tools`` and friends return new runnables
+and leave the pooled model alone, so one instance can serve several
+threads and runs.
+
+OpenAI and OpenRouter get the process-wide httpx client from
+``utils.http_pool``: HTTP/2, tuned pool limits and a long keep-alive.
+``warm_model`` builds a model ahead of time and, for those two
+providers, opens a connection to the API host.  That way the first turn
+after startup or a ``/provider`` switch skips the client construction,
+DNS lookup and TLS handshake.  ChatAnthropic and ChatGoogleGenerativeAI
+don't accept an httpx client; they keep their SDKs' own transports.
+
+Each pool slot remembers the constructor parameters it was built with.
+If they change, the slot is rebuilt.  Entries not requested for
+``POOL_IDLE_SECONDS`` are dropped and left to the garbage collector, not
+closed, because a run that is still going may hold them.
+
+Public API:
+    build_model(provider, api_key, model) -> BaseChatModel
+    warm_model(provider, api_key, model)
+    clear_model_pool()
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
 
 from langchain_core.language_models.chat_models import BaseChatModel
 
+# Pooled models unused for this long are dropped.
+POOL_IDLE_SECONDS = 15 * 60
+
+_PROVIDERS = ("gemini", "anthropic", "openai", "openrouter")
+
+# Providers built on ChatOpenAI, which takes our shared httpx client.
+_OPENAI_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "openrouter": "https://openrouter.ai/api/v1",
+}
+
+
+@dataclass
+class _PoolEntry:
+    signature: str
+    llm: BaseChatModel
+    last_used: float
+
+
+_pool: Dict[Tuple[str, str, str], _PoolEntry] = {}
+_pool_lock = threading.Lock()
+
+
+def _fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _model_params(provider: str) -> Dict[str, Any]:
+    """Constructor arguments for *provider* besides model and API key."""
+    params: Dict[str, Any] = {"temperature": 0.7}
+    if provider in _OPENAI_BASE_URLS:
+        from ..utils.http_pool import get_http_client  # noqa: PLC0415
+
+        params["http_client"] = get_http_client()
+    if provider == "openrouter":
+        params["base_url"] = _OPENAI_BASE_URLS["openrouter"]
+        params["default_headers"] = {
+            "HTTP-Referer": "https://github.com/ravin-d-27/Commandor",
+            "X-Title": "Commandor",
+        }
+    return params
+
+
+def _create_model(provider: str, api_key: str, model: str, params: Dict[str, Any]) -> BaseChatModel:
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI  # noqa: PLC0415
+
+        return ChatGoogleGenerativeAI(model=model, google_api_key=api_key, **params)
+
+    elif provider == "anthropic":
+        from langchain_anthropic import ChatAnthropic  # noqa: PLC0415
+
+        return ChatAnthropic(model=model, anthropic_api_key=api_key, **params)
+
+    else:  # openai, openrouter
+        from langchain_openai import ChatOpenAI  # noqa: PLC0415
+
+        return ChatOpenAI(model=model, api_key=api_key, **params)
+
+
+def _evict_idle(now: float) -> None:
+    for slot in [s for s, e in _pool.items() if now - e.last_used > POOL_IDLE_SECONDS]:
+        del _pool[slot]
+
 
 def build_model(provider: str, api_key: str, model: str) -> BaseChatModel:
-    """Return an instantiated LangChain chat model for the given provider.
+    """Return a (pooled) LangChain chat model for the given provider.
 
     Args:
         provider: One of 'gemini', 'anthropic', 'openai', 'openrouter'.
@@ -13,54 +113,56 @@ def build_model(provider: str, api_key: str, model: str) -> BaseChatModel:
 
     Returns:
         A LangChain BaseChatModel ready to be passed to create_react_agent.
+        Repeated calls with the same arguments return the same instance.
 
     Raises:
         ValueError: If the provider name is not recognised.
         ImportError: If the required langchain integration package is missing.
     """
-    if provider == "gemini":
-        from langchain_google_genai import ChatGoogleGenerativeAI  # noqa: PLC0415
-
-        return ChatGoogleGenerativeAI(
-            model=model,
-            google_api_key=api_key,
-            temperature=0.7,
+    if provider not in _PROVIDERS:
+        raise ValueError(
+            f"Unknown provider: '{provider}'. "
+            "Valid choices are: gemini, anthropic, openai, openrouter."
         )
 
-    elif provider == "anthropic":
-        from langchain_anthropic import ChatAnthropic  # noqa: PLC0415
+    params = _model_params(provider)
+    signature = repr(sorted(params.items()))
+    slot = (provider, model, _fingerprint(api_key))
+    now = time.monotonic()
+    with _pool_lock:
+        _evict_idle(now)
+        entry = _pool.get(slot)
+        if entry is not None and entry.signature == signature:
+            entry.last_used = now
+            return entry.llm
 
-        return ChatAnthropic(
-            model=model,
-            anthropic_api_key=api_key,
-            temperature=0.7,
-        )
+    llm = _create_model(provider, api_key, model, params)
 
-    elif provider == "openai":
-        from langchain_openai import ChatOpenAI  # noqa: PLC0415
+    with _pool_lock:
+        entry = _pool.get(slot)
+        if entry is not None and entry.signature == signature:
+            # Another thread built the same model meanwhile; share theirs.
+            entry.last_used = now
+            return entry.llm
+        _pool[slot] = _PoolEntry(signature, llm, now)
+    return llm
 
-        return ChatOpenAI(
-            model=model,
-            api_key=api_key,
-            temperature=0.7,
-        )
 
-    elif provider == "openrouter":
-        from langchain_openai import ChatOpenAI  # noqa: PLC0415
+def warm_model(provider: str, api_key: str, model: str) -> None:
+    """Build (pool) the model and pre-open a connection to its API host.
 
-        return ChatOpenAI(
-            model=model,
-            api_key=api_key,
-            base_url="https://openrouter.ai/api/v1",
-            temperature=0.7,
-            default_headers={
-                "HTTP-Referer": "https://github.com/ravin-d-27/Commandor",
-                "X-Title": "Commandor",
-            },
-        )
+    Blocking; call it from a background thread.  Connection failures are
+    ignored, since the real request will report them.
+    """
+    build_model(provider, api_key, model)
+    base_url = _OPENAI_BASE_URLS.get(provider)
+    if base_url is not None:
+        from ..utils.http_pool import preconnect  # noqa: PLC0415
 
-    else:
-        raise ValueError(
-            f"Unknown provider: '{provider}'. "
-            "Valid choices are: gemini, anthropic, openai, openrouter."
-        )
+        preconnect(base_url)
+
+
+def clear_model_pool() -> None:
+    """Drop every pooled model (the next build_model call rebuilds)."""
+    with _pool_lock:
+        _pool.clear()
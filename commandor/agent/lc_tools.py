@@ -1,27 +1,90 @@
 """LangChain @tool-decorated wrappers around file_ops and shell utilities."""
 
+import functools
 import json
 import os
-import shutil
-import subprocess
-import tempfile
 import threading
+from contextvars import ContextVar
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 
-from langchain_core.tools import tool
+from langchain_core.tools import BaseTool, StructuredTool, tool
 
-from ..utils import file_ops, shell
-from ..utils.diff_display import display_diff
+from ..utils import background, command_cache, file_ops, line_index, patch_engine, shell, shell_session
+from ..utils.file_cache import get_file_cache
+from ..utils.diff_display import remember
+from ..utils.output_compactor import compact_output, read_spill
 
 
 # ---------------------------------------------------------------------------
-# Thread-local queue for plan events.
-# agent_bridge sets _plan_tls.queue = [] before each agent run and clears it
-# after. The tools push (event_type, payload) tuples; _iter_graph drains them.
+# Queue for UI events raised by tools (plan updates, file diffs, command usage).
+# agent_bridge / executor set _plan_tls.queue = [] (and _event_queue, which
+# follows the run into LangGraph's tool-executor threads) before each agent
+# run and clear it after. The tools push (event_type, payload) tuples;
+# _iter_graph / _stream_graph drain them.
 # ---------------------------------------------------------------------------
 
 _plan_tls = threading.local()
+_event_queue: ContextVar[Optional[list]] = ContextVar("commandor_event_queue", default=None)
+
+
+def _active_queue() -> Optional[list]:
+    q = getattr(_plan_tls, "queue", None)
+    return q if q is not None else _event_queue.get()
+
+
+def _push_event(event_type: str, payload) -> None:
+    q = _active_queue()
+    if q is not None:
+        q.append((event_type, payload))
+
+
+def _emit_diff(path: str, old_content: str, new_content: str) -> None:
+    """Announce a file change; front ends render the diff only if they want it."""
+    if old_content == new_content or _active_queue() is None:
+        return
+    _push_event("file_diff", (path, remember(old_content), remember(new_content)))
+
+
+# Output of a running command can't wait for the queue above, which is only
+# drained between graph steps.  A front end that shows it live sets
+# _output_listener to a callable(command, stream, text); run_command_tool
+# calls it from the command's reader threads (throttled, ~10 calls/s).
+_output_listener: ContextVar[Optional[Callable[[str, str, str], None]]] = ContextVar(
+    "commandor_output_listener", default=None
+)
+
+def _record_usage(command: str, result) -> None:
+    """Queue a finished command's wall time and resource usage for the run metrics."""
+    usage = result.usage
+    _push_event("command_usage", {
+        "command": command,
+        "duration": result.duration,
+        "cpu": usage.cpu_time if usage is not None else None,
+        "max_rss_kb": usage.max_rss_kb if usage is not None else None,
+        "returncode": result.returncode,
+        "timed_out": result.timed_out,
+    })
+
+
+# Agent thread id of the current run; keys the persistent shell session
+# (agent.persistent_shell) that run_command_tool uses.
+_session_key: ContextVar[Optional[str]] = ContextVar("commandor_session_key", default=None)
+
+
+def _shell_session() -> Optional[shell_session.ShellSession]:
+    key = _session_key.get()
+    if key is None or os.name != "posix":
+        return None
+    try:
+        from ..config import get_config  # noqa: PLC0415
+
+        cfg = get_config()
+        if not (cfg.config and cfg.config.agent.persistent_shell):
+            return None
+    except Exception:
+        return None
+    return shell_session.get_session(key)
 
 
 # ---------------------------------------------------------------------------
@@ -48,26 +111,48 @@ def read_file_tool(path: str, onset: int = 0, offset: Optional[int] = None) -> s
         if not p.is_file():
             return f"Error: Not a file: {path}"
 
+        # Seek straight to the requested range via the cached line index
+        # instead of decoding the whole file.
+        start = max(0, onset)
+        end_req = offset + 1 if offset is not None else None
         try:
-            with open(p, "r", encoding="utf-8") as fh:
-                all_lines = fh.readlines()
+            text, total = line_index.read_lines(str(p), start, end_req)
         except UnicodeDecodeError:
             return f"<Binary file: {path}>"
 
-        total = len(all_lines)
-        start = max(0, onset)
-        end   = (min(offset + 1, total) if offset is not None else total)
-        selected = all_lines[start:end]
+        end = min(end_req, total) if end_req is not None else total
 
         header = ""
         if start > 0 or end < total:
             header = f"[Lines {start}–{end - 1} of {total} total]\n"
 
-        return header + "".join(selected)
+        return header + text
     except (FileNotFoundError, ValueError, OSError) as e:
         return f"Error: {e}"
 
 
+@tool
+def read_many_files_tool(files: list, max_tokens: int = 20000) -> str:
+    """Read several files (or line ranges) at once — one call instead of many.
+
+    Use this whenever you need more than one file, e.g. a module plus its
+    tests and callers. Files are read concurrently and returned in order,
+    each under a '==> path <==' header. The combined output is limited to
+    about `max_tokens`; files cut to fit are listed at the end so you can
+    page the rest with read_file_tool.
+
+    Args:
+        files: List of paths, or objects {"path": ..., "onset": N, "offset": M}
+               with the same 0-indexed, inclusive line range as read_file_tool.
+               Example: ["src/app.py", {"path": "src/db.py", "onset": 0, "offset": 80}]
+        max_tokens: Approximate budget for the combined output (default 20000).
+    """
+    try:
+        return file_ops.read_many_files(files, max_chars=max(1, max_tokens) * 4)
+    except (ValueError, OSError) as e:
+        return f"Error: {e}"
+
+
 # ---------------------------------------------------------------------------
 # File-mutation tools (trigger diff display)
 # ---------------------------------------------------------------------------
@@ -90,15 +175,15 @@ def write_file_tool(path: str, content: str) -> str:
     """
     # Capture old content before overwriting
     try:
-        old_content = Path(path).read_text(encoding="utf-8")
-    except (FileNotFoundError, OSError):
+        old_content = get_file_cache().read(path)
+    except (FileNotFoundError, OSError, UnicodeDecodeError):
         old_content = ""
 
     try:
         result = file_ops.write_file(path, content, create_dirs=True)
     except OSError as e:
         return f"Error writing file: {e}"
-    display_diff(path, old_content, content)
+    _emit_diff(path, old_content, content)
     return result
 
 
@@ -120,10 +205,10 @@ def edit_file_tool(path: str, old: str, new: str) -> str:
         old: The exact text to find and replace (must exist verbatim in the file).
         new: The replacement text.
     """
-    # Capture old content before editing
+    # Capture old content before editing (cached, so edit_file won't re-read it)
     try:
-        old_content = Path(path).read_text(encoding="utf-8")
-    except (FileNotFoundError, OSError):
+        old_content = get_file_cache().read(path)
+    except (FileNotFoundError, OSError, UnicodeDecodeError):
         old_content = ""
 
     try:
@@ -131,79 +216,80 @@ def edit_file_tool(path: str, old: str, new: str) -> str:
     except (FileNotFoundError, ValueError, OSError) as e:
         return f"Error: {e}"
 
-    # Reread to get the actual new content (edit_file may normalise line endings etc.)
+    # Actual new content (edit_file may normalise line endings etc.); a cache
+    # hit unless the write could not be cached.
     try:
-        new_content = Path(path).read_text(encoding="utf-8")
-    except (FileNotFoundError, OSError):
+        new_content = get_file_cache().read(path)
+    except (FileNotFoundError, OSError, UnicodeDecodeError):
         new_content = old_content.replace(old, new, 1)
 
-    display_diff(path, old_content, new_content)
+    _emit_diff(path, old_content, new_content)
     return result
 
 
 @tool
-def patch_file_tool(path: str, diff: str) -> str:
-    """Apply a unified diff string to a file.
+def multi_edit_file_tool(path: str, edits: List[dict]) -> str:
+    """Apply several exact-string replacements to ONE file in a single call.
 
-    The diff must be in standard unified-diff format (as produced by
-    `diff -u` or `git diff`).  The system `patch` command is tried first;
-    if it is not installed a pure-Python fallback is used automatically.
+    Prefer this over repeated edit_file_tool calls when changing several
+    places in the same file (renames, refactors). Edits are applied in
+    order, each to the first occurrence of its `old` text in the result of
+    the previous edits. The file is written once, atomically, and only if
+    EVERY edit matches — otherwise nothing changes and all failing edits are
+    reported together so they can be fixed in one retry.
 
     Args:
-        path: Path to the file to patch.
-        diff: Unified diff string to apply.
+        path: Path to the file to edit.
+        edits: List of {"old": "<exact text>", "new": "<replacement>"} objects.
+               Example: [{"old": "def foo(", "new": "def bar("},
+                         {"old": "return foo(x)", "new": "return bar(x)"}]
     """
-    # Capture old content before patching
     try:
-        old_content = Path(path).read_text(encoding="utf-8")
-    except (FileNotFoundError, OSError):
+        old_content = get_file_cache().read(path)
+    except (FileNotFoundError, OSError, UnicodeDecodeError):
         old_content = ""
 
-    # --- Try system `patch` first ---
-    if shutil.which("patch"):
-        try:
-            with tempfile.NamedTemporaryFile(
-                mode="w", suffix=".patch", delete=False, encoding="utf-8"
-            ) as tf:
-                tf.write(diff)
-                patch_file = tf.name
-
-            proc = subprocess.run(
-                ["patch", "-p1", path, patch_file],
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
-            os.unlink(patch_file)
+    try:
+        result = file_ops.multi_edit_file(path, edits)
+    except (FileNotFoundError, ValueError, OSError) as e:
+        return f"Error: {e}"
 
-            if proc.returncode != 0:
-                return f"patch command failed:\n{proc.stderr.strip()}"
+    try:
+        new_content = get_file_cache().read(path)
+    except (FileNotFoundError, OSError, UnicodeDecodeError):
+        new_content = old_content
 
-        except subprocess.TimeoutExpired:
-            return "patch command timed out."
-        except Exception as exc:  # noqa: BLE001
-            return f"patch command error: {exc}"
+    _emit_diff(path, old_content, new_content)
+    return result
 
-    else:
-        # --- Pure-Python fallback ---
-        try:
-            new_content = _apply_unified_diff(old_content, diff)
-        except Exception as exc:  # noqa: BLE001
-            return f"Failed to apply patch: {exc}"
 
-        try:
-            Path(path).write_text(new_content, encoding="utf-8")
-        except OSError as exc:
-            return f"Failed to write patched file: {exc}"
+@tool
+def patch_file_tool(path: str, diff: str, fuzz: int = 2) -> str:
+    """Apply a unified diff (as produced by `diff -u` or `git diff`).
+
+    Hunks are located by their context, so slightly stale @@ line numbers
+    are fine. A diff may touch several files (git diff output with
+    ---/+++ headers); then pass the directory the paths are relative to.
+    Different --- and +++ paths, or git's rename from/rename to lines,
+    rename the file. Nothing is written unless every hunk applies; the
+    result lists where each hunk landed or why it failed.
 
-    # Reread the result for the diff display
+    Args:
+        path: File to patch, or the project directory (e.g. '.') for a
+              multi-file diff.
+        diff: Unified diff string to apply.
+        fuzz: Context lines per hunk end that may be ignored when the exact
+              context is not found (default 2, 0 = strict).
+    """
     try:
-        new_content = Path(path).read_text(encoding="utf-8")
-    except (FileNotFoundError, OSError):
-        new_content = old_content
+        report = patch_engine.apply_patch(diff, path, fuzz=max(0, fuzz))
+    except (FileNotFoundError, ValueError, OSError) as exc:
+        return f"Failed to apply patch: {exc}"
 
-    display_diff(path, old_content, new_content)
-    return f"Patch applied successfully to {path}."
+    if report.applied:
+        for f in report.files:
+            _emit_diff(f.path, f.old_content, f.new_content)
+    return report.summary()
 
 
 # ---------------------------------------------------------------------------
@@ -248,6 +334,25 @@ def grep_tool(pattern: str, path: str = ".", file_pattern: str = "*") -> str:
         return f"Error: {e}"
 
 
+@tool
+def find_symbol_tool(name: str, include_references: bool = True, path: str = ".") -> str:
+    """Jump to where a function, class, method, or type is defined.
+
+    Faster and more precise than grep_tool for code navigation: answers come
+    from a cached symbol index (Python, JS/TS, Go, Rust, Java, C/C++, Ruby,
+    PHP). Use a qualified name like 'MyClass.my_method' to narrow methods.
+
+    Args:
+        name: Symbol to look up, e.g. 'build_model' or 'TerminalWidget.on_mount'.
+        include_references: Also list lines that mention the symbol (default True).
+        path: Directory to search in (defaults to current working directory).
+    """
+    try:
+        return file_ops.find_symbol(name, path, include_references)
+    except (FileNotFoundError, ValueError, OSError) as e:
+        return f"Error: {e}"
+
+
 @tool
 def list_directory_tool(path: str = ".") -> str:
     """List the contents of a directory (files and subdirectories).
@@ -265,7 +370,13 @@ def list_directory_tool(path: str = ".") -> str:
 
 
 @tool
-def run_command_tool(command: str, timeout: int = 60) -> str:
+def run_command_tool(
+    command: str,
+    timeout: int = 60,
+    cache: bool = False,
+    cache_inputs: Optional[List[str]] = None,
+    cache_env: Optional[List[str]] = None,
+) -> str:
     """Run a shell command and return its combined stdout+stderr output.
 
     Use for: running tests, builds, git commands, package managers (pip/npm/cargo),
@@ -275,13 +386,195 @@ def run_command_tool(command: str, timeout: int = 60) -> str:
     - Create a new directory before writing files into it: run_command_tool('mkdir -p /path/to/dir')
     - Use absolute paths or ensure you've cd_tool'd to the right directory first
     - Avoid commands needing interactive input (e.g. passwd, vim, less)
-    - For long-running processes (servers, watchers), use a short timeout and note the PID
+    - For long-running processes (servers, watchers), use start_background_tool instead
+    - Very long output keeps only its first and last 32 KB per stream; the complete
+      stream is saved under the spill handle named in the marker (read_spill_tool),
+      but piping through grep/tail is cheaper when you need something specific
+    - For read-only commands whose result depends only on known files (git log,
+      pip list, a test run), pass cache=True with the globs of the files it reads
+      in cache_inputs (required); an identical call with unchanged inputs and git
+      HEAD/index is answered from the cache. Only successful runs are cached.
+      Never cache commands that modify anything.
 
     Args:
         command: Shell command to execute (runs in the current working directory).
         timeout: Maximum seconds to wait before giving up (default 60).
+        cache: Reuse the result of an identical earlier run (same command,
+               directory, cache_env values, cache_inputs contents and git state).
+        cache_inputs: Required with cache=True. Globs (relative to the working
+                      directory, ** allowed) of the files the command's result depends on,
+                      e.g. ["src/**/*.py", "tests/**/*.py", "pyproject.toml"].
+        cache_env: Names of environment variables the result depends on.
     """
-    return shell.run_command(command, timeout=timeout)
+    cache_key = None
+    if cache:
+        try:
+            cache_key = command_cache.cache_key(
+                command, os.getcwd(), cache_env or (), cache_inputs or ()
+            )
+        except ValueError as e:
+            return f"Error: {e}"
+    listener = _output_listener.get()
+    on_output = None
+    if listener is not None:
+        def on_output(stream: str, text: str) -> None:
+            listener(command, stream, text)
+    return shell.run_command(
+        command, timeout=timeout, on_output=on_output, session=_shell_session(),
+        cache_key=cache_key, on_result=functools.partial(_record_usage, command),
+    )
+
+
+@tool
+def run_commands_tool(commands: List[dict], max_parallel: int = 4) -> str:
+    """Run several independent shell commands in parallel and report them together.
+
+    Use when checks don't depend on each other — e.g. lint, type-check and unit
+    tests — instead of one run_command_tool call per command. Each command runs
+    in its own fresh shell in the current directory (no shared environment, and
+    `cd` inside one command does not affect the others). Results come back in
+    input order with exit code, duration and (compacted) output.
+
+    Args:
+        commands: List of {"command": "<shell command>", "timeout": <seconds>}
+                  objects; timeout is optional (default 60).
+                  Example: [{"command": "ruff check ."},
+                            {"command": "mypy src", "timeout": 120},
+                            {"command": "pytest -q", "timeout": 300}]
+        max_parallel: Maximum number of commands running at once (default 4).
+    """
+    listener = _output_listener.get()
+    finished: list = []  # the pool threads don't see this run's event queue
+    try:
+        output = shell.run_commands(
+            commands, max_parallel=max_parallel, on_output=listener,
+            on_result=lambda command, result: finished.append((command, result)),
+        )
+    except ValueError as e:
+        return f"Error: {e}"
+    for command, result in finished:
+        _record_usage(command, result)
+    return output
+
+
+# ---------------------------------------------------------------------------
+# Background processes (servers, watchers) — killed when the run ends
+# ---------------------------------------------------------------------------
+
+def _bg_key() -> str:
+    return _session_key.get() or "default"
+
+
+def _format_lines(lines: List[str], skipped: int) -> str:
+    out = [f"... {skipped} earlier line(s) not shown"] if skipped else []
+    out.extend(lines)
+    return "\n".join(out) if out else "(no new output)"
+
+
+@tool
+def start_background_tool(command: str) -> str:
+    """Start a long-running command (dev server, file watcher, tail -f) in the background.
+
+    Returns immediately with the process id and the first second of output.
+    Use wait_for_output_tool to wait until it is ready, poll_background_tool
+    to read new output, and kill_background_tool to stop it.  Background
+    processes are killed automatically when the agent run ends.
+
+    Args:
+        command: Shell command to run (in the current working directory).
+    """
+    try:
+        bp = background.start(_bg_key(), command)
+    except OSError as e:
+        return f"Error: {e}"
+    try:
+        bp.proc.wait(timeout=1.0)
+    except Exception:
+        pass
+    lines, skipped = bp.poll_new(max_lines=20)
+    return f"Started {bp.status()}\n{_format_lines(lines, skipped)}"
+
+
+@tool
+def poll_background_tool(pid: Optional[int] = None, max_lines: int = 50) -> str:
+    """Show new output of a background process since the last poll.
+
+    Call without pid to list this session's background processes.
+
+    Args:
+        pid:       Process id returned by start_background_tool.
+        max_lines: Newest lines to return (default 50).
+    """
+    if pid is None:
+        procs = background.list_processes(_bg_key())
+        return "\n".join(bp.status() for bp in procs) or "No background processes."
+    try:
+        bp = background.get(_bg_key(), pid)
+    except KeyError as e:
+        return f"Error: {e.args[0]}"
+    lines, skipped = bp.poll_new(max_lines=max(1, max_lines))
+    return f"{bp.status()}\n{_format_lines(lines, skipped)}"
+
+
+@tool
+def wait_for_output_tool(pid: int, pattern: str, timeout: int = 30) -> str:
+    """Wait until a background process prints a line matching a regex.
+
+    Typical use: wait for "Listening on|ready" after starting a server.
+    Already-printed output counts.  Returns early if the process exits.
+
+    Args:
+        pid:     Process id returned by start_background_tool.
+        pattern: Python regular expression searched in each output line.
+        timeout: Maximum seconds to wait (default 30).
+    """
+    try:
+        bp = background.get(_bg_key(), pid)
+        regex = background.compile_pattern(pattern)
+    except (KeyError, ValueError) as e:
+        return f"Error: {e.args[0]}"
+    line = bp.wait_for(regex, timeout=max(0, timeout))
+    if line is not None:
+        return f"Matched: {line}\n{bp.status()}"
+    reason = "process exited" if bp.returncode is not None else f"timed out after {timeout}s"
+    return (
+        f"No match for {pattern!r} ({reason}).\n{bp.status()}\n"
+        f"Last output:\n{_format_lines(bp.tail(20), 0)}"
+    )
+
+
+@tool
+def kill_background_tool(pid: int) -> str:
+    """Stop a background process (SIGTERM, then SIGKILL after 3 seconds).
+
+    Args:
+        pid: Process id returned by start_background_tool.
+    """
+    try:
+        bp = background.get(_bg_key(), pid)
+    except KeyError as e:
+        return f"Error: {e.args[0]}"
+    bp.kill()
+    lines, skipped = bp.poll_new(max_lines=20)
+    return f"Stopped {bp.status()}\n{_format_lines(lines, skipped)}"
+
+
+@tool
+def read_spill_tool(handle: str, page: int = 1) -> str:
+    """Page through a tool output that was too large to return in full.
+
+    Large tool results are cut to their head and tail; the marker in the
+    middle names a spill handle holding the complete output.  Pages are
+    200 lines each; page=-1 is the last page.
+
+    Args:
+        handle: Spill handle from the compacted tool result (12 hex chars).
+        page:   1-based page number (default 1).
+    """
+    try:
+        return read_spill(handle, page)
+    except (FileNotFoundError, ValueError, OSError) as e:
+        return f"Error: {e}"
 
 
 @tool
@@ -325,8 +618,12 @@ def get_project_files_tool(extensions: Optional[List[str]] = None) -> str:
 
 @tool
 def get_git_info_tool() -> str:
-    """Get git repository status, current branch, and recent commits."""
-    return shell.get_git_info()
+    """Get the git branch, upstream (ahead/behind), HEAD, counts of staged/modified/
+    untracked files, and the 5 most recent commits.
+
+    File names are not listed; run `git status` or `git diff --stat` for those.
+    """
+    return shell.get_git_info(recent_commits=5)
 
 
 @tool
@@ -364,9 +661,7 @@ def create_task_plan(tasks: list) -> str:
                          "Run pytest auth/ to verify",
                          "Summarise changes"]
     """
-    q = getattr(_plan_tls, "queue", None)
-    if q is not None:
-        q.append(("plan_created", list(tasks)))
+    _push_event("plan_created", list(tasks))
     return json.dumps({
         "status": "plan_registered",
         "count": len(tasks),
@@ -390,9 +685,7 @@ def complete_task(index: int) -> str:
     Args:
         index: 0-based task index (first task = 0, second = 1, etc.).
     """
-    q = getattr(_plan_tls, "queue", None)
-    if q is not None:
-        q.append(("task_done", index))
+    _push_event("task_done", index)
     return json.dumps({"status": "task_completed", "index": index})
 
 
@@ -400,16 +693,46 @@ def complete_task(index: int) -> str:
 # Tool registries
 # ---------------------------------------------------------------------------
 
-# All tools available to agent mode
-ALL_TOOLS = [
+def _compacted(t: BaseTool) -> BaseTool:
+    """Copy of *t* whose results pass through compact_output().
+
+    Applied to every tool in ALL_TOOLS, so each ToolMessage is already
+    within its token budget when it enters the graph state.
+    """
+    func = t.func
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        return compact_output(func(*args, **kwargs), t.name)
+
+    return StructuredTool.from_function(
+        func=run,
+        name=t.name,
+        description=t.description,
+        args_schema=t.args_schema,
+        infer_schema=False,
+    )
+
+
+# All tools available to agent mode.  read_spill_tool pages are bounded
+# already and must not be spilled again.
+ALL_TOOLS = [_compacted(t) for t in (
     read_file_tool,
+    read_many_files_tool,
     write_file_tool,
     edit_file_tool,
+    multi_edit_file_tool,
     patch_file_tool,
     glob_tool,
     grep_tool,
+    find_symbol_tool,
     list_directory_tool,
     run_command_tool,
+    run_commands_tool,
+    start_background_tool,
+    poll_background_tool,
+    wait_for_output_tool,
+    kill_background_tool,
     get_directory_tool,
     cd_tool,
     get_project_files_tool,
@@ -417,103 +740,17 @@ ALL_TOOLS = [
     get_environment_tool,
     create_task_plan,
     complete_task,
-]
+)] + [read_spill_tool]
 
 # Tool names that modify the filesystem or execute commands — used by assist mode
 # to flag which actions need user confirmation.
 DANGEROUS_TOOL_NAMES = {
     "run_command_tool",
+    "run_commands_tool",
+    "start_background_tool",
+    "kill_background_tool",
     "write_file_tool",
     "edit_file_tool",
+    "multi_edit_file_tool",
     "patch_file_tool",
 }
-
-
-# ---------------------------------------------------------------------------
-# Pure-Python unified-diff applier (fallback when `patch` is not installed)
-# ---------------------------------------------------------------------------
-
-def _apply_unified_diff(original: str, diff_text: str) -> str:
-    """Apply a unified diff to *original* text and return the patched text.
-
-    Handles standard unified-diff format (--- / +++ / @@ headers, +/- lines).
-    Raises ValueError on malformed or non-applicable hunks.
-    """
-    orig_lines = original.splitlines(keepends=True)
-    result_lines: list[str] = list(orig_lines)
-    offset = 0  # cumulative line-count shift from previously applied hunks
-
-    lines = diff_text.splitlines(keepends=True)
-    i = 0
-
-    # Skip file header lines (--- / +++)
-    while i < len(lines) and (lines[i].startswith("---") or lines[i].startswith("+++")):
-        i += 1
-
-    while i < len(lines):
-        line = lines[i]
-        if not line.startswith("@@"):
-            i += 1
-            continue
-
-        # Parse @@ -start,count +start,count @@
-        try:
-            parts = line.split("@@")[1].strip().split()
-            old_info = parts[0]  # e.g. "-10,6"
-            old_start = int(old_info.split(",")[0].lstrip("-")) - 1  # 0-indexed
-        except (IndexError, ValueError) as exc:
-            raise ValueError(f"Malformed hunk header: {line!r}") from exc
-
-        i += 1
-        hunk_removes: list[str] = []
-        hunk_adds: list[str] = []
-        hunk_lines: list[tuple[str, str]] = []  # (type, text): ' ', '+', '-'
-
-        while i < len(lines) and not lines[i].startswith("@@"):
-            hl = lines[i]
-            if hl.startswith("+") and not hl.startswith("+++"):
-                hunk_lines.append(("+", hl[1:]))
-                hunk_adds.append(hl[1:])
-            elif hl.startswith("-") and not hl.startswith("---"):
-                hunk_lines.append(("-", hl[1:]))
-                hunk_removes.append(hl[1:])
-            elif hl.startswith(" "):
-                hunk_lines.append((" ", hl[1:]))
-            elif hl.strip() == r"\ No newline at end of file":
-                pass  # ignore
-            i += 1
-
-        # Apply the hunk: find the removal block in result_lines at adjusted position
-        apply_pos = old_start + offset
-
-        # Verify context / removals match
-        check_pos = apply_pos
-        for typ, text in hunk_lines:
-            if typ in (" ", "-"):
-                if check_pos >= len(result_lines):
-                    raise ValueError(
-                        f"Hunk extends beyond end of file at line {check_pos + 1}"
-                    )
-                if result_lines[check_pos].rstrip("\n\r") != text.rstrip("\n\r"):
-                    raise ValueError(
-                        f"Hunk mismatch at line {check_pos + 1}: "
-                        f"expected {text!r}, got {result_lines[check_pos]!r}"
-                    )
-                check_pos += 1
-
-        # Replace: collect new block
-        new_block: list[str] = []
-        src_pos = apply_pos
-        for typ, text in hunk_lines:
-            if typ == " ":
-                new_block.append(result_lines[src_pos])
-                src_pos += 1
-            elif typ == "-":
-                src_pos += 1  # skip removed line
-            elif typ == "+":
-                new_block.append(text)
-
-        result_lines[apply_pos:src_pos] = new_block
-        offset += len(new_block) - (src_pos - apply_pos)
-
-    return "".join(result_lines)
@@ -0,0 +1,223 @@
+"""Prefix-stable system prompts and provider prompt-cache hints.
+
+Providers bill a repeated prompt prefix at a fraction of the normal input
+price, but only if the prefix is byte-identical.  Anthropic caches up to
+explicit ``cache_control`` breakpoints.  OpenAI and Gemini 2.5 cache long
+repeated prefixes implicitly, and Gemini also offers explicit
+CachedContent.  The system prompt used to interleave the working
+directory and git status with static text, so every ``cd`` or edit moved
+the first changed byte close to the start.
+
+A SystemPrompt therefore keeps three parts, rendered in this order after
+the tool schemas:
+
+* ``stable``: the base SYSTEM_PROMPT and fixed rules, identical in
+  every run.
+* ``project``: the repository map, which changes only with HEAD or the
+  set of tracked files (see ``repo_map``).
+* ``volatile``: cwd, git status and plan text, which may change every run.
+
+``prepare(llm, system_prompt, tools)`` returns the model and the
+``create_react_agent`` prompt for the provider:
+
+* **Anthropic** (``agent.prompt_cache``): a SystemMessage with one text
+  block per part.  Breakpoints go after ``stable`` and ``project`` and on
+  the newest message, so each step of an agent loop reads the earlier
+  steps from cache.  That uses 3 of the 4 breakpoints allowed.
+* **Gemini** (``agent.gemini_context_cache``, graphs without tools):
+  ``stable`` and ``project`` go into a CachedContent with a one-hour TTL,
+  reused while the text is unchanged.  Requests carry only the messages,
+  with ``volatile`` prepended to the newest human message.  A request with
+  cached content may not also set tools or a system instruction, so
+  tool-using graphs rely on Gemini's implicit caching of the stable prefix
+  instead.
+* **Everything else**: the plain prefix-stable string.
+
+Public API:
+    SystemPrompt(stable, project="", volatile="")
+        .with_suffix(text) -> SystemPrompt
+    prepare(llm, system_prompt, tools=True) -> (llm, prompt)
+    cache_token_usage(usage_metadata) -> (cache_read, cache_write)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple, Union
+
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+
+_EPHEMERAL = {"type": "ephemeral"}
+
+# Explicit Gemini caches: lifetime, and how long before expiry we stop
+# handing one out (a run must not outlive its cache).
+GEMINI_CACHE_TTL = 3600
+_GEMINI_REUSE_MARGIN = 600
+# After a failed create (e.g. prompt below the model's minimum), don't retry for this long.
+_GEMINI_RETRY_AFTER = 600
+
+_gemini_caches: Dict[str, Tuple[Optional[str], float]] = {}
+_gemini_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SystemPrompt:
+    """System prompt split by how often each part changes (see module docstring)."""
+
+    stable: str
+    project: str = ""
+    volatile: str = ""
+
+    def __str__(self) -> str:
+        return self.stable + self.project + self.volatile
+
+    def with_suffix(self, text: str) -> "SystemPrompt":
+        """Append *text* to the volatile part."""
+        return replace(self, volatile=self.volatile + text)
+
+
+def _agent_flag(name: str, default: bool) -> bool:
+    try:
+        from ..config import get_config  # noqa: PLC0415
+
+        cfg = get_config()
+        if cfg.config:
+            return bool(getattr(cfg.config.agent, name))
+    except Exception:
+        pass
+    return default
+
+
+def _state_messages(state) -> list:
+    return state["messages"] if isinstance(state, dict) else state.messages
+
+
+# ---------------------------------------------------------------------------
+# Anthropic
+# ---------------------------------------------------------------------------
+
+def _anthropic_system(sp: SystemPrompt) -> SystemMessage:
+    blocks = []
+    for text, cached in ((sp.stable, True), (sp.project, True), (sp.volatile, False)):
+        if text.strip():
+            block: Dict[str, Any] = {"type": "text", "text": text}
+            if cached:
+                block["cache_control"] = _EPHEMERAL
+            blocks.append(block)
+    return SystemMessage(content=blocks)
+
+
+def _with_breakpoint(messages: list) -> list:
+    """Copy of *messages* with a cache breakpoint on the newest one."""
+    if not messages or not isinstance(messages[-1], (HumanMessage, ToolMessage)):
+        return messages
+    last = messages[-1]
+    content = last.content
+    if isinstance(content, str):
+        if not content.strip():
+            return messages
+        blocks = [{"type": "text", "text": content, "cache_control": _EPHEMERAL}]
+    elif (content and isinstance(content[-1], dict)
+          and content[-1].get("type") == "text" and content[-1].get("text")):
+        blocks = [*content[:-1], {**content[-1], "cache_control": _EPHEMERAL}]
+    else:
+        return messages
+    return [*messages[:-1], last.model_copy(update={"content": blocks})]
+
+
+def _anthropic_prompt(sp: SystemPrompt):
+    system = _anthropic_system(sp)
+
+    def prompt(state) -> list:
+        return [system, *_with_breakpoint(_state_messages(state))]
+
+    return prompt
+
+
+# ---------------------------------------------------------------------------
+# Gemini explicit context cache
+# ---------------------------------------------------------------------------
+
+def _gemini_cache(llm, text: str) -> Optional[str]:
+    """Name of a CachedContent holding *text* as system instruction, or None."""
+    api_key = llm.google_api_key.get_secret_value() if llm.google_api_key else ""
+    key = hashlib.sha256(f"{llm.model}\0{api_key}\0{text}".encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    with _gemini_lock:
+        name, usable_until = _gemini_caches.get(key, (None, 0.0))
+        if now < usable_until:
+            return name
+    try:
+        from google import genai  # noqa: PLC0415
+        from google.genai import types  # noqa: PLC0415
+
+        cache = genai.Client(api_key=api_key).caches.create(
+            model=llm.model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=text,
+                ttl=f"{GEMINI_CACHE_TTL}s",
+                display_name="commandor-system-prompt",
+            ),
+        )
+        name, usable_until = cache.name, now + GEMINI_CACHE_TTL - _GEMINI_REUSE_MARGIN
+    except Exception:
+        name, usable_until = None, now + _GEMINI_RETRY_AFTER
+    with _gemini_lock:
+        _gemini_caches[key] = (name, usable_until)
+    return name
+
+
+def _with_context(messages: list, context: str) -> list:
+    """Copy of *messages* with *context* prepended to the newest human message."""
+    if not context.strip():
+        return messages
+    for i in range(len(messages) - 1, -1, -1):
+        msg = messages[i]
+        if isinstance(msg, HumanMessage) and isinstance(msg.content, str):
+            updated = msg.model_copy(update={"content": f"{context.strip()}\n\n{msg.content}"})
+            return [*messages[:i], updated, *messages[i + 1:]]
+    return messages
+
+
+def _gemini_prompt(sp: SystemPrompt):
+    def prompt(state) -> list:
+        return _with_context(_state_messages(state), sp.volatile)
+
+    return prompt
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def prepare(llm, system_prompt: Union[str, SystemPrompt], tools: bool = True):
+    """Return ``(llm, prompt)`` for create_react_agent with cache hints applied.
+
+    Args:
+        llm:           The chat model (pooled instances are never modified).
+        system_prompt: A SystemPrompt, or a plain string (no caching layout).
+        tools:         Whether the graph binds tools.
+    """
+    if isinstance(system_prompt, str):
+        return llm, system_prompt
+    llm_type = getattr(llm, "_llm_type", "")
+
+    if llm_type == "anthropic-chat" and _agent_flag("prompt_cache", True):
+        return llm, _anthropic_prompt(system_prompt)
+
+    if (llm_type == "chat-google-generative-ai" and not tools
+            and _agent_flag("gemini_context_cache", False)):
+        name = _gemini_cache(llm, system_prompt.stable + system_prompt.project)
+        if name is not None:
+            return llm.model_copy(update={"cached_content": name}), _gemini_prompt(system_prompt)
+
+    return llm, str(system_prompt)
+
+
+def cache_token_usage(usage: Optional[dict]) -> Tuple[int, int]:
+    """``(cache_read, cache_write)`` input tokens from a chunk's usage_metadata."""
+    details = (usage or {}).get("input_token_details") or {}
+    return int(details.get("cache_read") or 0), int(details.get("cache_creation") or 0)
@@ -18,7 +18,7 @@ from __future__ import annotations
 
 import uuid
 from dataclasses import dataclass, field
-from typing import Generator, Optional
+from typing import Callable, Generator, Optional
 
 from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
 
@@ -27,6 +27,8 @@ from .agent.executor import (
     _build_system_prompt,
     _extract_final_answer,
     _make_summarize_hook,
+    _record_cache_usage,
+    _record_command_usage,
     _resolve_provider_model,
 )
 from .agent.lc_graph import (
@@ -34,8 +36,16 @@ from .agent.lc_graph import (
     build_chat_graph,
     get_checkpointer,
 )
-from .agent.lc_models import build_model
-from .agent.lc_tools import ALL_TOOLS, _plan_tls
+from .agent.lc_models import build_model, warm_model
+from .config import get_config
+from .utils import background
+from .agent.lc_tools import (
+    ALL_TOOLS,
+    _event_queue,
+    _output_listener,
+    _plan_tls,
+    _session_key,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -101,18 +111,49 @@ class PlanItemDoneEvent:
     index: int
 
 
+@dataclass
+class FileDiffEvent:
+    """A tool changed a file.
+
+    Only content hashes travel with the event; the consumer renders the diff
+    on demand with ``diff_display.render_stored_diff(path, old_hash, new_hash)``
+    (or skips it entirely).
+    """
+    path: str
+    old_hash: str
+    new_hash: str
+
+
+@dataclass
+class CommandOutputEvent:
+    """New output from a command that is still running.
+
+    Not yielded by ``stream_agent_events``: the command blocks the graph, so
+    these are delivered through its ``on_live_event`` callback, from the
+    command's reader threads.
+    """
+    command: str
+    stream: str  # "stdout" or "stderr"
+    text: str
+
+
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _drain_plan_queue(plan_queue: list) -> Generator:
-    """Yield PlanCreatedEvent / PlanItemDoneEvent from the thread-local queue."""
+def _drain_plan_queue(plan_queue: list, metrics: dict | None = None) -> Generator:
+    """Yield plan and file-diff events pushed by the tools; command usage
+    goes into *metrics*."""
     while plan_queue:
         ev = plan_queue.pop(0)
-        if ev[0] == "plan_created":
+        if ev[0] == "command_usage":
+            _record_command_usage(metrics, ev[1])
+        elif ev[0] == "plan_created":
             yield PlanCreatedEvent(items=ev[1])
         elif ev[0] == "task_done":
             yield PlanItemDoneEvent(index=ev[1])
+        elif ev[0] == "file_diff":
+            yield FileDiffEvent(*ev[1])
 
 
 def _iter_graph(
@@ -134,7 +175,7 @@ def _iter_graph(
 
         # Drain plan events pushed by the previous tool execution
         if plan_queue:
-            yield from _drain_plan_queue(plan_queue)
+            yield from _drain_plan_queue(plan_queue, metrics)
 
         # ----------------------------------------------------------------
         # ToolMessage — result of a tool call
@@ -164,6 +205,7 @@ def _iter_graph(
         usage = getattr(chunk, "usage_metadata", None)
         if usage:
             last_usage = usage
+            _record_cache_usage(metrics, usage)
 
         # -- Thinking blocks --
         if isinstance(chunk.content, list):
@@ -209,7 +251,7 @@ def _iter_graph(
 
     # -- Drain any remaining plan events from the last tool call --
     if plan_queue:
-        yield from _drain_plan_queue(plan_queue)
+        yield from _drain_plan_queue(plan_queue, metrics)
 
     # -- Final answer fallback (Gemini often returns no streaming tokens) --
     if not accumulated.strip():
@@ -227,6 +269,22 @@ def _iter_graph(
 # Public streaming API
 # ---------------------------------------------------------------------------
 
+def preconnect(provider: Optional[str] = None, model: Optional[str] = None) -> None:
+    """Build the model and open a connection to its API ahead of the first task.
+
+    Blocking — run it in a background thread.  Does nothing when
+    ``ui.preconnect`` is off or no API key is configured; failures are
+    left for the real request to report.
+    """
+    try:
+        cfg = get_config()
+        if cfg.config and not cfg.config.ui.preconnect:
+            return
+        warm_model(*_resolve_provider_model(provider, model))
+    except Exception:
+        pass
+
+
 def stream_agent_events(
     task: str,
     mode: str = "agent",
@@ -234,12 +292,14 @@ def stream_agent_events(
     model: Optional[str] = None,
     thread_id: Optional[str] = None,
     session_name: Optional[str] = None,
+    on_live_event: Optional[Callable[[object], None]] = None,
 ) -> Generator:
     """Stream agent execution events for a Textual worker thread.
 
     Yields a sequence of typed events:
         StatusEvent, ThinkingEvent, TokenEvent, ToolCallEvent,
-        ToolOutputEvent, ErrorEvent, DoneEvent
+        ToolOutputEvent, FileDiffEvent, PlanCreatedEvent,
+        PlanItemDoneEvent, ErrorEvent, DoneEvent
 
     The final event is always DoneEvent (or ErrorEvent if something fails).
 
@@ -250,6 +310,8 @@ def stream_agent_events(
         model:        Model ID. Defaults to provider default.
         thread_id:    Session UUID for conversation memory.
         session_name: Human-readable name shown in UI headers.
+        on_live_event: Called (from a tool thread) with CommandOutputEvent
+                      while run_command_tool is still running.
     """
     try:
         resolved_provider, api_key, resolved_model = _resolve_provider_model(
@@ -277,8 +339,14 @@ def stream_agent_events(
     yield StatusEvent(message=f"{effective_mode}  ·  {resolved_model}"
                       + (f"  ·  {session_name}" if session_name else ""))
 
+    plan_queue: list = []
+    queue_token = _event_queue.set(plan_queue)
+    listener_token = _output_listener.set(
+        (lambda command, stream, text: on_live_event(CommandOutputEvent(command, stream, text)))
+        if on_live_event is not None else None
+    )
+    session_token = _session_key.set(scoped_tid)
     try:
-        plan_queue: list = []
         _plan_tls.queue = plan_queue
         if effective_mode == "chat":
             graph = build_chat_graph(llm, system_prompt)
@@ -310,6 +378,7 @@ def stream_agent_events(
                 yield from stream_agent_events(
                     task, mode=mode, provider=provider, model=model,
                     thread_id=thread_id, session_name=session_name,
+                    on_live_event=on_live_event,
                 )
                 return
             except Exception:
@@ -317,3 +386,7 @@ def stream_agent_events(
         yield ErrorEvent(message=f"Agent error: {e}")
     finally:
         _plan_tls.queue = None
+        _event_queue.reset(queue_token)
+        _output_listener.reset(listener_token)
+        _session_key.reset(session_token)
+        background.cleanup(scoped_tid)
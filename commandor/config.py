@@ -23,6 +23,15 @@ class AgentConfig:
     max_tokens_per_response: int = 4096
     confirm_destructive: bool = True
     auto_scroll: bool = True
+    repo_map_tokens: int = 1500  # 0 disables the repository map in the prompt
+    file_cache_mb: int = 64  # byte cap of the process-wide file content cache
+    tool_output_tokens: int = 3000  # per-result budget before tool output is spilled
+    persistent_shell: bool = False  # run commands in one long-lived bash per session
+    command_cache_mb: int = 64  # LRU size cap of the cache for run_command_tool(cache=True)
+    command_memory_limit_mb: int = 0  # RLIMIT_AS for agent commands (0 = unlimited)
+    command_cpu_limit_s: int = 0  # RLIMIT_CPU for agent commands (0 = unlimited)
+    prompt_cache: bool = True  # Anthropic cache_control breakpoints on the stable prompt prefix
+    gemini_context_cache: bool = False  # explicit Gemini CachedContent for tool-less (chat) graphs
 
 
 @dataclass
@@ -32,6 +41,7 @@ class UIConfig:
     color_scheme: str = "auto"
     show_thinking: bool = True
     verbose: bool = True
+    preconnect: bool = True  # TUI opens the provider connection at start and on /provider
 
 
 @dataclass
@@ -78,11 +88,21 @@ agent:
   max_tokens_per_response: 4096
   confirm_destructive: true
   auto_scroll: true
+  repo_map_tokens: 1500
+  file_cache_mb: 64
+  tool_output_tokens: 3000
+  persistent_shell: false
+  command_cache_mb: 64
+  command_memory_limit_mb: 0
+  command_cpu_limit_s: 0
+  prompt_cache: true
+  gemini_context_cache: false
 
 ui:
   color_scheme: auto
   show_thinking: true
   verbose: true
+  preconnect: true
 """
 
     def __init__(self):
@@ -145,11 +165,21 @@ ui:
                 "max_tokens_per_response": self.config.agent.max_tokens_per_response,
                 "confirm_destructive": self.config.agent.confirm_destructive,
                 "auto_scroll": self.config.agent.auto_scroll,
+                "repo_map_tokens": self.config.agent.repo_map_tokens,
+                "file_cache_mb": self.config.agent.file_cache_mb,
+                "tool_output_tokens": self.config.agent.tool_output_tokens,
+                "persistent_shell": self.config.agent.persistent_shell,
+                "command_cache_mb": self.config.agent.command_cache_mb,
+                "command_memory_limit_mb": self.config.agent.command_memory_limit_mb,
+                "command_cpu_limit_s": self.config.agent.command_cpu_limit_s,
+                "prompt_cache": self.config.agent.prompt_cache,
+                "gemini_context_cache": self.config.agent.gemini_context_cache,
             },
             "ui": {
                 "color_scheme": self.config.ui.color_scheme,
                 "show_thinking": self.config.ui.show_thinking,
                 "verbose": self.config.ui.verbose,
+                "preconnect": self.config.ui.preconnect,
             },
         }
 
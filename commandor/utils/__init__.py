@@ -1,16 +1,20 @@
 from .file_ops import (
     read_file,
+    read_many_files,
     write_file,
     edit_file,
+    multi_edit_file,
     create_directory,
     delete_file,
     list_directory,
     glob_files,
     search_in_files,
+    find_symbol,
     get_file_info,
 )
 from .shell import (
     run_command,
+    run_commands,
     get_working_directory,
     change_directory,
     get_environment_info,
@@ -21,15 +25,19 @@ from .shell import (
 
 __all__ = [
     'read_file',
+    'read_many_files',
     'write_file', 
     'edit_file',
+    'multi_edit_file',
     'create_directory',
     'delete_file',
     'list_directory',
     'glob_files',
     'search_in_files',
+    'find_symbol',
     'get_file_info',
     'run_command',
+    'run_commands',
     'get_working_directory',
     'change_directory',
     'get_environment_info',
@@ -0,0 +1,235 @@
+"""Background processes (dev servers, watchers) owned by an agent session.
+
+``run_command_tool`` blocks until the command exits, so a server could
+only be started with a short timeout, which then discarded the process
+and its output.  Here a process runs detached in its own process group.
+A reader thread keeps its merged stdout/stderr in a bounded ring of
+lines.  The agent can poll for new output, wait for a regex to show up,
+or kill the process.
+
+Processes are registered under the agent's session key.  Front ends call
+``cleanup(key)`` when a run ends, and everything left is killed at exit.
+
+Public API:
+    start(key, command, cwd=None) -> BackgroundProcess
+    get(key, pid) -> BackgroundProcess            (KeyError if unknown)
+    list_processes(key) -> list[BackgroundProcess]
+    cleanup(key=None)                             (None = every session)
+    compile_pattern(pattern) -> re.Pattern        (ValueError if invalid)
+    BackgroundProcess
+        .poll_new(max_lines) -> (lines, skipped)
+        .tail(n) -> list[str]
+        .wait_for(regex, timeout) -> matching line or None
+        .kill(grace=3.0) -> returncode
+        .status() -> str
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Pattern, Tuple
+
+# Retained output per process (bytes of line text) and per-line cap.
+MAX_BUFFER_BYTES = 256 * 1024
+MAX_LINE_CHARS = 4000
+
+_READ_SIZE = 64 * 1024
+
+
+class BackgroundProcess:
+    """A detached shell command with a ring buffer of its output lines."""
+
+    def __init__(self, command: str, cwd: Optional[str] = None) -> None:
+        self.command = command
+        self.cwd = cwd or os.getcwd()
+        self.started = time.time()
+        self.proc = subprocess.Popen(
+            command,
+            shell=True,
+            cwd=self.cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=(os.name == "posix"),
+        )
+        self.pid = self.proc.pid
+        self._lines: Deque[str] = deque()
+        self._bytes = 0
+        self._first = 0        # absolute index of self._lines[0]
+        self._cursor = 0       # absolute index of the next line poll_new returns
+        self._cond = threading.Condition()
+        self._eof = False
+        self._reader = threading.Thread(target=self._pump, daemon=True)
+        self._reader.start()
+
+    # ------------------------------------------------------------------
+
+    def _append(self, line: str) -> None:
+        if len(line) > MAX_LINE_CHARS:
+            line = line[:MAX_LINE_CHARS] + f"… [{len(line) - MAX_LINE_CHARS:,} more chars]"
+        self._lines.append(line)
+        self._bytes += len(line)
+        while self._bytes > MAX_BUFFER_BYTES and len(self._lines) > 1:
+            self._bytes -= len(self._lines.popleft())
+            self._first += 1
+
+    def _pump(self) -> None:
+        fd = self.proc.stdout.fileno()
+        partial = b""
+        try:
+            while True:
+                chunk = os.read(fd, _READ_SIZE)
+                if not chunk:
+                    break
+                parts = (partial + chunk).split(b"\n")
+                partial = parts.pop()
+                if len(partial) > MAX_LINE_CHARS * 4:
+                    parts.append(partial)
+                    partial = b""
+                if parts:
+                    with self._cond:
+                        for raw in parts:
+                            self._append(raw.decode("utf-8", "replace").rstrip("\r"))
+                        self._cond.notify_all()
+        except OSError:
+            pass
+        finally:
+            with self._cond:
+                if partial:
+                    self._append(partial.decode("utf-8", "replace"))
+                self._eof = True
+                self._cond.notify_all()
+            self.proc.stdout.close()
+
+    # ------------------------------------------------------------------
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.proc.poll()
+
+    def status(self) -> str:
+        rc = self.returncode
+        state = "running" if rc is None else f"exited with code {rc}"
+        return f"#{self.pid} [{state}, {time.time() - self.started:.0f}s] {self.command}"
+
+    def tail(self, n: int = 50) -> List[str]:
+        with self._cond:
+            return list(self._lines)[-n:] if n > 0 else []
+
+    def poll_new(self, max_lines: int = 50) -> Tuple[List[str], int]:
+        """Lines added since the previous poll (newest *max_lines*) and the
+        number of new lines skipped, including ones already rotated out."""
+        with self._cond:
+            end = self._first + len(self._lines)
+            start = max(self._cursor, self._first)
+            new = list(self._lines)[start - self._first:]
+            skipped = start - self._cursor
+            self._cursor = end
+        if len(new) > max_lines:
+            skipped += len(new) - max_lines
+            new = new[-max_lines:]
+        return new, skipped
+
+    def wait_for(self, regex: Pattern[str], timeout: float) -> Optional[str]:
+        """Block until a retained output line matches *regex*.
+
+        Returns the line, or None on timeout or when the process ends
+        without a match.
+        """
+        deadline = time.monotonic() + timeout
+        checked = self._first
+        with self._cond:
+            while True:
+                checked = max(checked, self._first)
+                for line in list(self._lines)[checked - self._first:]:
+                    if regex.search(line):
+                        return line
+                checked = self._first + len(self._lines)
+                remaining = deadline - time.monotonic()
+                if self._eof or remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def kill(self, grace: float = 3.0) -> Optional[int]:
+        """SIGTERM the process group, then SIGKILL after *grace* seconds."""
+        if self.returncode is None:
+            self._signal(force=False)
+            try:
+                self.proc.wait(timeout=grace)
+            except subprocess.TimeoutExpired:
+                self._signal(force=True)
+                self.proc.wait()
+        # Children that outlived the shell still hold the process group.
+        self._signal(force=True)
+        self._reader.join(timeout=1.0)
+        return self.proc.returncode
+
+    def _signal(self, force: bool) -> None:
+        try:
+            if os.name == "posix":
+                os.killpg(self.pid, signal.SIGKILL if force else signal.SIGTERM)
+            elif force:
+                self.proc.kill()
+            else:
+                self.proc.terminate()
+        except (OSError, ProcessLookupError):
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Per-session registry
+# ---------------------------------------------------------------------------
+
+_registry: Dict[str, Dict[int, BackgroundProcess]] = {}
+_registry_lock = threading.Lock()
+
+
+def start(key: str, command: str, cwd: Optional[str] = None) -> BackgroundProcess:
+    """Start *command* in the background under session *key*."""
+    bp = BackgroundProcess(command, cwd)
+    with _registry_lock:
+        _registry.setdefault(key, {})[bp.pid] = bp
+    return bp
+
+
+def get(key: str, pid: int) -> BackgroundProcess:
+    with _registry_lock:
+        try:
+            return _registry[key][pid]
+        except KeyError:
+            raise KeyError(f"No background process #{pid} in this session") from None
+
+
+def list_processes(key: str) -> List[BackgroundProcess]:
+    with _registry_lock:
+        return list(_registry.get(key, {}).values())
+
+
+def cleanup(key: Optional[str] = None) -> None:
+    """Kill the background processes of session *key* (all sessions if None)."""
+    with _registry_lock:
+        if key is None:
+            procs = [bp for group in _registry.values() for bp in group.values()]
+            _registry.clear()
+        else:
+            procs = list(_registry.pop(key, {}).values())
+    for bp in procs:
+        bp.kill(grace=1.0)
+
+
+atexit.register(cleanup)
+
+
+def compile_pattern(pattern: str) -> Pattern[str]:
+    """Compile a user-supplied regex (raises ValueError if invalid)."""
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid regex {pattern!r}: {e}") from None
@@ -0,0 +1,219 @@
+"""Result cache for commands the agent declares pure.
+
+Agents often run the same expensive read-only commands again, both within
+a session and across sessions: ``git log``, ``pip list``, or a full test
+run when nothing changed.  When ``run_command_tool`` is called with
+``cache=True``, the result is stored under a key built from:
+
+* the command line and the resolved working directory,
+* the values of the environment variables the caller names,
+* the contents of every file matched by the caller's input globs, and
+* inside a git work tree, ``git_context.repo_state``: HEAD, the branch ref
+  and the index, so a commit, checkout or ``git add`` gives a new key.
+
+The globs declare what the command reads, and at least one is required.
+Any change to a matched file, or a file that appears or disappears, gives
+a new key.  Files are hashed by content.  Each digest is memoised per
+(path, size, mtime) so unchanged inputs aren't read again.
+
+Entries live in ``~/.commandor/cmdcache/<key>.json``.  A hit bumps the
+file's mtime.  After each store, the least recently used entries are
+evicted until the directory fits ``agent.command_cache_mb``; 0 disables
+the cache.
+
+Public API:
+    cache_key(command, cwd, env_keys=(), inputs=()) -> str
+        (ValueError without input globs, or if they match more than
+        MAX_INPUT_FILES files)
+    lookup(key) -> CacheEntry | None
+    store(key, command, cwd, output) -> bool
+    format_age(seconds) -> str
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+CACHE_DIR = Path.home() / ".commandor" / "cmdcache"
+
+DEFAULT_MAX_MB = 64
+
+# Refuse input sets larger than this (e.g. "**/*" in a home directory).
+MAX_INPUT_FILES = 20_000
+
+_READ_SIZE = 1024 * 1024
+
+# path -> (size, mtime_ns, sha256) so unchanged inputs aren't re-read.
+_digests: Dict[str, Tuple[int, int, str]] = {}
+_MAX_DIGESTS = 100_000
+
+_lock = threading.Lock()
+
+
+@dataclass
+class CacheEntry:
+    command: str
+    cwd: str
+    output: str
+    created: float
+
+
+def _max_bytes() -> int:
+    mb = DEFAULT_MAX_MB
+    try:
+        from ..config import get_config  # noqa: PLC0415
+
+        cfg = get_config()
+        if cfg.config:
+            mb = cfg.config.agent.command_cache_mb
+    except Exception:
+        pass
+    return max(0, mb) * 1024 * 1024
+
+
+def _file_digest(path: str, st: os.stat_result) -> str:
+    with _lock:
+        memo = _digests.get(path)
+    if memo is not None and memo[:2] == (st.st_size, st.st_mtime_ns):
+        return memo[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_READ_SIZE), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _lock:
+        if len(_digests) >= _MAX_DIGESTS:
+            _digests.clear()
+        _digests[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+
+def _hash_inputs(h, cwd: str, inputs: Iterable[str]) -> None:
+    seen = 0
+    for pattern in sorted(set(inputs)):
+        h.update(f"\0glob\0{pattern}\0".encode("utf-8", "surrogatepass"))
+        matches = sorted(glob.glob(os.path.join(cwd, pattern), recursive=True))
+        for path in matches:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            seen += 1
+            if seen > MAX_INPUT_FILES:
+                raise ValueError(
+                    f"Cache inputs match more than {MAX_INPUT_FILES:,} files; "
+                    "narrow the globs"
+                )
+            try:
+                digest = _file_digest(path, st)
+            except OSError:
+                digest = "unreadable"
+            rel = os.path.relpath(path, cwd)
+            h.update(f"{rel}\0{digest}\0".encode("utf-8", "surrogatepass"))
+
+
+def cache_key(
+    command: str,
+    cwd: str,
+    env_keys: Iterable[str] = (),
+    inputs: Iterable[str] = (),
+) -> str:
+    """Key for *command* run in *cwd* with the given env subset and input globs."""
+    from .git_context import repo_state  # noqa: PLC0415
+
+    inputs = [p for p in inputs if p.strip()]
+    if not inputs:
+        raise ValueError(
+            "cache=True needs cache_inputs: the globs of the files the result depends on"
+        )
+    cwd = os.path.realpath(cwd)
+    h = hashlib.sha256()
+    env = {k: os.environ.get(k) for k in sorted(set(env_keys))}
+    h.update(json.dumps([command, cwd, env], sort_keys=True).encode("utf-8", "surrogatepass"))
+    state = repo_state(cwd)
+    if state is not None:
+        h.update(f"\0git\0{state[1]!r}\0".encode("utf-8", "surrogatepass"))
+    _hash_inputs(h, cwd, inputs)
+    return h.hexdigest()
+
+
+def lookup(key: str) -> Optional[CacheEntry]:
+    """Return the cached entry for *key* and mark it recently used."""
+    if _max_bytes() <= 0:
+        return None
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        with open(path, encoding="utf-8", errors="surrogatepass") as fh:
+            data = json.load(fh)
+        os.utime(path)
+        return CacheEntry(data["command"], data["cwd"], data["output"], data["created"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _evict(max_bytes: int) -> None:
+    entries = []
+    total = 0
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+    except OSError:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def store(key: str, command: str, cwd: str, output: str) -> bool:
+    """Cache *output* under *key*; False if caching is off or the write failed."""
+    max_bytes = _max_bytes()
+    if max_bytes <= 0:
+        return False
+    data = {"command": command, "cwd": cwd, "output": output, "created": time.time()}
+    payload = json.dumps(data, ensure_ascii=False).encode("utf-8", "surrogatepass")
+    if len(payload) > max_bytes:
+        return False
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp, path)
+    except OSError:
+        return False
+    _evict(max_bytes)
+    return True
+
+
+def format_age(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    if seconds < 86400:
+        return f"{seconds // 3600}h"
+    return f"{seconds // 86400}d"
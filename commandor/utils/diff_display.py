@@ -1,14 +1,49 @@
 """Rich-powered unified diff display.
 
+Diffs are computed on interned line ids (each distinct line becomes an int)
+with a patience diff: lines unique to both sides anchor the alignment, and
+the gaps between anchors are solved with Myers' O(ND) algorithm.  Common
+prefixes and suffixes are trimmed first, so a small edit to a huge file only
+diffs the edited region.  Cost stays bounded in two ways:
+
+* If a region needs more than ``MAX_EDIT_DISTANCE`` edits, it is shown as
+  one replace block instead of a minimal diff.
+* If the trimmed region has more than ``MAX_DIFF_LINES`` lines, no line
+  diff is computed.  A summary with approximate +/- counts is shown instead.
+
+Rendering shows at most ``MAX_RENDER_LINES`` diff lines per page.  A
+caller that can show later pages passes *more_hint* (e.g. the TUI's
+``/diff``), which the footer names together with the page count.  Without
+it, longer diffs are simply truncated.
+
+Tools do not render diffs themselves: they ``remember()`` the old and new
+contents and emit a file-diff event carrying the two hashes.  Whichever
+front end consumes the event calls ``render_stored_diff()`` only if it
+actually shows the diff.
+
 Public API:
     display_diff(path, old_content, new_content) -> None
         Prints a colour-coded before/after diff panel to the terminal.
         No-op if contents are identical.
+    remember(text) -> str / recall(digest) -> str | None
+        Bounded in-memory content store keyed by SHA-1 hex digest.
+    render_stored_diff(path, old_hash, new_hash, page=0, page_size=MAX_RENDER_LINES, more_hint="")
+        render_diff() over two remembered contents.
+    render_diff(path, old_content, new_content, page=0, page_size=MAX_RENDER_LINES, more_hint="")
+        -> Panel | None
+        The panel display_diff prints; *page* (0-based, clamped to the
+        last page) selects later pages.
+    diff_opcodes(a, b) -> list[tuple[str, int, int, int, int]] | None
+        difflib-style opcodes for two line lists, or None if too large.
 """
 
 from __future__ import annotations
 
-import difflib
+import hashlib
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 from rich.console import Console
 from rich.panel import Panel
@@ -16,55 +51,398 @@ from rich.text import Text
 
 _console = Console()
 
+# Beyond this many lines (after trimming the common prefix/suffix) only a
+# summary is shown.
+MAX_DIFF_LINES = 50_000
 
-def display_diff(path: str, old_content: str, new_content: str) -> None:
-    """Print a coloured unified diff of old_content → new_content in a Rich Panel.
+# Myers gives up on a region after this many edits and reports it as one
+# replace block.
+MAX_EDIT_DISTANCE = 1_000
 
-    Colours:
-        bold green  — added lines (+)
-        bold red    — removed lines (-)
-        cyan        — hunk headers (@@)
-        dim         — context lines / file headers (--- / +++)
+# Diff lines rendered per page.
+MAX_RENDER_LINES = 400
 
-    Args:
-        path:        File path shown in the panel title.
-        old_content: Original file contents (empty string for new files).
-        new_content: Updated file contents.
+CONTEXT_LINES = 3
+
+# Total size of remembered file contents awaiting a (lazy) render.
+MAX_STORED_BYTES = 64 * 1024 * 1024
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+# ---------------------------------------------------------------------------
+# Content store
+# ---------------------------------------------------------------------------
+
+_store_lock = threading.Lock()
+_store: "OrderedDict[str, str]" = OrderedDict()
+_store_bytes = 0
+
+
+def remember(text: str) -> str:
+    """Keep *text* for a later render_stored_diff() and return its digest."""
+    global _store_bytes
+    digest = hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+    with _store_lock:
+        if digest in _store:
+            _store.move_to_end(digest)
+            return digest
+        _store[digest] = text
+        _store_bytes += len(text)
+        while _store_bytes > MAX_STORED_BYTES and len(_store) > 1:
+            _, old = _store.popitem(last=False)
+            _store_bytes -= len(old)
+    return digest
+
+
+def recall(digest: str) -> Optional[str]:
+    """Return remembered text for *digest*, or None if it was evicted."""
+    with _store_lock:
+        return _store.get(digest)
+
+
+# ---------------------------------------------------------------------------
+# Diff computation
+# ---------------------------------------------------------------------------
+
+def _intern(a: Sequence[str], b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    ids: Dict[str, int] = {}
+    return (
+        [ids.setdefault(line, len(ids)) for line in a],
+        [ids.setdefault(line, len(ids)) for line in b],
+    )
+
+
+def _myers(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int,
+           out: List[Opcode]) -> bool:
+    """Append minimal edit opcodes for a[alo:ahi] vs b[blo:bhi]; False if too costly."""
+    n, m = ahi - alo, bhi - blo
+    max_d = min(n + m, MAX_EDIT_DISTANCE)
+    off = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace: List[List[int]] = []
+    for d in range(max_d + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+                x = v[off + k + 1]
+            else:
+                x = v[off + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[off + k] = x
+            if x >= n and y >= m:
+                _backtrack(trace, off, n, m, d, alo, blo, out)
+                return True
+    return False
+
+
+def _backtrack(trace: List[List[int]], off: int, x: int, y: int, d_end: int,
+               alo: int, blo: int, out: List[Opcode]) -> None:
+    steps: List[Tuple[str, int, int]] = []  # (tag, a index, b index), reversed
+    for d in range(d_end, 0, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[off + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            steps.append(("equal", x, y))
+        if prev_k == k + 1:
+            steps.append(("insert", x, prev_y))
+        else:
+            steps.append(("delete", prev_x, y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        steps.append(("equal", x, y))
+    for tag, i, j in reversed(steps):
+        i1, j1 = alo + i, blo + j
+        i2 = i1 + (tag != "insert")
+        j2 = j1 + (tag != "delete")
+        _emit(out, tag, i1, i2, j1, j2)
+
+
+def _emit(out: List[Opcode], tag: str, i1: int, i2: int, j1: int, j2: int) -> None:
+    """Append an opcode, merging it with the previous one when possible."""
+    if i1 == i2 and j1 == j2:
+        return
+    if out:
+        ptag, pi1, pi2, pj1, pj2 = out[-1]
+        if pi2 == i1 and pj2 == j1:
+            if ptag == tag:
+                out[-1] = (tag, pi1, i2, pj1, j2)
+                return
+            if ptag != "equal" and tag != "equal":
+                out[-1] = ("replace", pi1, i2, pj1, j2)
+                return
+    out.append((tag, i1, i2, j1, j2))
+
+
+def _unique_anchors(a: List[int], alo: int, ahi: int,
+                    b: List[int], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """Longest increasing run of lines that occur exactly once on each side."""
+    ca = Counter(a[alo:ahi])
+    cb = Counter(b[blo:bhi])
+    pos_b = {b[j]: j for j in range(blo, bhi) if cb[b[j]] == 1}
+    pairs = [
+        (i, pos_b[a[i]]) for i in range(alo, ahi)
+        if ca[a[i]] == 1 and a[i] in pos_b
+    ]
+    if not pairs:
+        return []
+    # Patience sorting: LIS over the b positions.
+    tails: List[int] = []
+    tail_idx: List[int] = []
+    prev = [-1] * len(pairs)
+    for idx, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_idx.append(idx)
+        else:
+            tails[k] = j
+            tail_idx[k] = idx
+        prev[idx] = tail_idx[k - 1] if k else -1
+    out: List[Tuple[int, int]] = []
+    idx = tail_idx[-1]
+    while idx != -1:
+        out.append(pairs[idx])
+        idx = prev[idx]
+    out.reverse()
+    return out
+
+
+def _diff(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int,
+          out: List[Opcode]) -> None:
+    # Common prefix / suffix.
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        _emit(out, "equal", alo, alo + 1, blo, blo + 1)
+        alo += 1
+        blo += 1
+    tail = 0
+    while alo < ahi - tail and blo < bhi - tail and a[ahi - tail - 1] == b[bhi - tail - 1]:
+        tail += 1
+    ahi_t, bhi_t = ahi - tail, bhi - tail
+
+    if alo == ahi_t or blo == bhi_t:
+        _emit(out, "delete" if alo < ahi_t else "insert", alo, ahi_t, blo, bhi_t)
+    else:
+        anchors = _unique_anchors(a, alo, ahi_t, b, blo, bhi_t)
+        if anchors:
+            i, j = alo, blo
+            for ai, bj in anchors:
+                _diff(a, i, ai, b, j, bj, out)
+                _emit(out, "equal", ai, ai + 1, bj, bj + 1)
+                i, j = ai + 1, bj + 1
+            _diff(a, i, ahi_t, b, j, bhi_t, out)
+        elif not _myers(a, alo, ahi_t, b, blo, bhi_t, out):
+            _emit(out, "replace", alo, ahi_t, blo, bhi_t)
+
+    if tail:
+        _emit(out, "equal", ahi_t, ahi, bhi_t, bhi)
+
+
+def diff_opcodes(a: Sequence[str], b: Sequence[str]) -> Optional[List[Opcode]]:
+    """Return difflib-style opcodes turning *a* into *b*.
+
+    Returns None when the changed region exceeds MAX_DIFF_LINES.
     """
-    if old_content == new_content:
+    lo = 0
+    while lo < len(a) and lo < len(b) and a[lo] == b[lo]:
+        lo += 1
+    hi = 0
+    while hi < len(a) - lo and hi < len(b) - lo and a[-1 - hi] == b[-1 - hi]:
+        hi += 1
+    if (len(a) - lo - hi) + (len(b) - lo - hi) > MAX_DIFF_LINES:
+        return None
+
+    ia, ib = _intern(a[lo:len(a) - hi], b[lo:len(b) - hi])
+    out: List[Opcode] = []
+    _emit(out, "equal", 0, lo, 0, lo)
+    body: List[Opcode] = []
+    _diff(ia, 0, len(ia), ib, 0, len(ib), body)
+    for tag, i1, i2, j1, j2 in body:
+        _emit(out, tag, i1 + lo, i2 + lo, j1 + lo, j2 + lo)
+    _emit(out, "equal", len(a) - hi, len(a), len(b) - hi, len(b))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def _grouped(opcodes: List[Opcode], n: int) -> Iterator[List[Opcode]]:
+    """Hunks of opcodes with *n* lines of context (like difflib's grouping)."""
+    codes = list(opcodes)
+    if not codes:
         return
+    if codes[0][0] == "equal":
+        _, i1, i2, j1, j2 = codes[0]
+        codes[0] = ("equal", max(i1, i2 - n), i2, max(j1, j2 - n), j2)
+    if codes[-1][0] == "equal":
+        _, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = ("equal", i1, min(i2, i1 + n), j1, min(j2, j1 + n))
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
 
-    lines = list(
-        difflib.unified_diff(
-            old_content.splitlines(keepends=True),
-            new_content.splitlines(keepends=True),
-            fromfile=f"a/{path}",
-            tofile=f"b/{path}",
-            lineterm="",
-        )
+
+def _diff_lines(a: List[str], b: List[str], opcodes: List[Opcode]) -> Iterator[Tuple[str, str]]:
+    """Yield ``(style, text)`` for each rendered unified-diff line."""
+    for group in _grouped(opcodes, CONTEXT_LINES):
+        i1, i2 = group[0][1], group[-1][2]
+        j1, j2 = group[0][3], group[-1][4]
+        yield "cyan", f"@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@"
+        for tag, ai1, ai2, bj1, bj2 in group:
+            if tag == "equal":
+                for line in a[ai1:ai2]:
+                    yield "dim", " " + line
+                continue
+            for line in a[ai1:ai2]:
+                yield "bold red", "-" + line
+            for line in b[bj1:bj2]:
+                yield "bold green", "+" + line
+
+
+def _summary(path: str, a: List[str], b: List[str]) -> Panel:
+    ca, cb = Counter(a), Counter(b)
+    added = sum((cb - ca).values())
+    removed = sum((ca - cb).values())
+    text = Text()
+    text.append(f"{len(a)} → {len(b)} lines   ", style="dim")
+    text.append(f"+{added}", style="bold green")
+    text.append(" ")
+    text.append(f"-{removed}", style="bold red")
+    text.append("  (approximate; file too large for a line diff)", style="dim")
+    return Panel(
+        text,
+        title=f"[yellow]diff: {path}[/yellow]",
+        border_style="yellow",
+        padding=(0, 1),
     )
 
-    if not lines:
-        return
 
+def render_diff(
+    path: str,
+    old_content: str,
+    new_content: str,
+    page: int = 0,
+    page_size: int = MAX_RENDER_LINES,
+    more_hint: str = "",
+) -> Optional[Panel]:
+    """Build the diff panel for one page, or None if nothing changed.
+
+    *more_hint* tells the reader how to see the next page; it is shown,
+    with the page count, when lines follow this page.
+    """
+    if old_content == new_content:
+        return None
+    a = old_content.splitlines()
+    b = new_content.splitlines()
+    opcodes = diff_opcodes(a, b)
+    if opcodes is None:
+        return _summary(path, a, b)
+
+    pages = max(1, -(-_count_lines(opcodes) // page_size))
+    page = min(max(page, 0), pages - 1)
+    first = page * page_size
     text = Text()
-    for line in lines:
-        if line.startswith("+++") or line.startswith("---"):
-            text.append(line + "\n", style="dim")
-        elif line.startswith("+"):
-            text.append(line + "\n", style="bold green")
-        elif line.startswith("-"):
-            text.append(line + "\n", style="bold red")
-        elif line.startswith("@@"):
-            text.append(line + "\n", style="cyan")
-        else:
-            text.append(line + "\n", style="dim")
+    text.append(f"--- a/{path}\n+++ b/{path}\n", style="dim")
+    total = 0
+    for style, line in _diff_lines(a, b, opcodes):
+        if total >= first + page_size:
+            break
+        if total >= first:
+            text.append(line + "\n", style=style)
+        total += 1
+
+    if total == 0 and page == 0:
+        text.append("(only line endings or the trailing newline changed)\n", style="dim")
+
+    remaining = max(0, _count_lines(opcodes) - (first + page_size))
+    if remaining > 0 and more_hint:
+        text.append(
+            f"… {remaining} more diff line(s) (page {page + 1} of {pages}; {more_hint})\n",
+            style="yellow",
+        )
+    elif remaining > 0:
+        text.append(f"… {remaining} more diff line(s) not shown\n", style="yellow")
+    elif page > 0:
+        text.append(f"(page {page + 1} of {pages})\n", style="yellow")
+
+    return Panel(
+        text,
+        title=f"[yellow]diff: {path}[/yellow]",
+        border_style="yellow",
+        padding=(0, 1),
+    )
+
 
-    _console.print(
-        Panel(
-            text,
+def render_stored_diff(
+    path: str,
+    old_hash: str,
+    new_hash: str,
+    page: int = 0,
+    page_size: int = MAX_RENDER_LINES,
+    more_hint: str = "",
+) -> Optional[Panel]:
+    """render_diff() for two contents previously passed to remember()."""
+    if old_hash == new_hash:
+        return None
+    old, new = recall(old_hash), recall(new_hash)
+    if old is None or new is None:
+        return Panel(
+            Text("(contents no longer cached — diff unavailable)", style="dim"),
             title=f"[yellow]diff: {path}[/yellow]",
             border_style="yellow",
             padding=(0, 1),
         )
-    )
+    return render_diff(path, old, new, page, page_size, more_hint)
+
+
+def _count_lines(opcodes: List[Opcode]) -> int:
+    """Number of rendered diff lines (no text built)."""
+    total = 0
+    for group in _grouped(opcodes, CONTEXT_LINES):
+        total += 1
+        for tag, i1, i2, j1, j2 in group:
+            total += (i2 - i1) if tag == "equal" else (i2 - i1) + (j2 - j1)
+    return total
+
+
+def display_diff(path: str, old_content: str, new_content: str) -> None:
+    """Print a coloured unified diff of old_content → new_content in a Rich Panel.
+
+    Colours:
+        bold green  — added lines (+)
+        bold red    — removed lines (-)
+        cyan        — hunk headers (@@)
+        dim         — context lines / file headers (--- / +++)
+
+    Large diffs are cut after MAX_RENDER_LINES lines; files whose changed
+    region exceeds MAX_DIFF_LINES get a summary panel instead.
+
+    Args:
+        path:        File path shown in the panel title.
+        old_content: Original file contents (empty string for new files).
+        new_content: Updated file contents.
+    """
+    panel = render_diff(path, old_content, new_content)
+    if panel is not None:
+        _console.print(panel)
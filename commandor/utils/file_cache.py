@@ -0,0 +1,186 @@
+"""Process-wide cache of file contents shared by the file tools.
+
+A write or edit used to read the target up to three times (old content for
+the diff, the edit itself, new content for the diff).  With the cache,
+the first read fills an entry keyed by resolved path.  Later reads only
+``stat`` the file, and the entry stays valid while ``(st_mtime_ns,
+st_size)`` is unchanged.  Writes made through the cache update the entry in
+place, so the post-write read never touches the disk.
+
+Entries are evicted least-recently-used once the cached text exceeds
+``agent.file_cache_mb`` (default 64 MB).
+
+There is one cache per process rather than one per agent session.  Every
+entry is revalidated against the file's ``stat`` before use, so an entry
+another session filled (or a file changed outside the agent) can never be
+served stale.  Sharing is therefore safe, and one cap bounds the memory
+no matter how many sessions the TUI has open.
+
+Public API:
+    get_file_cache() -> FileCache
+        Process-wide cache, sized from the config on first use.
+    FileCache
+        .read(path) -> str, .write(path, text, create_dirs=True, atomic=False),
+        .invalidate(path), .clear()
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FileCache:
+    """LRU map of ``realpath -> (mtime_ns, size, text)`` under a byte cap."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, key: str, st: os.stat_result, text: str) -> None:
+        with self._lock:
+            self._drop(key)
+            if st.st_size > self.max_bytes:
+                return
+            self._entries[key] = (st.st_mtime_ns, st.st_size, text)
+            self._bytes += st.st_size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_m, size, _t) = self._entries.popitem(last=False)
+                self._bytes -= size
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def read(self, path) -> str:
+        """Return the text of *path* (universal newlines, like ``read_text``).
+
+        Raises FileNotFoundError/OSError/UnicodeDecodeError like
+        ``Path.read_text``.
+        """
+        key = os.path.realpath(path)
+        st = os.stat(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        with open(key, "r", encoding="utf-8") as fh:
+            st = os.fstat(fh.fileno())
+            text = fh.read()
+        self._store(key, st, text)
+        return text
+
+    def write(self, path, text: str, create_dirs: bool = True, atomic: bool = False) -> None:
+        """Write *text* to *path* and keep it cached as the current content.
+
+        With ``atomic=True`` the text goes to a temporary file next to the
+        target (which keeps the target's mode) and is renamed over it, so
+        readers never see a half-written file.  Text that already contains
+        ``\r`` is written verbatim; other text gets the platform's newlines.
+        """
+        newline = "" if "\r" in text else None
+        p = Path(path)
+        if create_dirs:
+            p.parent.mkdir(parents=True, exist_ok=True)
+        key = os.path.realpath(p)
+        if atomic:
+            fd, tmp = tempfile.mkstemp(prefix=".commandor-", dir=os.path.dirname(key))
+            try:
+                with open(fd, "w", encoding="utf-8", newline=newline) as fh:
+                    fh.write(text)
+                try:
+                    shutil.copymode(key, tmp)
+                except OSError:
+                    # New file: mkstemp made it 0600, give it the usual mode.
+                    os.chmod(tmp, 0o666 & ~_umask())
+                os.replace(tmp, key)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        else:
+            with open(p, "w", encoding="utf-8", newline=newline) as fh:
+                fh.write(text)
+        if "\r" in text:
+            # Reading back would normalise line endings; let the next read do it.
+            self.invalidate(key)
+            return
+        try:
+            self._store(key, os.stat(key), text)
+        except OSError:
+            self.invalidate(key)
+
+    def invalidate(self, path) -> None:
+        with self._lock:
+            self._drop(os.path.realpath(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def _read_umask() -> int:
+    # os.umask can only read the mask by replacing it, which is safe here
+    # because modules are imported before any worker thread starts.
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+_IMPORT_UMASK = _read_umask()
+
+
+def _umask() -> int:
+    """Current process umask, read without changing process-wide state.
+
+    Linux reports it in ``/proc/self/status``; elsewhere the mask seen at
+    import is used.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="ascii", errors="replace") as fh:
+            for line in fh:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    return _IMPORT_UMASK
+
+
+_cache: Optional[FileCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_file_cache() -> FileCache:
+    """Return the process-wide FileCache, creating it from the config."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_bytes = DEFAULT_MAX_BYTES
+            try:
+                from ..config import get_config  # noqa: PLC0415
+
+                cfg = get_config()
+                if cfg.config:
+                    max_bytes = cfg.config.agent.file_cache_mb * 1024 * 1024
+            except Exception:
+                pass
+            _cache = FileCache(max_bytes)
+        return _cache
@@ -24,21 +24,119 @@ def read_file(path: str, limit: Optional[int] = None) -> str:
         raise ValueError(f"Not a file: {path}")
     
     try:
+        if not limit:
+            from .file_cache import get_file_cache
+            return get_file_cache().read(p)
         with open(p, 'r', encoding='utf-8') as f:
-            if limit:
-                lines = []
-                for i, line in enumerate(f):
-                    if i >= limit:
-                        lines.append(f"\n... (truncated, showing first {limit} lines)")
-                        break
-                    lines.append(line)
-                return ''.join(lines)
-            return f.read()
+            lines = []
+            for i, line in enumerate(f):
+                if i >= limit:
+                    lines.append(f"\n... (truncated, showing first {limit} lines)")
+                    break
+                lines.append(line)
+            return ''.join(lines)
     except UnicodeDecodeError:
         with open(p, 'rb') as f:
             return f"<Binary file: {path}>"
 
 
+def _read_range(entry) -> tuple:
+    """Resolve one read_many_files entry to ``(path, start, end, text, total)``."""
+    from .line_index import read_lines
+    
+    if isinstance(entry, str):
+        path, onset, offset = entry, 0, None
+    elif isinstance(entry, dict) and isinstance(entry.get("path"), str):
+        path, onset, offset = entry["path"], entry.get("onset", 0) or 0, entry.get("offset")
+    else:
+        raise ValueError(f"Expected a path or {{\"path\": ...}}, got {entry!r}")
+    
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    if not p.is_file():
+        raise ValueError(f"Not a file: {path}")
+    
+    start = max(0, int(onset))
+    end_req = int(offset) + 1 if offset is not None else None
+    try:
+        text, total = read_lines(str(p), start, end_req)
+    except UnicodeDecodeError:
+        return path, 0, 0, f"<Binary file: {path}>", 0
+    end = min(end_req, total) if end_req is not None else total
+    return path, start, end, text, total
+
+
+def read_many_files(entries: list, max_chars: int = 80_000) -> str:
+    """Read several files (or line ranges) concurrently into one result
+    
+    Files are read on a thread pool and returned in request order, each
+    under a ``==> path <==`` header.  The total output is capped at
+    *max_chars*: every file gets an equal share, and space a short file
+    does not use goes to the longer ones.  Cut files end on a line boundary
+    and are listed at the end.
+    
+    Args:
+        entries: Paths, or {"path", "onset", "offset"} dicts (0-indexed,
+                 offset inclusive) as accepted by read_file_tool
+        max_chars: Total size budget for file contents
+    
+    Returns:
+        Combined per-file contents
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if not entries:
+        raise ValueError("No files given")
+    
+    def _safe(entry):
+        try:
+            return _read_range(entry)
+        except (FileNotFoundError, ValueError, OSError) as e:
+            return e
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(entries))) as pool:
+        results = list(pool.map(_safe, entries))
+    
+    # Water-fill the budget: smallest files first, each takes at most an
+    # equal share of what is left.
+    sizes = [len(r[3]) if isinstance(r, tuple) else 0 for r in results]
+    allowed = [0] * len(results)
+    remaining = max_chars
+    order = sorted(range(len(results)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        allowed[i] = min(sizes[i], remaining // (len(order) - n))
+        remaining -= allowed[i]
+    
+    out = []
+    truncated = []
+    for i, r in enumerate(results):
+        if isinstance(r, Exception):
+            out.append(f"==> {entries[i]} <==\nError: {r}")
+            continue
+        path, start, end, text, total = r
+        if len(text) > allowed[i]:
+            # End on a line boundary unless a single line exceeds the share.
+            cut = text.rfind("\n", 0, allowed[i]) + 1 or allowed[i]
+            text = text[:cut]
+            shown_end = start + text.count("\n")
+            truncated.append(f"{path} (lines {start}–{shown_end - 1} of {total} shown)")
+            header = f"==> {path} [Lines {start}–{shown_end - 1} of {total} total, truncated] <=="
+        elif start > 0 or end < total:
+            header = f"==> {path} [Lines {start}–{end - 1} of {total} total] <=="
+        else:
+            header = f"==> {path} <=="
+        out.append(header + "\n" + text.rstrip("\n"))
+    
+    if truncated:
+        out.append(
+            f"[Output budget of {max_chars} characters reached; truncated: "
+            + "; ".join(truncated)
+            + ". Use read_file_tool with onset/offset for the rest.]"
+        )
+    return "\n\n".join(out)
+
+
 def write_file(path: str, content: str, create_dirs: bool = True) -> str:
     """Write content to file
     
@@ -50,13 +148,9 @@ def write_file(path: str, content: str, create_dirs: bool = True) -> str:
     Returns:
         Success message
     """
-    p = Path(path)
-    
-    if create_dirs:
-        p.parent.mkdir(parents=True, exist_ok=True)
+    from .file_cache import get_file_cache
     
-    with open(p, 'w', encoding='utf-8') as f:
-        f.write(content)
+    get_file_cache().write(path, content, create_dirs=create_dirs)
     
     return f"Successfully wrote to {path}"
 
@@ -72,25 +166,82 @@ def edit_file(path: str, old: str, new: str) -> str:
     Returns:
         Success message
     """
+    from .file_cache import get_file_cache
+    
     p = Path(path)
     
     if not p.exists():
         raise FileNotFoundError(f"File not found: {path}")
     
-    with open(p, 'r', encoding='utf-8') as f:
-        content = f.read()
+    cache = get_file_cache()
+    content = cache.read(p)
     
     if old not in content:
         raise ValueError(f"Text not found in file: {old[:50]}...")
     
     new_content = content.replace(old, new)
     
-    with open(p, 'w', encoding='utf-8') as f:
-        f.write(new_content)
+    cache.write(p, new_content, create_dirs=False)
     
     return f"Successfully edited {path}"
 
 
+def multi_edit_file(path: str, edits: List[dict]) -> str:
+    """Apply several replacements to one file in a single atomic write
+    
+    Edits are applied in order to one in-memory copy; each replaces the
+    first occurrence of its ``old`` text in the result of the previous ones.
+    Nothing is written unless every edit matches.
+    
+    Args:
+        path: File path to edit
+        edits: List of {"old": ..., "new": ...} dicts
+    
+    Returns:
+        Success message
+    
+    Raises:
+        ValueError: listing every edit whose ``old`` text was not found
+    """
+    from .file_cache import get_file_cache
+    
+    p = Path(path)
+    
+    if not p.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    if not edits:
+        raise ValueError("No edits given")
+    
+    cache = get_file_cache()
+    original = cache.read(p)
+    content = original
+    failures = []
+    for i, edit in enumerate(edits):
+        if not isinstance(edit, dict) or not isinstance(edit.get("old"), str) \
+                or not isinstance(edit.get("new"), str):
+            failures.append(f"  edit {i}: expected {{\"old\": str, \"new\": str}}")
+            continue
+        old, new = edit["old"], edit["new"]
+        if not old:
+            failures.append(f"  edit {i}: empty 'old' text")
+        elif old in content:
+            content = content.replace(old, new, 1)
+        elif old in original:
+            failures.append(f"  edit {i}: text no longer present after earlier edits: {old[:50]!r}")
+        else:
+            failures.append(f"  edit {i}: text not found in file: {old[:50]!r}")
+    
+    if failures:
+        raise ValueError(
+            f"{len(failures)} of {len(edits)} edit(s) failed; file left unchanged:\n"
+            + "\n".join(failures)
+        )
+    
+    cache.write(p, content, create_dirs=False, atomic=True)
+    
+    return f"Successfully applied {len(edits)} edit(s) to {path}"
+
+
 def create_directory(path: str) -> str:
     """Create a directory
     
@@ -158,6 +309,9 @@ def list_directory(path: str = ".") -> str:
 def glob_files(pattern: str, path: str = ".") -> str:
     """Find files matching a glob pattern
     
+    Walks the tree once with ``walker.iter_files``, so ignored directories
+    and ``.gitignore``d files are skipped.
+    
     Args:
         pattern: Glob pattern (e.g., "*.py")
         path: Directory to search in
@@ -165,19 +319,21 @@ def glob_files(pattern: str, path: str = ".") -> str:
     Returns:
         List of matching files
     """
+    from .walker import glob_to_regex, iter_files
+    
     p = Path(path)
     
     if not p.exists():
         raise FileNotFoundError(f"Directory not found: {path}")
     
-    files = list(p.glob(pattern))
+    regex = glob_to_regex(pattern)
+    files = [rel for rel in iter_files(p) if regex.match(rel)]
     
     if not files:
         return f"No files matching {pattern}"
     
     result = [f"Found {len(files)} file(s):"]
-    for f in sorted(files)[:50]:
-        rel = f.relative_to(p) if f.is_relative_to(p) else f
+    for rel in sorted(files)[:50]:
         result.append(f"  {rel}")
     
     if len(files) > 50:
@@ -189,6 +345,10 @@ def glob_files(pattern: str, path: str = ".") -> str:
 def search_in_files(pattern: str, path: str = ".", file_pattern: str = "*") -> str:
     """Search for pattern in files
     
+    Candidate files come from the persistent trigram index when it is
+    available (see ``trigram_index``); the scan itself runs on the fastest
+    available backend (see ``search_backends``).
+    
     Args:
         pattern: Text pattern to search for
         path: Directory to search in
@@ -198,6 +358,9 @@ def search_in_files(pattern: str, path: str = ".", file_pattern: str = "*") -> s
         Search results
     """
     import re
+    from .search_backends import run_search
+    from .trigram_index import candidate_files
+    from .walker import file_pattern_regex
     
     p = Path(path)
     
@@ -209,21 +372,25 @@ def search_in_files(pattern: str, path: str = ".", file_pattern: str = "*") -> s
     except re.error:
         regex = re.compile(re.escape(pattern))
     
+    base = p.resolve()
+    files = None
+    candidates = candidate_files(p, regex)
+    if candidates is not None:
+        files = []
+        wanted = file_pattern_regex(file_pattern)
+        for f in candidates:
+            if wanted.match(f.relative_to(base).as_posix()):
+                files.append(f)
+    
+    found = run_search(regex.pattern, base, file_pattern, files)
+    
     matches = []
-    for f in p.rglob(file_pattern):
-        if f.is_file():
-            try:
-                with open(f, 'r', encoding='utf-8') as file:
-                    for i, line in enumerate(file, 1):
-                        if regex.search(line):
-                            matches.append(f"{f}:{i}: {line.rstrip()}")
-                            if len(matches) >= 100:
-                                break
-            except:
-                pass
-        
-        if len(matches) >= 100:
-            break
+    for f, i, line in found:
+        try:
+            shown = p / Path(f).resolve().relative_to(base)
+        except ValueError:
+            shown = Path(f)
+        matches.append(f"{shown}:{i}: {line}")
     
     if not matches:
         return f"No matches for '{pattern}'"
@@ -237,6 +404,64 @@ def search_in_files(pattern: str, path: str = ".", file_pattern: str = "*") -> s
     return "\n".join(result)
 
 
+def find_symbol(name: str, path: str = ".", include_references: bool = True) -> str:
+    """Locate definitions (and optionally references) of a symbol
+    
+    Definitions come from the persistent symbol index (see ``symbol_index``);
+    references are a whole-word search over trigram-index candidates.
+    
+    Args:
+        name: Symbol name, optionally qualified (e.g. "Class.method")
+        path: Directory to search in
+        include_references: Also list whole-word occurrences
+    
+    Returns:
+        Definitions and references
+    """
+    from .symbol_index import find_definitions, find_references
+    
+    p = Path(path)
+    
+    if not p.exists():
+        raise FileNotFoundError(f"Directory not found: {path}")
+    
+    base = p.resolve()
+    project, defs = find_definitions(name, base)
+    
+    def _shown(f) -> Path:
+        try:
+            return p / Path(f).resolve().relative_to(base)
+        except ValueError:
+            return Path(f)
+    
+    result = []
+    def_lines = set()
+    if defs:
+        result.append(f"Definitions of '{name}' ({len(defs)}):")
+        for sym in defs[:50]:
+            full = project / sym.path
+            def_lines.add((str(full), sym.line))
+            result.append(f"  {_shown(full)}:{sym.line}  {sym.kind}  {sym.qualname}")
+        if len(defs) > 50:
+            result.append(f"  ... and {len(defs) - 50} more")
+    else:
+        result.append(f"No definitions found for '{name}'")
+    
+    if include_references:
+        refs = [
+            (f, i, line) for f, i, line in find_references(name, base, limit=100)
+            if (str(Path(f).resolve()), i) not in def_lines
+        ]
+        if refs:
+            result.append("")
+            result.append(f"References ({len(refs)}):")
+            result.extend(f"  {_shown(f)}:{i}: {line.strip()}" for f, i, line in refs[:50])
+            if len(refs) > 50:
+                result.append(f"  ... and {len(refs) - 50} more")
+    
+    return "\n".join(result)
+
+
 def get_file_info(path: str) -> str:
     """Get file information
     
@@ -260,8 +485,7 @@ def get_file_info(path: str) -> str:
     ]
     
     if p.is_file():
-        with open(p, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = sum(1 for _ in f)
-        info.append(f"Lines: {lines}")
+        from .line_index import get_line_index
+        info.append(f"Lines: {get_line_index(str(p)).total}")
     
     return "\n".join(info)
@@ -0,0 +1,214 @@
+"""Cached git summary for the system prompt and get_git_info_tool.
+
+Building the summary used to spawn three git processes on every agent
+run, and ``git status`` alone can take seconds on a large repository.
+Now one ``git status --porcelain=v2 --branch`` supplies the branch,
+upstream, ahead/behind and change counts.  The result is cached per
+repository under a key made of the mtimes of ``.git/HEAD``,
+``.git/index`` and the checked-out branch ref (read directly from
+``.git``).  A commit, checkout, ``git add`` or reset changes the key;
+edits to tracked files don't, so a cached entry older than
+``REFRESH_AFTER`` seconds is returned as-is while a refresh runs in the
+background.
+
+``prefetch(path)`` starts that computation in a background thread.  It
+is called on ``cd`` so that the next prompt finds the summary ready.
+
+Public API:
+    get_git_context(path=None, wait=None) -> str
+        Summary for the repository containing *path*.  With *wait* set,
+        an old entry is returned while it refreshes, and an uncached one is
+        waited for at most *wait* seconds before a placeholder is returned.
+    prefetch(path=None)
+    repo_state(path=None) -> (work_tree, key) | None
+        The cache key described above, read from ``.git`` without running
+        git; other caches use it to notice commits, checkouts and staging.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+REFRESH_AFTER = 10.0
+
+# Placeholder used when the summary isn't ready within the caller's wait.
+PENDING = "(git status still loading)"
+
+_cache: Dict[str, Tuple[tuple, float, str]] = {}
+_inflight: Dict[str, threading.Event] = {}
+_lock = threading.Lock()
+
+
+def _find_git_dir(path: Path) -> Optional[Tuple[Path, Path]]:
+    """``(work_tree, git_dir)`` for *path*, following ``.git`` files (worktrees)."""
+    for d in (path, *path.parents):
+        dot_git = d / ".git"
+        if dot_git.is_dir():
+            return d, dot_git
+        if dot_git.is_file():
+            try:
+                line = dot_git.read_text(encoding="utf-8").strip()
+            except OSError:
+                return None
+            if line.startswith("gitdir:"):
+                git_dir = Path(line[7:].strip())
+                return d, git_dir if git_dir.is_absolute() else (d / git_dir).resolve()
+            return None
+    return None
+
+
+def _mtime(path: Path) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _state_key(git_dir: Path) -> tuple:
+    head_file = git_dir / "HEAD"
+    try:
+        head = head_file.read_text(encoding="utf-8").strip()
+    except OSError:
+        head = ""
+    ref_mtime = 0
+    if head.startswith("ref:"):
+        ref = head[4:].strip()
+        ref_mtime = _mtime(git_dir / ref) or _mtime(git_dir / "packed-refs")
+    return head, _mtime(head_file), _mtime(git_dir / "index"), ref_mtime
+
+
+def _summarise(work_tree: Path) -> str:
+    try:
+        proc = subprocess.run(
+            # No index refresh writes: they would bump .git/index (our key)
+            # and contend with the user's own git commands.
+            ["git", "--no-optional-locks", "status", "--porcelain=v2", "--branch"],
+            cwd=str(work_tree), capture_output=True, timeout=60,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return f"git status failed: {e}"
+    if proc.returncode != 0:
+        return "Not a git repository"
+
+    branch = oid = upstream = None
+    ahead = behind = 0
+    staged = modified = untracked = conflicted = 0
+    for raw in proc.stdout.decode("utf-8", "replace").splitlines():
+        if raw.startswith("# branch.head "):
+            branch = raw[14:]
+        elif raw.startswith("# branch.oid "):
+            oid = raw[13:]
+        elif raw.startswith("# branch.upstream "):
+            upstream = raw[18:]
+        elif raw.startswith("# branch.ab "):
+            a, _, b = raw[12:].partition(" ")
+            ahead, behind = abs(int(a or 0)), abs(int(b or 0))
+        elif raw.startswith(("1 ", "2 ")):
+            xy = raw[2:4]
+            staged += xy[0] != "."
+            modified += xy[1] != "."
+        elif raw.startswith("u "):
+            conflicted += 1
+        elif raw.startswith("? "):
+            untracked += 1
+
+    if branch == "(detached)":
+        branch_line = f"detached at {(oid or '')[:8]}"
+    else:
+        branch_line = branch or "unknown"
+        if upstream:
+            branch_line += f" (tracking {upstream}, ahead {ahead}, behind {behind})"
+    counts = [
+        f"{n} {label}" for n, label in (
+            (staged, "staged"), (modified, "modified"),
+            (untracked, "untracked"), (conflicted, "conflicted"),
+        ) if n
+    ]
+    status = "clean" if not counts else "dirty (" + ", ".join(counts) + ")"
+    head = oid[:8] if oid and oid != "(initial)" else "(no commits yet)"
+    return f"Branch: {branch_line}\nHEAD: {head}\nStatus: {status}"
+
+
+def _refresh(work_tree: Path, git_dir: Path, done: threading.Event) -> None:
+    root = str(work_tree)
+    try:
+        key = _state_key(git_dir)
+        text = _summarise(work_tree)
+        with _lock:
+            _cache[root] = (key, time.monotonic(), text)
+    finally:
+        with _lock:
+            _inflight.pop(root, None)
+        done.set()
+
+
+def _start_refresh(work_tree: Path, git_dir: Path) -> threading.Event:
+    root = str(work_tree)
+    with _lock:
+        done = _inflight.get(root)
+        if done is not None:
+            return done
+        done = _inflight[root] = threading.Event()
+    threading.Thread(
+        target=_refresh, args=(work_tree, git_dir, done), daemon=True,
+        name="commandor-git-context",
+    ).start()
+    return done
+
+
+def prefetch(path=None) -> None:
+    """Refresh the summary for *path* in the background if it is stale."""
+    found = _find_git_dir(Path(path or os.getcwd()).resolve())
+    if found is None:
+        return
+    work_tree, git_dir = found
+    with _lock:
+        entry = _cache.get(str(work_tree))
+    if entry is None or entry[0] != _state_key(git_dir) or \
+            time.monotonic() - entry[1] > REFRESH_AFTER:
+        _start_refresh(work_tree, git_dir)
+
+
+def repo_state(path=None) -> Optional[Tuple[Path, tuple]]:
+    """``(work_tree, state key)`` for the repository containing *path*, or None."""
+    found = _find_git_dir(Path(path or os.getcwd()).resolve())
+    if found is None:
+        return None
+    work_tree, git_dir = found
+    return work_tree, _state_key(git_dir)
+
+
+def get_git_context(path=None, wait: Optional[float] = None) -> str:
+    """Return the git summary for the repository containing *path*.
+
+    Args:
+        path: Directory inside the repository (default: cwd).
+        wait: Seconds to wait for an uncached or outdated summary; None
+              waits until it is computed.
+    """
+    found = _find_git_dir(Path(path or os.getcwd()).resolve())
+    if found is None:
+        return "Not a git repository"
+    work_tree, git_dir = found
+    key = _state_key(git_dir)
+    with _lock:
+        entry = _cache.get(str(work_tree))
+    if entry is not None and entry[0] == key:
+        if time.monotonic() - entry[1] <= REFRESH_AFTER:
+            return entry[2]
+        done = _start_refresh(work_tree, git_dir)
+        if wait is not None:
+            return entry[2]  # stale-while-revalidate for the prompt
+        done.wait()
+    else:
+        done = _start_refresh(work_tree, git_dir)
+        if not done.wait(wait):
+            return PENDING
+    with _lock:
+        entry = _cache.get(str(work_tree))
+    return entry[2] if entry is not None else PENDING
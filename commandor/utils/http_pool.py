@@ -0,0 +1,87 @@
+"""Shared, tuned httpx client for the model providers.
+
+Every OpenAI-compatible LangChain client used to create its own httpx
+transport with default settings.  httpx then drops idle connections after
+five seconds, so the next agent turn after a slow tool call often paid
+DNS and TLS again.  This module builds one client for the whole process
+and ``lc_models`` hands it to each provider that accepts one.  The client
+has:
+
+* HTTP/2 when the ``h2`` package is installed (``httpx[http2]``), so
+  concurrent requests to a provider share one connection,
+* explicit pool limits, and
+* a long keep-alive expiry.
+
+``preconnect(url)`` opens a connection to *url*'s host ahead of the first
+real request.  It sends a HEAD request and ignores the status.  The TUI
+calls it, through ``agent_bridge.preconnect``, from a background thread at
+mount and on ``/provider``.
+
+Public API:
+    get_http_client() -> httpx.Client
+    preconnect(url, timeout=5.0) -> bool
+    close_http_client()
+"""
+
+from __future__ import annotations
+
+import atexit
+import importlib.util
+import threading
+from typing import Optional
+
+import httpx
+
+# Idle connections are kept this long (httpx default: 5 s).
+KEEPALIVE_EXPIRY = 300.0
+
+LIMITS = httpx.Limits(
+    max_connections=32,
+    max_keepalive_connections=16,
+    keepalive_expiry=KEEPALIVE_EXPIRY,
+)
+
+# Generation requests can stream for minutes; connecting should not.
+TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(
+                http2=_http2_available(),
+                limits=LIMITS,
+                timeout=TIMEOUT,
+                follow_redirects=True,
+            )
+        return _client
+
+
+def preconnect(url: str, timeout: float = 5.0) -> bool:
+    """Open (and keep) a connection to *url*'s host; False if it failed."""
+    try:
+        get_http_client().head(url, timeout=timeout)
+    except httpx.HTTPError:
+        return False
+    return True
+
+
+def close_http_client() -> None:
+    """Close the shared client (registered with atexit)."""
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+atexit.register(close_http_client)
@@ -0,0 +1,146 @@
+"""Line-offset index and mmap-backed line-range reads.
+
+Reading lines 20–29 of a 500 MB log should not decode 500 MB.  A LineIndex
+records, for every fixed-size chunk of the file, how many newlines precede
+it.  Building one is a single ``bytes.count`` pass over the mmap (no per-line
+Python work); locating line *n* is a bisect over the chunks followed by a
+bounded ``find`` walk inside one chunk.
+
+Files that end lines with a lone ``\r`` (classic Mac) are counted the way
+text-mode ``readlines()`` counts them; reading a range of such a file
+decodes the whole file, since the chunk counts only locate ``\n``.
+
+Indexes are cached per resolved path and re-validated against the file's
+``(st_size, st_mtime_ns)``, so paging through a file re-uses the same index.
+
+Public API:
+    get_line_index(path) -> LineIndex
+        Cached index for *path*; ``.total`` is the line count.
+    read_lines(path, start, end=None) -> tuple[str, int]
+        Decode lines ``[start, end)`` (0-indexed) and return them with the
+        file's total line count.  Raises UnicodeDecodeError for binary files.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+_CHUNK = 256 * 1024
+_CACHE_SIZE = 64
+
+_lock = threading.Lock()
+_cache: "OrderedDict[str, LineIndex]" = OrderedDict()
+
+
+class LineIndex:
+    """Newline counts at every ``_CHUNK``-byte boundary of one file."""
+
+    __slots__ = ("size", "mtime_ns", "total", "newlines", "chunk_newlines", "lone_cr")
+
+    def __init__(self, size: int, mtime_ns: int, chunk_newlines: List[int],
+                 newlines: int, trailing: bool, lone_cr: int = 0) -> None:
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.chunk_newlines = chunk_newlines  # newlines before chunk i
+        self.newlines = newlines
+        self.lone_cr = lone_cr  # ``\r`` not followed by ``\n``; each ends a line
+        # A final line without a trailing newline still counts as a line.
+        self.total = newlines + lone_cr + (1 if trailing else 0)
+
+    @classmethod
+    def build(cls, buf, st: os.stat_result) -> "LineIndex":
+        counts: List[int] = []
+        seen = cr = crlf = 0
+        for off in range(0, len(buf), _CHUNK):
+            counts.append(seen)
+            chunk = buf[off:off + _CHUNK + 1]  # one byte over: \r\n across the edge
+            seen += chunk.count(b"\n", 0, _CHUNK)
+            cr += chunk.count(b"\r", 0, _CHUNK)
+            crlf += chunk.count(b"\r\n")
+        trailing = len(buf) > 0 and buf[len(buf) - 1:len(buf)] not in (b"\n", b"\r")
+        return cls(st.st_size, st.st_mtime_ns, counts, seen, trailing, cr - crlf)
+
+    def offset_of(self, buf, line: int) -> int:
+        """Byte offset at which 0-indexed *line* starts (``size`` if past EOF)."""
+        if line <= 0:
+            return 0
+        if line > self.newlines:
+            return self.size
+        # The line starts right after the line-th newline.
+        chunk = bisect_left(self.chunk_newlines, line) - 1
+        pos = chunk * _CHUNK - 1
+        for _ in range(line - self.chunk_newlines[chunk]):
+            pos = buf.find(b"\n", pos + 1)
+        return pos + 1
+
+
+def _open_index(path: str):
+    """Return ``(file, mmap or None, LineIndex)`` for *path*, using the cache."""
+    key = os.path.realpath(path)
+    fh = open(key, "rb")
+    try:
+        st = os.fstat(fh.fileno())
+        buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else None
+    except (OSError, ValueError):
+        fh.close()
+        raise
+
+    with _lock:
+        index = _cache.get(key)
+        if index is not None and (index.size, index.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            _cache.move_to_end(key)
+            return fh, buf, index
+
+    index = LineIndex.build(buf if buf is not None else b"", st)
+    with _lock:
+        _cache[key] = index
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return fh, buf, index
+
+
+def get_line_index(path: str) -> LineIndex:
+    """Return the cached (or freshly built) LineIndex for *path*."""
+    fh, buf, index = _open_index(path)
+    if buf is not None:
+        buf.close()
+    fh.close()
+    return index
+
+
+def read_lines(path: str, start: int, end: Optional[int] = None) -> Tuple[str, int]:
+    """Return ``(text of lines [start, end), total line count)`` for *path*.
+
+    ``end=None`` reads to the end of the file.
+
+    Only the bytes of the requested lines are decoded (the whole file if it
+    has lone ``\r`` line breaks).  Raises UnicodeDecodeError if the file
+    looks binary or the range is not UTF-8.
+    """
+    fh, buf, index = _open_index(path)
+    try:
+        if buf is None:
+            return "", 0
+        if b"\0" in buf[:8192]:
+            raise UnicodeDecodeError("utf-8", b"\0", 0, 1, "binary file")
+        if index.lone_cr:
+            text = buf[:].decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            parts = text.split("\n")
+            lines = [line + "\n" for line in parts[:-1]] + ([parts[-1]] if parts[-1] else [])
+            return "".join(lines[start:end]), index.total
+        lo = index.offset_of(buf, start)
+        hi = index.size if end is None or end >= index.total else index.offset_of(buf, end)
+        text = buf[lo:hi].decode("utf-8")
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+        return text, index.total
+    finally:
+        if buf is not None:
+            buf.close()
+        fh.close()
@@ -0,0 +1,261 @@
+"""Token-budgeted compaction of tool results before they enter the history.
+
+Every tool result is resent to the model on each later turn, so a single
+large ``run_command_tool`` or ``grep_tool`` result keeps costing tokens long
+after it was useful.  ``compact_output`` fits a result into a per-tool
+budget in two steps:
+
+1. Runs of identical lines collapse into one line plus a
+   ``[previous line repeated N times]`` note.
+2. If the result is still over budget, the full original is written to
+   ``~/.commandor/spill/<handle>.txt``.  The model sees the head and tail
+   of the output with a marker naming the handle, and can page through the
+   rest with ``read_spill(handle, page)``.
+
+Command output is already cut to a head and tail by ``stream_runner``
+before it gets here.  The dropped middle is streamed to a spill file of
+its own (``open_spill``), and the runner's marker names that handle.
+When such a result is compacted again, the new marker calls its own spill
+"this result" and repeats the runner's handles, which hold the complete
+output.
+
+Public API:
+    compact_output(text, tool_name="", budget_tokens=None) -> str
+    read_spill(handle, page=1, page_lines=SPILL_PAGE_LINES) -> str
+    open_spill() -> (handle, binary file)
+    tool_budget(tool_name) -> int
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+SPILL_DIR = Path.home() / ".commandor" / "spill"
+
+DEFAULT_BUDGET_TOKENS = 3000
+
+# Reads were asked for explicitly; they get a larger share of the budget.
+_BUDGET_SCALE = {
+    "read_file_tool": 3,
+    "read_many_files_tool": 8,
+    "run_commands_tool": 2,   # several commands' output in one result
+}
+
+# Rough chars-per-token ratio used for budgets (no tokenizer dependency).
+_CHARS_PER_TOKEN = 4
+
+# Share of the kept lines taken from the start of the output.
+_HEAD_SHARE = 0.6
+
+# Kept lines longer than this are cut, so one minified line can't eat the budget.
+_MAX_LINE_CHARS = 2000
+
+SPILL_PAGE_LINES = 200
+
+# Spill files untouched for this long are removed (checked once per process).
+_SPILL_MAX_AGE = 7 * 24 * 3600
+
+_HANDLE_RE = re.compile(r"^[0-9a-f]{12}$")
+
+# Marker stream_runner.OutputCapture leaves where it dropped bytes.
+_RUNNER_CUT_RE = re.compile(
+    r"… \[[\d,]+ bytes omitted(?:; the (?:complete|first [\d,]+ MB of the) "
+    r"stream is saved as spill handle '([0-9a-f]{12})')?\] …"
+)
+
+_pruned = False
+
+
+def tool_budget(tool_name: str) -> int:
+    """Token budget for *tool_name* (``agent.tool_output_tokens`` scaled)."""
+    budget = DEFAULT_BUDGET_TOKENS
+    try:
+        from ..config import get_config  # noqa: PLC0415
+
+        cfg = get_config()
+        if cfg.config:
+            budget = cfg.config.agent.tool_output_tokens
+    except Exception:
+        pass
+    return budget * _BUDGET_SCALE.get(tool_name, 1)
+
+
+def _collapse_repeats(lines: List[str]) -> List[str]:
+    out: List[str] = []
+    i, n = 0, len(lines)
+    while i < n:
+        j = i + 1
+        while j < n and lines[j] == lines[i]:
+            j += 1
+        out.append(lines[i])
+        if j - i > 2:
+            out.append(f"[previous line repeated {j - i - 1} times]")
+        elif j - i == 2:
+            out.append(lines[i])
+        i = j
+    return out
+
+
+def _clip(line: str) -> str:
+    if len(line) <= _MAX_LINE_CHARS:
+        return line
+    return f"{line[:_MAX_LINE_CHARS]}… [{len(line) - _MAX_LINE_CHARS:,} more chars]"
+
+
+def _prune_spills() -> None:
+    global _pruned
+    if _pruned:
+        return
+    _pruned = True
+    cutoff = time.time() - _SPILL_MAX_AGE
+    try:
+        with os.scandir(SPILL_DIR) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+
+def _spill(text: str) -> Optional[str]:
+    """Write *text* to the spill directory; return its handle (or None)."""
+    handle = hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()[:12]
+    path = SPILL_DIR / f"{handle}.txt"
+    try:
+        SPILL_DIR.mkdir(parents=True, exist_ok=True)
+        _prune_spills()
+        if path.exists():
+            os.utime(path)
+        else:
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            with open(tmp, "w", encoding="utf-8", errors="surrogatepass") as fh:
+                fh.write(text)
+            os.replace(tmp, path)
+    except OSError:
+        return None
+    return handle
+
+
+def open_spill() -> Tuple[str, BinaryIO]:
+    """Create an empty spill file for streamed output; return ``(handle, file)``.
+
+    The caller writes (UTF-8) bytes and closes the file.  Raises OSError.
+    """
+    SPILL_DIR.mkdir(parents=True, exist_ok=True)
+    _prune_spills()
+    handle = uuid.uuid4().hex[:12]
+    return handle, open(SPILL_DIR / f"{handle}.txt", "wb")
+
+
+def compact_output(text: str, tool_name: str = "", budget_tokens: Optional[int] = None) -> str:
+    """Fit a tool result into its token budget.
+
+    Args:
+        text:          Tool result as returned by the tool.
+        tool_name:     Used to pick the budget when *budget_tokens* is None.
+        budget_tokens: Explicit budget; <= 0 disables compaction.
+
+    Returns:
+        *text* unchanged when it fits, otherwise a compacted version that
+        names the spill handle holding the full output.
+    """
+    if not isinstance(text, str):
+        return text
+    budget = tool_budget(tool_name) if budget_tokens is None else budget_tokens
+    max_chars = budget * _CHARS_PER_TOKEN
+    if budget <= 0 or len(text) <= max_chars:
+        return text
+
+    lines = text.split("\n")
+    collapsed = _collapse_repeats(lines)
+    joined = "\n".join(collapsed)
+    if len(joined) <= max_chars:
+        return joined
+
+    handle = _spill(text)
+    total_pages = -(-len(lines) // SPILL_PAGE_LINES)
+
+    # Keep whole lines from both ends until the budget is used up.
+    head_budget = int(max_chars * _HEAD_SHARE)
+    tail_budget = max_chars - head_budget
+    head: List[str] = []
+    used = 0
+    for line in collapsed:
+        line = _clip(line)
+        if used + len(line) + 1 > head_budget and head:
+            break
+        head.append(line)
+        used += len(line) + 1
+    tail: List[str] = []
+    used = 0
+    for line in reversed(collapsed[len(head):]):
+        line = _clip(line)
+        if used + len(line) + 1 > tail_budget:
+            break
+        tail.append(line)
+        used += len(line) + 1
+    tail.reverse()
+    omitted = len(collapsed) - len(head) - len(tail)
+
+    cuts = _RUNNER_CUT_RE.findall(text)
+    inner = ", ".join(repr(h) for h in cuts if h)
+    note = ""
+    if cuts:
+        note = "; the command runner had already cut this output"
+        if inner:
+            note += f", its complete output is in spill handle(s) {inner}"
+    if handle is not None:
+        label = "this result" if cuts else "full output"
+        marker = (
+            f"… [{omitted:,} lines omitted; {label} ({len(lines):,} lines, "
+            f"{total_pages} pages) saved as spill handle {handle!r}; "
+            f"read it with read_spill_tool({handle!r}, page=N){note}] …"
+        )
+    else:
+        marker = f"… [{omitted:,} lines omitted{note}] …"
+    return "\n".join(head + [marker] + tail)
+
+
+def read_spill(handle: str, page: int = 1, page_lines: int = SPILL_PAGE_LINES) -> str:
+    """Return one page of a spilled tool output.
+
+    Args:
+        handle:     Handle named in a compacted tool result.
+        page:       1-based page number; negative counts from the end.
+        page_lines: Lines per page.
+
+    Raises:
+        FileNotFoundError: If the handle is unknown (or was pruned).
+        ValueError:        If the handle or page is invalid.
+    """
+    handle = handle.strip().strip("'\"")
+    if not _HANDLE_RE.match(handle):
+        raise ValueError(f"Invalid spill handle: {handle!r}")
+    path = SPILL_DIR / f"{handle}.txt"
+    if not path.exists():
+        raise FileNotFoundError(f"No spilled output with handle {handle!r}")
+
+    # Streamed command output may contain invalid UTF-8.
+    lines = path.read_bytes().decode("utf-8", "replace").split("\n")
+    page_lines = max(1, page_lines)
+    total_pages = max(1, -(-len(lines) // page_lines))
+    if page < 0:
+        page = total_pages + 1 + page
+    if not 1 <= page <= total_pages:
+        raise ValueError(f"Page {page} out of range (1-{total_pages})")
+    start = (page - 1) * page_lines
+    chunk = lines[start:start + page_lines]
+    header = (
+        f"[spill {handle}: page {page}/{total_pages}, "
+        f"lines {start + 1}-{start + len(chunk)} of {len(lines)}]"
+    )
+    return "\n".join([header] + [_clip(line) for line in chunk])
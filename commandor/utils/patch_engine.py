@@ -0,0 +1,497 @@
+"""In-process unified-diff engine used by patch_file_tool.
+
+Parses ``diff -u`` / ``git diff`` output (one or many files) and applies it
+without spawning ``patch``.  Like GNU patch, each hunk is located by its
+context rather than trusted line numbers:
+
+1. Search for the hunk's old lines (context + removals) at the position
+   from the ``@@`` header, then at growing distances above and below it
+   (up to *max_offset* lines).
+2. Still not found: retry with up to *fuzz* leading/trailing context lines
+   ignored.
+3. As a last resort, compare lines ignoring trailing whitespace.
+
+The patch is all-or-nothing: if any hunk of any file fails, no file is
+written.  A file whose ``---`` and ``+++`` paths differ, or that git marks
+with ``rename from``/``rename to`` (with or without hunks), is renamed: the
+patched text goes to the new path and the old file is removed.  Every hunk
+gets a HunkResult: where it landed, its offset from the header, the fuzz
+used, or why it failed.
+
+Public API:
+    parse_patch(text) -> list[FilePatch]
+    apply_hunks(text, hunks, fuzz=2, max_offset=None) -> tuple[str, list[HunkResult]]
+    apply_patch(diff, path=None, fuzz=2, max_offset=None, dry_run=False) -> PatchReport
+    PatchError
+        Raised for diffs that cannot be parsed or mapped to files.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_DEV_NULL = "/dev/null"
+
+
+class PatchError(ValueError):
+    """The diff is malformed or its files cannot be resolved."""
+
+
+@dataclass
+class Hunk:
+    old_start: int                  # 1-based, from the @@ header
+    old_len: int
+    new_start: int
+    new_len: int
+    header: str
+    lines: List[Tuple[str, str]] = field(default_factory=list)  # (' '|'-'|'+', text)
+    old_no_eol: bool = False        # old side's last line lacks a newline
+    new_no_eol: bool = False
+
+    @property
+    def old_lines(self) -> List[str]:
+        return [t for tag, t in self.lines if tag != "+"]
+
+    @property
+    def new_lines(self) -> List[str]:
+        return [t for tag, t in self.lines if tag != "-"]
+
+
+@dataclass
+class FilePatch:
+    old_path: Optional[str]         # None for /dev/null (new file)
+    new_path: Optional[str]         # None for /dev/null (deleted file)
+    hunks: List[Hunk] = field(default_factory=list)
+
+    @property
+    def path(self) -> Optional[str]:
+        return self.new_path or self.old_path
+
+
+@dataclass
+class HunkResult:
+    index: int                      # 1-based within its file
+    header: str
+    applied: bool
+    line: int = 0                   # 1-based line where the hunk was applied
+    offset: int = 0                 # applied line minus header line
+    fuzz: int = 0                   # context lines ignored at each end
+    loose: bool = False             # trailing whitespace ignored
+    message: str = ""
+
+    def describe(self) -> str:
+        if not self.applied:
+            return f"hunk {self.index} {self.header}: FAILED — {self.message}"
+        notes = []
+        if self.offset:
+            notes.append(f"offset {self.offset:+d}")
+        if self.fuzz:
+            notes.append(f"fuzz {self.fuzz}")
+        if self.loose:
+            notes.append("whitespace ignored")
+        extra = f" ({', '.join(notes)})" if notes else ""
+        return f"hunk {self.index} applied at line {self.line}{extra}"
+
+
+@dataclass
+class FileResult:
+    path: str
+    old_content: str                # both contents use "\n" line endings;
+    new_content: str                # crlf files get "\r\n" only when written
+    hunks: List[HunkResult]
+    created: bool = False
+    deleted: bool = False
+    crlf: bool = False
+    renamed_from: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return all(h.applied for h in self.hunks)
+
+
+@dataclass
+class PatchReport:
+    files: List[FileResult]
+    applied: bool                   # True if every hunk applied (and was written)
+
+    def summary(self) -> str:
+        total = sum(len(f.hunks) for f in self.files)
+        failed = sum(1 for f in self.files for h in f.hunks if not h.applied)
+        if self.applied:
+            head = f"Patch applied successfully to {len(self.files)} file(s):"
+        else:
+            head = (
+                f"Patch NOT applied (no files changed): {failed} of {total} "
+                f"hunk(s) failed."
+            )
+        out = [head]
+        for f in self.files:
+            if f.renamed_from:
+                label = f" (renamed from {f.renamed_from})"
+            else:
+                label = " (new file)" if f.created else " (deleted)" if f.deleted else ""
+            out.append(f"  {f.path}{label}")
+            out.extend(f"    {h.describe()}" for h in f.hunks)
+        return "\n".join(out)
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def _header_path(raw: str) -> Optional[str]:
+    name = raw.split("\t", 1)[0].strip()
+    if name.startswith('"') and name.endswith('"') and len(name) > 1:
+        name = name[1:-1]
+    return None if name == _DEV_NULL else name
+
+
+def parse_patch(text: str) -> List[FilePatch]:
+    """Split *text* into per-file patches.
+
+    Hunk bodies end at the next ``@@``, file header or ``diff`` line, so
+    wrong line counts in ``@@`` headers (common in hand-written diffs) are
+    tolerated.  A diff without ``---``/``+++`` headers yields one FilePatch
+    with no paths.  Git's ``rename from``/``rename to`` lines yield a
+    FilePatch even when no hunks follow (a pure rename).
+    """
+    lines = text.splitlines()
+    files: List[FilePatch] = []
+    current: Optional[FilePatch] = None
+    hunk: Optional[Hunk] = None
+    rename_from: Optional[str] = None
+    rename: Optional[FilePatch] = None  # made from rename lines, no headers yet
+    last_tag = ""
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("diff --git ") or line.startswith("diff -"):
+            current, hunk = None, None
+            rename_from, rename = None, None
+            i += 1
+            continue
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            old, new = _header_path(line[4:]), _header_path(lines[i + 1][4:])
+            if rename is not None:
+                # git repeats the rename as a/old, b/new headers before hunks.
+                current, rename = rename, None
+                current.old_path, current.new_path = old, new
+            else:
+                current = FilePatch(old, new)
+                files.append(current)
+            hunk = None
+            i += 2
+            continue
+        if hunk is None and line.startswith("rename from "):
+            rename_from = _header_path(line[len("rename from "):])
+            i += 1
+            continue
+        if hunk is None and line.startswith("rename to ") and rename_from is not None:
+            current = rename = FilePatch(rename_from, _header_path(line[len("rename to "):]))
+            files.append(current)
+            rename_from = None
+            i += 1
+            continue
+        m = _HUNK_RE.match(line)
+        if m:
+            if current is None:
+                current = FilePatch(None, None)
+                files.append(current)
+            hunk = Hunk(
+                int(m.group(1)), int(m.group(2) or 1),
+                int(m.group(3)), int(m.group(4) or 1),
+                header=m.group(0),
+            )
+            current.hunks.append(hunk)
+            last_tag = ""
+            i += 1
+            continue
+        if hunk is not None:
+            if line.startswith(("+", "-", " ")):
+                hunk.lines.append((line[0], line[1:]))
+                last_tag = line[0]
+            elif line == "":
+                # Editors often strip the single space of empty context lines.
+                hunk.lines.append((" ", ""))
+                last_tag = " "
+            elif line.startswith("\\"):
+                if last_tag in ("-", " "):
+                    hunk.old_no_eol = True
+                if last_tag in ("+", " "):
+                    hunk.new_no_eol = True
+            else:
+                hunk = None  # git metadata, "index ...", prose, ...
+        i += 1
+
+    files = [f for f in files if f.hunks or f.old_path is None or f.new_path is None
+             or _strip_prefix(f.old_path) != _strip_prefix(f.new_path)]
+    if not files or not any(f.hunks or f.old_path and f.new_path for f in files):
+        raise PatchError("No hunks found — expected unified diff format with @@ headers.")
+    for f in files:
+        for h in f.hunks:
+            # Trailing blank "context" lines are usually padding, not content.
+            while h.lines and h.lines[-1] == (" ", "") and len(h.old_lines) > h.old_len:
+                h.lines.pop()
+    return files
+
+
+# ---------------------------------------------------------------------------
+# Hunk placement
+# ---------------------------------------------------------------------------
+
+def _matches(file_keys: List[str], pos: int, block: List[str]) -> bool:
+    if pos < 0 or pos + len(block) > len(file_keys):
+        return False
+    for k, want in enumerate(block):
+        if file_keys[pos + k] != want:
+            return False
+    return True
+
+
+def _search(file_keys: List[str], block: List[str], expected: int,
+            max_offset: Optional[int]) -> Optional[int]:
+    """Nearest position to *expected* where *block* matches, or None."""
+    n = len(file_keys)
+    if not block:
+        return min(max(expected, 0), n)
+    limit = max(expected, n - expected) if max_offset is None else max_offset
+    for dist in range(limit + 1):
+        for pos in ((expected,) if dist == 0 else (expected - dist, expected + dist)):
+            if 0 <= pos <= n - len(block) and file_keys[pos] == block[0] \
+                    and _matches(file_keys, pos, block):
+                return pos
+    return None
+
+
+def _locate(lines: List[str], hunk: Hunk, expected: int, fuzz: int,
+            max_offset: Optional[int]):
+    """Return ``(pos, lead, trail, loose)`` for *hunk*, or None.
+
+    *lead*/*trail* are the context lines dropped at each end (the fuzz).
+    """
+    tags = [tag for tag, _ in hunk.lines if tag != "+"]
+    old = hunk.old_lines
+    lead_ctx = next((k for k, t in enumerate(tags) if t != " "), len(tags))
+    trail_ctx = next((k for k, t in enumerate(reversed(tags)) if t != " "), len(tags))
+
+    for loose in (False, True):
+        keys = [l.rstrip() for l in lines] if loose else lines
+        want = [l.rstrip() for l in old] if loose else old
+        for f in range(fuzz + 1):
+            lead = min(f, lead_ctx)
+            trail = min(f, trail_ctx, len(want) - lead)
+            if f and lead == 0 and trail == 0:
+                break
+            block = want[lead:len(want) - trail]
+            if not block and old:
+                break
+            pos = _search(keys, block, expected + lead, max_offset)
+            if pos is not None:
+                return pos - lead, lead, trail, loose
+    return None
+
+
+def _split_keep(text: str) -> Tuple[List[str], str, bool]:
+    """Lines without EOLs, the dominant EOL, and whether the text ends with one."""
+    eol = "\r\n" if text.count("\r\n") * 2 > text.count("\n") else "\n"
+    lines = text.split("\n")
+    ends = text.endswith("\n")
+    if ends or text == "":
+        lines.pop()
+    if eol == "\r\n":
+        lines = [l[:-1] if l.endswith("\r") else l for l in lines]
+    return lines, eol, ends or text == ""
+
+
+def apply_hunks(text: str, hunks: List[Hunk], fuzz: int = 2,
+                max_offset: Optional[int] = None) -> Tuple[str, List[HunkResult]]:
+    """Apply *hunks* to *text*; return the new text and one result per hunk.
+
+    Failed hunks are skipped (and reported); the returned text contains only
+    the hunks that applied.
+    """
+    lines, eol, ends_with_eol = _split_keep(text)
+    results: List[HunkResult] = []
+    delta = 0  # net lines added by hunks applied so far
+
+    for idx, hunk in enumerate(hunks, 1):
+        header_pos = max(hunk.old_start - 1, 0) if hunk.old_len else hunk.old_start
+        expected = header_pos + delta
+        found = _locate(lines, hunk, expected, fuzz, max_offset)
+        if found is None:
+            first = next((t for t in hunk.old_lines if t.strip()), "")
+            results.append(HunkResult(
+                idx, hunk.header, False,
+                message=(
+                    f"context not found near line {hunk.old_start}"
+                    + (f" (first line: {first[:60]!r})" if first else "")
+                    + ". Re-read the file and regenerate this hunk."
+                ),
+            ))
+            continue
+        pos, lead, trail, loose = found
+
+        # Rebuild the region, keeping the file's own text for context lines
+        # (they may differ in whitespace when matched loosely).
+        body = hunk.lines
+        if lead or trail:
+            ctx_seen, start_k = 0, 0
+            while ctx_seen < lead:
+                if body[start_k][0] == " ":
+                    ctx_seen += 1
+                start_k += 1
+            end_k, ctx_seen = len(body), 0
+            while ctx_seen < trail:
+                end_k -= 1
+                if body[end_k][0] == " ":
+                    ctx_seen += 1
+            body = body[start_k:end_k]
+        cur = pos + lead
+        replacement: List[str] = []
+        for tag, t in body:
+            if tag == " ":
+                replacement.append(lines[cur])
+                cur += 1
+            elif tag == "-":
+                cur += 1
+            else:
+                replacement.append(t)
+        lines[pos + lead:cur] = replacement
+        delta += len(replacement) - (cur - pos - lead)
+        if pos + lead + len(replacement) == len(lines) and hunk.old_no_eol != hunk.new_no_eol:
+            ends_with_eol = not hunk.new_no_eol
+        results.append(HunkResult(
+            idx, hunk.header, True,
+            line=pos + 1, offset=pos - expected,
+            fuzz=max(lead, trail), loose=loose,
+        ))
+
+    new_text = eol.join(lines)
+    if lines and ends_with_eol:
+        new_text += eol
+    return new_text, results
+
+
+# ---------------------------------------------------------------------------
+# Files
+# ---------------------------------------------------------------------------
+
+def _uses_crlf(path: Path) -> bool:
+    try:
+        with open(path, "rb") as fh:
+            head = fh.read(8192)
+    except OSError:
+        return False
+    return b"\r\n" in head
+
+
+def _strip_prefix(name: str) -> str:
+    return name[2:] if name[:2] in ("a/", "b/") else name
+
+
+def _resolve(fp: FilePatch, base: Path) -> Tuple[Path, Optional[Path]]:
+    """Map a FilePatch's header paths to ``(target, source)`` under *base*."""
+    def pick(name: Optional[str]) -> Optional[Path]:
+        if name is None:
+            return None
+        stripped = base / _strip_prefix(name)
+        raw = base / name
+        if not stripped.exists() and raw.exists():
+            return raw
+        return stripped
+    src = pick(fp.old_path)
+    dst = pick(fp.new_path)
+    return (dst or src), src  # type: ignore[return-value]
+
+
+def apply_patch(diff: str, path: Optional[str] = None, fuzz: int = 2,
+                max_offset: Optional[int] = None, dry_run: bool = False) -> PatchReport:
+    """Apply a (possibly multi-file) unified diff.
+
+    Args:
+        diff:       Unified diff text.
+        path:       Target file for a single-file diff, or the directory the
+                    diff's paths are relative to (default: cwd).
+        fuzz:       Context lines that may be ignored at each end of a hunk.
+        max_offset: Furthest distance (in lines) from the header position to
+                    search for a hunk; None searches the whole file.
+        dry_run:    Compute the result without writing anything.
+
+    Raises PatchError for malformed diffs; hunk mismatches are reported in
+    the returned PatchReport instead.
+    """
+    from .file_cache import get_file_cache  # noqa: PLC0415
+
+    patches = parse_patch(diff)
+    target_file: Optional[Path] = None
+    base = Path(".")
+    if path:
+        p = Path(path)
+        if p.is_dir():
+            base = p
+        elif len(patches) == 1:
+            target_file = p
+        else:
+            raise PatchError(
+                f"The diff touches {len(patches)} files; pass a directory "
+                f"(e.g. '.') instead of the single file {path}."
+            )
+
+    cache = get_file_cache()
+    results: List[FileResult] = []
+    for fp in patches:
+        if target_file is not None:
+            target = source = target_file
+            created = not target.exists()
+            renamed = False
+        elif fp.path is None:
+            raise PatchError("The diff has no ---/+++ file headers; pass the target file as path.")
+        else:
+            target, source = _resolve(fp, base)
+            created = source is None
+            if created and target.exists() and target.stat().st_size:
+                raise PatchError(f"{target} already exists but the diff creates it (--- /dev/null).")
+            renamed = source is not None and os.path.realpath(source) != os.path.realpath(target)
+            if renamed and target.exists():
+                raise PatchError(f"The diff renames {source} to {target}, which already exists.")
+        try:
+            old_content = "" if created else cache.read(source)
+        except FileNotFoundError:
+            raise PatchError(f"File not found: {source}") from None
+        except UnicodeDecodeError:
+            raise PatchError(f"Cannot patch binary file: {source}") from None
+
+        new_content, hunk_results = apply_hunks(old_content, fp.hunks, fuzz, max_offset)
+        results.append(FileResult(
+            str(target), old_content, new_content, hunk_results,
+            created=created, deleted=fp.new_path is None and target_file is None,
+            # The cache reads with universal newlines; CRLF files are written back as CRLF.
+            crlf=not created and _uses_crlf(source),
+            renamed_from=str(source) if renamed else None,
+        ))
+
+    report = PatchReport(results, all(f.ok for f in results))
+    if report.applied and not dry_run:
+        for f in results:
+            if f.deleted:
+                os.unlink(f.path)
+                cache.invalidate(f.path)
+                continue
+            text = f.new_content.replace("\n", "\r\n") if f.crlf else f.new_content
+            if f.renamed_from:
+                cache.write(f.path, text, create_dirs=True)
+                try:
+                    shutil.copymode(f.renamed_from, f.path)
+                except OSError:
+                    pass
+                os.unlink(f.renamed_from)
+                cache.invalidate(f.renamed_from)
+            else:
+                cache.write(f.path, text, create_dirs=True, atomic=not f.created)
+    return report
@@ -0,0 +1,254 @@
+"""Shared machinery for persistent per-project file indexes.
+
+A ProjectIndex maps every (wanted) file under a project root to
+``(mtime_ns, size, payload)``, where the payload is computed by the subclass
+(trigram signature, symbol table, ...).  Indexes are pickled under
+``~/.commandor/index/`` — one file per project root and index kind — and are
+refreshed incrementally: only files whose ``(mtime_ns, size)`` changed are
+re-read.  Full rebuilds save a checkpoint every ``CHECKPOINT_EVERY`` files,
+so an interrupted build resumes where it stopped.
+
+Public API:
+    ProjectIndex
+        Base class; subclasses set SUFFIX/VERSION and implement _extract().
+    acquire(cls, root, min_interval=0.0) -> ProjectIndex | None
+        Return a fresh index for the project containing *root*, or None when
+        it is missing or too stale to refresh inline (a rebuild is then
+        started in a background thread).
+    build(cls, root) -> ProjectIndex
+        Blocking full refresh (joins a rebuild already in progress); for
+        callers that already run in the background.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .walker import find_project_root, iter_files
+
+_INDEX_DIR = Path.home() / ".commandor" / "index"
+
+# An incremental refresh that has to re-read more files than this is treated
+# as a stale index: the caller falls back to a direct scan and a rebuild runs
+# in the background instead of blocking the tool call.
+MAX_INLINE_UPDATES = 256
+
+# Full rebuilds write the index to disk after this many re-read files.
+CHECKPOINT_EVERY = 500
+
+_lock = threading.Lock()
+_indexes: Dict[Tuple[str, str], "ProjectIndex"] = {}
+_building: Dict[Tuple[str, str], threading.Event] = {}
+
+
+def _iter_stats(root: Path):
+    """Yield ``(relpath, stat_result)`` for every non-ignored file under *root*."""
+    for rel in iter_files(root):
+        rel = rel.replace("/", os.sep)
+        try:
+            st = os.stat(os.path.join(root, rel))
+        except OSError:
+            continue
+        yield rel, st
+
+
+class ProjectIndex:
+    """Per-file payloads for one project root, keyed by relative path."""
+
+    SUFFIX = "index"
+    VERSION = 1
+
+    def __init__(self, root: Path, files: Optional[Dict[str, tuple]] = None) -> None:
+        self.root = root
+        self.files: Dict[str, tuple] = files or {}
+        self.refreshed_at = 0.0
+        self._loaded()
+
+    # -- subclass hooks -----------------------------------------------------
+
+    def _wanted(self, rel: str) -> bool:
+        """Whether *rel* belongs in this index at all."""
+        return True
+
+    def _extract(self, path: str, st: os.stat_result) -> Any:
+        """Compute the payload stored for one file."""
+        raise NotImplementedError
+
+    def _loaded(self) -> None:
+        """Called after ``files`` is (re)assigned; rebuild derived lookups."""
+
+    # -- persistence ----------------------------------------------------------
+
+    @classmethod
+    def _path(cls, root: Path) -> Path:
+        digest = hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:16]
+        return _INDEX_DIR / f"{digest}.{cls.SUFFIX}"
+
+    @classmethod
+    def load(cls, root: Path) -> Optional["ProjectIndex"]:
+        """Load the on-disk index for *root*, or None if missing/corrupt."""
+        try:
+            with open(cls._path(root), "rb") as fh:
+                data = pickle.load(fh)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION:
+            return None
+        if data.get("root") != str(root):
+            return None
+        return cls(root, data.get("files", {}))
+
+    def save(self) -> None:
+        """Atomically write the index to ``~/.commandor/index/``."""
+        target = self._path(self.root)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "wb") as fh:
+            pickle.dump(
+                {"version": self.VERSION, "root": str(self.root), "files": self.files},
+                fh,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp, target)
+
+    # -- refresh ----------------------------------------------------------------
+
+    def refresh(self, max_updates: Optional[int] = None, checkpoint: Optional[int] = None) -> bool:
+        """Re-extract files whose (mtime_ns, size) changed; drop deleted ones.
+
+        Returns False (leaving the index untouched) if more than *max_updates*
+        files would need re-reading.  With *checkpoint*, the index is also
+        saved after every that many re-read files.
+        """
+        seen: Dict[str, os.stat_result] = {}
+        changed: List[str] = []
+        for rel, st in _iter_stats(self.root):
+            if not self._wanted(rel):
+                continue
+            seen[rel] = st
+            old = self.files.get(rel)
+            if old is None or old[0] != st.st_mtime_ns or old[1] != st.st_size:
+                changed.append(rel)
+                if max_updates is not None and len(changed) > max_updates:
+                    return False
+
+        self.refreshed_at = time.monotonic()
+        removed = [rel for rel in self.files if rel not in seen]
+        if not changed and not removed:
+            return True
+
+        files = dict(self.files)
+        for rel in removed:
+            del files[rel]
+        for n, rel in enumerate(changed, 1):
+            st = seen[rel]
+            payload = self._extract(os.path.join(self.root, rel), st)
+            files[rel] = (st.st_mtime_ns, st.st_size, payload)
+            if checkpoint and n % checkpoint == 0 and n < len(changed):
+                self._commit(dict(files))
+        self._commit(files)
+        return True
+
+    def _commit(self, files: Dict[str, tuple]) -> None:
+        self.files = files
+        self._loaded()
+        try:
+            self.save()
+        except OSError:
+            pass
+
+
+def _claim(key: Tuple[str, str]) -> Optional[threading.Event]:
+    """Register a rebuild of *key*; None if one is already running."""
+    with _lock:
+        if key in _building:
+            return None
+        done = _building[key] = threading.Event()
+        return done
+
+
+def _rebuild(cls, root: Path, done: threading.Event) -> None:
+    key = (cls.SUFFIX, str(root))
+    try:
+        index = _indexes.get(key) or cls.load(root) or cls(root)
+        index.refresh(checkpoint=CHECKPOINT_EVERY)
+        with _lock:
+            _indexes[key] = index
+    except OSError:
+        pass
+    finally:
+        with _lock:
+            _building.pop(key, None)
+        done.set()
+
+
+def _rebuild_in_background(cls, root: Path) -> None:
+    done = _claim((cls.SUFFIX, str(root)))
+    if done is None:
+        return
+    threading.Thread(
+        target=_rebuild, args=(cls, root, done), name=f"commandor-{cls.SUFFIX}", daemon=True,
+    ).start()
+
+
+def build(cls, root: Path) -> Optional[ProjectIndex]:
+    """Fully refresh the *cls* index for the project containing *root* and return it.
+
+    Blocks; if another thread is already rebuilding the index, waits for it.
+    Returns None only if the index could not be written or read at all.
+    """
+    project = find_project_root(root)
+    key = (cls.SUFFIX, str(project))
+    while True:
+        done = _claim(key)
+        if done is not None:
+            _rebuild(cls, project, done)
+            break
+        with _lock:
+            running = _building.get(key)
+        if running is not None:
+            running.wait()
+            break
+    with _lock:
+        return _indexes.get(key)
+
+
+def acquire(cls, root: Path, min_interval: float = 0.0) -> Optional[ProjectIndex]:
+    """Return an up-to-date *cls* index for the project containing *root*.
+
+    Args:
+        cls:          ProjectIndex subclass.
+        root:         Any directory inside the project.
+        min_interval: Skip the mtime refresh if the in-memory index was
+                      refreshed less than this many seconds ago.
+
+    Returns None when the caller must fall back to a direct scan: the index
+    is missing, being rebuilt, or too stale to refresh inline.
+    """
+    project = find_project_root(root)
+    key = (cls.SUFFIX, str(project))
+
+    with _lock:
+        if key in _building:
+            return None
+        index = _indexes.get(key)
+    if index is None:
+        index = cls.load(project)
+        if index is None:
+            _rebuild_in_background(cls, project)
+            return None
+        with _lock:
+            _indexes[key] = index
+
+    if time.monotonic() - index.refreshed_at < min_interval:
+        return index
+    if not index.refresh(max_updates=MAX_INLINE_UPDATES):
+        _rebuild_in_background(cls, project)
+        return None
+    return index
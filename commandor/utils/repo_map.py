@@ -0,0 +1,276 @@
+"""Compact repository map for the agent's system prompt.
+
+Lists the project's directories and files with their sizes and top-level
+classes/functions (taken from the symbol index), so the model can start
+work without a round of list_directory_tool / glob_tool calls.
+
+The map is built in a background thread and never on the prompt path.
+``get_repo_map`` returns the last map built for the project and starts a
+rebuild when it may be out of date.  In a git work tree that is when
+``git_context.repo_state`` changes: a commit, checkout, reset or
+``git add``, read from ``.git`` without running git.  Outside git the
+listing is re-checked every ``RECHECK_AFTER`` seconds.
+
+The rebuild first computes a content key: HEAD plus the tracked-file list
+(the file listing outside git).  If the key is unchanged, the old text is
+kept as is.  The map is therefore a snapshot: editing files doesn't change
+it, so it can sit in the cached part of the prompt.  Files appear or
+disappear when they are added to or removed from the index; sizes and
+symbols of files that were already tracked catch up only at the next
+commit, because staging a change to them leaves the key as it was.  Maps
+are also saved to ``~/.commandor/repomap/`` and used on the next start
+while they are being re-checked.
+
+Public API:
+    get_repo_map(path=".", max_tokens=1500, wait=None) -> str
+        Rendered map trimmed to roughly *max_tokens*, or "" when the
+        directory is too large or unreadable, or when no map is ready
+        after *wait* seconds (None waits for the build).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .git_context import repo_state
+from .walker import find_project_root, iter_files
+
+_CACHE_DIR = Path.home() / ".commandor" / "repomap"
+
+# Don't map home directories or monorepos wholesale.
+MAX_FILES = 20_000
+
+# Outside git there is no cheap change signal; re-list this often (seconds).
+RECHECK_AFTER = 60.0
+
+# Public top-level names shown per file.
+MAX_NAMES_PER_FILE = 8
+
+_MAP_KINDS = {"class", "function", "type", "module", "namespace", "macro"}
+
+# Rough chars-per-token ratio used for the budget.
+_CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class _Entry:
+    state: Optional[tuple]  # repo_state key when built (None: unchecked or no git)
+    checked: float          # time.monotonic() of the build; 0.0 if loaded from disk
+    key: str                # content key (see module docstring)
+    max_tokens: int
+    text: str
+
+
+_maps: Dict[str, _Entry] = {}
+_inflight: Dict[str, threading.Event] = {}
+_lock = threading.Lock()
+
+
+def _git(root: Path, *args: str) -> Optional[bytes]:
+    try:
+        proc = subprocess.run(
+            ["git", "--no-optional-locks", *args], cwd=str(root), capture_output=True, timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return proc.stdout if proc.returncode == 0 else None
+
+
+def _content_key(root: Path, files: List[str]) -> str:
+    """HEAD + tracked-file list (or the listing outside git): what the map shows."""
+    h = hashlib.sha1(str(root).encode("utf-8"))
+    head = _git(root, "rev-parse", "HEAD") if (root / ".git").exists() else None
+    tracked = _git(root, "ls-files", "-z") if head is not None else None
+    if head is not None and tracked is not None:
+        h.update(head)
+        h.update(tracked)
+    else:
+        h.update(b"\0".join(f.encode("utf-8", "surrogateescape") for f in files))
+    return h.hexdigest()
+
+
+def _fmt_size(size: int) -> str:
+    if size < 1024:
+        return f"{size}B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f}K"
+    return f"{size / (1024 * 1024):.1f}M"
+
+
+def _top_level_names(root: Path) -> Dict[str, List[str]]:
+    """``relpath -> top-level definition names`` from a fully refreshed symbol index."""
+    from .project_index import build  # noqa: PLC0415
+    from .symbol_index import SymbolIndex  # noqa: PLC0415
+
+    index = build(SymbolIndex, root)
+    if index is None:
+        return {}
+    out: Dict[str, List[str]] = {}
+    for rel, (_m, _s, defs) in index.files.items():
+        names = [
+            name for name, qual, kind, _line in defs
+            if name == qual and kind in _MAP_KINDS and not name.startswith("_")
+        ]
+        if names:
+            out[rel.replace(os.sep, "/")] = names
+    return out
+
+
+def _render(root: Path, files: List[str], names: Dict[str, List[str]], budget: int) -> str:
+    by_dir: Dict[str, List[str]] = {}
+    for rel in files:
+        d, _, base = rel.rpartition("/")
+        by_dir.setdefault(d, []).append(base)
+    # Shallow directories first, so a tight budget still shows the layout.
+    order = sorted(by_dir, key=lambda d: (d.count("/") + bool(d), d))
+
+    lines: List[str] = []
+    used = 0
+    shown = 0
+    for d in order:
+        header = f"{d}/" if d else "./"
+        entries: List[str] = [header]
+        for base in sorted(by_dir[d]):
+            rel = f"{d}/{base}" if d else base
+            try:
+                size = os.stat(root / rel).st_size
+            except OSError:
+                continue
+            entry = f"  {base} ({_fmt_size(size)})"
+            defs = names.get(rel)
+            if defs:
+                more = f", +{len(defs) - MAX_NAMES_PER_FILE}" if len(defs) > MAX_NAMES_PER_FILE else ""
+                entry += ": " + ", ".join(defs[:MAX_NAMES_PER_FILE]) + more
+            entries.append(entry)
+        cost = sum(len(e) + 1 for e in entries)
+        if used + cost > budget:
+            break
+        lines.extend(entries)
+        used += cost
+        shown += len(entries) - 1
+    if shown < len(files):
+        lines.append(f"... {len(files) - shown} more files not shown")
+    return "\n".join(lines)
+
+
+def _cache_file(root: Path) -> Path:
+    return _CACHE_DIR / f"{hashlib.sha1(str(root).encode('utf-8')).hexdigest()[:16]}.json"
+
+
+def _load(root: Path) -> Optional[_Entry]:
+    try:
+        with open(_cache_file(root), "r", encoding="utf-8") as fh:
+            cached = json.load(fh)
+        return _Entry(None, 0.0, cached["key"], cached["max_tokens"], cached["map"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _save(root: Path, entry: _Entry) -> None:
+    cache_file = _cache_file(root)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"key": entry.key, "max_tokens": entry.max_tokens, "map": entry.text}, fh)
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass
+
+
+def _build(root: Path, max_tokens: int, done: threading.Event) -> None:
+    slot = str(root)
+    try:
+        # Read the state first, so changes made during the build trigger another.
+        found = repo_state(root)
+        state = found[1] if found is not None else None
+        files: List[str] = []
+        try:
+            for rel in iter_files(root):
+                files.append(rel)
+                if len(files) > MAX_FILES:
+                    files = []
+                    break
+        except OSError:
+            files = []
+
+        key = _content_key(root, files) if files else ""
+        with _lock:
+            old = _maps.get(slot)
+        if old is not None and old.key == key and old.max_tokens == max_tokens:
+            text = old.text
+        elif files:
+            text = _render(root, files, _top_level_names(root), max_tokens * _CHARS_PER_TOKEN)
+        else:
+            text = ""
+        entry = _Entry(state, time.monotonic(), key, max_tokens, text)
+        with _lock:
+            _maps[slot] = entry
+        if text and (old is None or old.key != key or old.text != text):
+            _save(root, entry)
+    finally:
+        with _lock:
+            _inflight.pop(slot, None)
+        done.set()
+
+
+def _start_build(root: Path, max_tokens: int) -> threading.Event:
+    slot = str(root)
+    with _lock:
+        done = _inflight.get(slot)
+        if done is not None:
+            return done
+        done = _inflight[slot] = threading.Event()
+    threading.Thread(
+        target=_build, args=(root, max_tokens, done), daemon=True, name="commandor-repo-map",
+    ).start()
+    return done
+
+
+def get_repo_map(path=".", max_tokens: int = 1500, wait: Optional[float] = None) -> str:
+    """Return the repository map for the project containing *path*.
+
+    Args:
+        path:       Any directory inside the project.
+        max_tokens: Approximate size limit of the rendered map.
+        wait:       Seconds to wait when no map has been built yet; None
+                    waits for the build.  An existing map is returned at
+                    once, even while it is being re-checked.
+    """
+    if max_tokens <= 0:
+        return ""
+    root = find_project_root(path)
+    found = repo_state(root)
+    state = found[1] if found is not None else None
+
+    with _lock:
+        entry = _maps.get(str(root))
+    if entry is None:
+        entry = _load(root)
+        if entry is not None:
+            with _lock:
+                entry = _maps.setdefault(str(root), entry)
+
+    if entry is not None and entry.max_tokens == max_tokens:
+        if state is not None:
+            current = entry.state == state
+        else:
+            current = entry.checked and time.monotonic() - entry.checked < RECHECK_AFTER
+        if not current:
+            _start_build(root, max_tokens)
+        return entry.text
+
+    done = _start_build(root, max_tokens)
+    if not done.wait(wait):
+        return ""
+    with _lock:
+        entry = _maps.get(str(root))
+    return entry.text if entry is not None and entry.max_tokens == max_tokens else ""
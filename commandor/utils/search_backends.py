@@ -0,0 +1,325 @@
+"""Pluggable content-search backends behind ``file_ops.search_in_files``.
+
+Two backends are provided and both return the same ``(path, line_no, text)``
+tuples, which ``search_in_files`` formats into the grep_tool output:
+
+    ripgrep  — spawns ``rg --json`` when ``rg`` is on PATH.
+    python   — process-pool scanner over mmap'd files; used when ripgrep is
+               missing or rejects the pattern.  ASCII-safe patterns are
+               prefiltered with a bytes regex, others run on decoded lines.
+
+Public API:
+    get_backend(name=None) -> SearchBackend
+        ``name`` is "ripgrep", "python" or None/"auto" (ripgrep if available).
+    run_search(pattern, root, file_pattern="*", files=None, max_matches=100)
+        Search with the default backend, falling back to python on rg errors.
+
+Both backends skip the same files as ``walker.iter_files``: IGNORE_DIRS plus
+anything excluded by ``.gitignore``/``.ignore`` (ripgrep applies those rules
+natively), and both return the first *max_matches* matches in
+``(path, line)`` order.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .walker import IGNORE_DIRS, file_pattern_regex, iter_files
+
+# (path, 1-based line number, line text without trailing newline)
+Match = Tuple[str, int, str]
+
+# Below this many files the process-pool start-up costs more than it saves.
+_MIN_PARALLEL_FILES = 64
+_BATCH_SIZE = 32
+
+# Longer candidate lists are not passed to rg as arguments (ARG_MAX).
+_MAX_RG_TARGETS = 4096
+
+
+def _iter_tree(root: Path, file_pattern: str) -> Iterator[Path]:
+    """Yield non-ignored files under *root* matching *file_pattern*."""
+    regex = file_pattern_regex(file_pattern)
+    for rel in iter_files(root):
+        if regex.match(rel):
+            yield root / rel
+
+
+def _rg_glob(file_pattern: str) -> str:
+    """*file_pattern* as an rg ``--glob`` with ``file_pattern_regex`` semantics.
+
+    rg anchors globs that contain a ``/`` at the search root; a ``**/``
+    prefix lets them start in any directory, as they do for the walker.
+    """
+    if "/" not in file_pattern or file_pattern.startswith(("/", "**/")):
+        return file_pattern
+    return "**/" + file_pattern
+
+
+# ---------------------------------------------------------------------------
+# Python backend (process pool + mmap)
+# ---------------------------------------------------------------------------
+
+# Constructs whose bytes-mode meaning differs from str mode: ``.`` and
+# negated classes consume one byte of a multi-byte character, ``\w``/``\s``/
+# ``\d``/``\b`` are ASCII-only, ``\x..`` and octal escapes name a byte rather
+# than a code point, IGNORECASE folds non-ASCII letters only for str, and
+# ``$`` does not match before the ``\r`` of a CRLF line (lines are matched
+# without it).  Matching any of them is conservative: such patterns scan
+# decoded lines.
+_BYTES_UNSAFE = re.compile(r"\.|\$|\\[wWsSdDbBxuUN0-9]|\[\^|\(\?[a-zA-Z-]*i")
+
+
+def _bytes_safe(pattern: str) -> bool:
+    """True if a bytes regex of *pattern* finds every line the str regex does."""
+    return pattern.isascii() and _BYTES_UNSAFE.search(pattern) is None
+
+
+def _scan_file(path: str, pattern: str, max_matches: int) -> List[Match]:
+    """Scan one file; runs inside a pool worker.
+
+    For ASCII-safe patterns a bytes regex finds candidate positions over the
+    whole mmap; each hit is confirmed against its decoded line with the
+    ``str`` regex so results keep the line-by-line semantics of the original
+    scanner.  Other patterns are matched against the decoded lines directly.
+    Either way lines end only at ``\n`` (a trailing ``\r`` is dropped), as in
+    ripgrep, so line numbers do not depend on the pattern.
+    """
+    text_re = re.compile(pattern)
+    bytes_re: Optional[re.Pattern] = None
+    if _bytes_safe(pattern):
+        try:
+            bytes_re = re.compile(pattern.encode("ascii"), re.MULTILINE)
+        except re.error:
+            pass
+
+    out: List[Match] = []
+    try:
+        with open(path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                return out
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if b"\0" in buf[:8192]:
+                    return out  # binary
+                if bytes_re is None:
+                    lines = buf[:].decode("utf-8").split("\n")
+                    if not lines[-1]:
+                        lines.pop()
+                    for i, line in enumerate(lines, 1):
+                        if line.endswith("\r"):
+                            line = line[:-1]
+                        if text_re.search(line):
+                            out.append((path, i, line.rstrip()))
+                            if len(out) >= max_matches:
+                                break
+                    return out
+
+                pos, line_no, counted_to = 0, 1, 0
+                end = len(buf)
+                while pos < end:
+                    m = bytes_re.search(buf, pos)
+                    if m is None:
+                        break
+                    start = buf.rfind(b"\n", 0, m.start()) + 1
+                    stop = buf.find(b"\n", m.start())
+                    if stop == -1:
+                        stop = end
+                    line_no += buf[counted_to:start].count(b"\n")
+                    counted_to = start
+                    line = buf[start:stop].decode("utf-8")
+                    if line.endswith("\r"):
+                        line = line[:-1]
+                    if text_re.search(line):
+                        out.append((path, line_no, line.rstrip()))
+                        if len(out) >= max_matches:
+                            break
+                    pos = stop + 1
+    except (OSError, ValueError, UnicodeDecodeError):
+        pass
+    return out
+
+
+def _scan_batch(paths: List[str], pattern: str, max_matches: int) -> List[Match]:
+    out: List[Match] = []
+    for path in paths:
+        out.extend(_scan_file(path, pattern, max_matches - len(out)))
+        if len(out) >= max_matches:
+            break
+    return out
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # The TUI is multithreaded; forking it could copy a held lock into
+        # the workers, so they start from a fresh interpreter instead.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context(method),
+        )
+        atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+class PythonBackend:
+    """Multi-core scanner: batches of files are fanned out to a process pool."""
+
+    name = "python"
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def search(
+        self,
+        pattern: str,
+        root: Path,
+        file_pattern: str = "*",
+        files: Optional[Iterable[Path]] = None,
+        max_matches: int = 100,
+    ) -> List[Match]:
+        # Sorted so the first max_matches are the same ones ripgrep returns.
+        paths = sorted(str(f) for f in (files if files is not None else _iter_tree(root, file_pattern)))
+
+        if len(paths) < _MIN_PARALLEL_FILES or (os.cpu_count() or 1) < 2:
+            return _scan_batch(paths, pattern, max_matches)
+
+        batches = [paths[i:i + _BATCH_SIZE] for i in range(0, len(paths), _BATCH_SIZE)]
+        futures = [
+            _get_pool().submit(_scan_batch, batch, pattern, max_matches)
+            for batch in batches
+        ]
+        out: List[Match] = []
+        for i, fut in enumerate(futures):
+            out.extend(fut.result())
+            if len(out) >= max_matches:
+                for rest in futures[i + 1:]:
+                    rest.cancel()
+                break
+        return out[:max_matches]
+
+
+# ---------------------------------------------------------------------------
+# ripgrep backend
+# ---------------------------------------------------------------------------
+
+class RipgrepError(RuntimeError):
+    """ripgrep could not run the search (bad regex, crash, missing binary)."""
+
+
+class RipgrepBackend:
+    """Runs ``rg --json`` and parses its match events.
+
+    rg searches files in parallel and prints them in completion order, so
+    the whole stream is read and sorted before it is cut to *max_matches*
+    (``--max-count`` only caps the matches taken from any one file).
+    """
+
+    name = "ripgrep"
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("rg") is not None
+
+    def search(
+        self,
+        pattern: str,
+        root: Path,
+        file_pattern: str = "*",
+        files: Optional[Iterable[Path]] = None,
+        max_matches: int = 100,
+    ) -> List[Match]:
+        cmd = [
+            "rg", "--json", "--hidden", "--no-require-git", "--no-messages",
+            "--max-count", str(max_matches),
+        ]
+        targets: List[str] = []
+        if files is not None:
+            targets = [str(f) for f in files]
+            if not targets:
+                return []
+        if files is None or len(targets) > _MAX_RG_TARGETS:
+            cmd += ["--glob", _rg_glob(file_pattern)]
+            targets = [str(root)]
+        # Later globs win, so the exclusions must follow the file pattern.
+        for d in sorted(IGNORE_DIRS):
+            cmd += ["--glob", f"!{d}/"]
+        cmd += ["-e", pattern, "--", *targets]
+
+        try:
+            proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except OSError as exc:
+            raise RipgrepError(str(exc)) from exc
+
+        out: List[Match] = []
+        try:
+            assert proc.stdout is not None
+            for raw in proc.stdout:
+                try:
+                    event = json.loads(raw)
+                except ValueError:
+                    continue
+                if event.get("type") != "match":
+                    continue
+                data = event["data"]
+                path = data["path"].get("text")
+                text = data["lines"].get("text")
+                if path is None or text is None:
+                    continue  # non-UTF-8 path or line
+                out.append((path, data["line_number"], text.rstrip()))
+        finally:
+            _, stderr = proc.communicate()
+
+        # rg exits 1 for "no matches", 2 for errors (e.g. unsupported regex).
+        if proc.returncode == 2 and not out:
+            raise RipgrepError(stderr.decode("utf-8", "replace").strip())
+        out.sort(key=lambda m: (m[0], m[1]))
+        return out[:max_matches]
+
+
+_BACKENDS = {
+    RipgrepBackend.name: RipgrepBackend,
+    PythonBackend.name: PythonBackend,
+}
+
+
+def run_search(
+    pattern: str,
+    root: Path,
+    file_pattern: str = "*",
+    files: Optional[Iterable[Path]] = None,
+    max_matches: int = 100,
+) -> List[Match]:
+    """Search with the default backend, retrying in Python if ripgrep fails."""
+    try:
+        return get_backend().search(pattern, root, file_pattern, files, max_matches)
+    except RipgrepError:
+        return PythonBackend().search(pattern, root, file_pattern, files, max_matches)
+
+
+def get_backend(name: Optional[str] = None):
+    """Return a backend instance by name; None/"auto" prefers ripgrep."""
+    if name in (None, "auto"):
+        return RipgrepBackend() if RipgrepBackend.available() else PythonBackend()
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown search backend: '{name}'. Valid choices are: auto, {', '.join(_BACKENDS)}."
+        ) from None
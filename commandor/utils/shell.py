@@ -1,58 +1,292 @@
-import subprocess
 import os
 import platform
+import time
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Callable, Optional, Tuple, List
 import json
 
 
 def run_command(
     command: str,
     timeout: int = 60,
-    cwd: Optional[str] = None
+    cwd: Optional[str] = None,
+    on_output: Optional[Callable[[str, str], None]] = None,
+    session=None,
+    cache_key: Optional[str] = None,
+    on_result: Optional[Callable[[object], None]] = None,
 ) -> str:
     """Run a shell command
     
+    Output is streamed through bounded buffers: only the head and tail of
+    each stream are kept, with a marker counting the bytes omitted between
+    and naming the spill handle that holds the complete stream.
+    
     Args:
         command: Command to execute
         timeout: Timeout in seconds
         cwd: Working directory
+        on_output: Optional ``callback(stream, text)`` receiving output
+            incrementally while the command runs
+        session: Optional ``shell_session.ShellSession`` to run the command
+            in, keeping environment and directory changes for later calls
+        cache_key: Optional ``command_cache.cache_key`` for a command declared
+            pure; a cached result is returned instead of running it, and a
+            successful (exit code 0) run is cached.  The first line says
+            whether it was a hit
+        on_result: Optional ``callback(RunResult)`` called once the command
+            has finished, e.g. to record its duration and resource usage
+    
+    The ``agent.command_memory_limit_mb`` / ``agent.command_cpu_limit_s``
+    caps apply to every command run here.
     
     Returns:
         Command output
     """
+    from . import command_cache
+    from .stream_runner import run_streaming
+    
+    limits = resource_limits()
+    workdir = cwd or str(Path.cwd())
+    if cache_key is not None:
+        hit = command_cache.lookup(cache_key)
+        if hit is not None:
+            age = command_cache.format_age(time.time() - hit.created)
+            return f"[cache hit: result of an identical run {age} ago]\n{hit.output}"
+    
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=cwd or str(Path.cwd()),
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
+        if session is not None:
+            result = session.run(
+                command,
+                timeout=timeout,
+                cwd=workdir,
+                on_output=on_output,
+                limits=limits,
+                spill=True,
+            )
+        else:
+            result = run_streaming(
+                command,
+                timeout=timeout,
+                cwd=workdir,
+                on_output=on_output,
+                limits=limits,
+                spill=True,
+            )
         
-        output = []
+        if on_result is not None:
+            on_result(result)
+        
+        if result.timed_out:
+            if session is not None:
+                return (
+                    f"Error: Command timed out after {timeout} seconds "
+                    "(shell session was restarted; environment changes are lost)"
+                )
+            return f"Error: Command timed out after {timeout} seconds"
         
-        if result.stdout:
-            output.append(result.stdout)
+        output = []
         
-        if result.stderr:
-            output.append(f"[stderr] {result.stderr}")
+        combined = _combined_output(result)
+        if combined:
+            output.append(combined)
         
         if result.returncode != 0:
             output.append(f"[exit code: {result.returncode}]")
         
+        limit_note = _limit_note(result, limits)
+        if limit_note:
+            output.append(limit_note)
+        
+        if session is not None:
+            if result.restarted:
+                output.append("[shell exited; a fresh session starts with the next command]")
+            elif result.cwd and result.cwd != str(Path.cwd()) and os.path.isdir(result.cwd):
+                # Keep file tools in step with a `cd` made inside the session.
+                os.chdir(result.cwd)
+                _prefetch_git_context(result.cwd)
+        
         if not output:
             output.append("(no output)")
         
-        return "\n".join(output)
+        text = "\n".join(output)
+        if cache_key is not None:
+            if result.returncode != 0 or limit_note:
+                return f"[cache miss: command failed, so its result was not cached]\n{text}"
+            if command_cache.store(cache_key, command, workdir, text):
+                return f"[cache miss: command ran and its result was cached]\n{text}"
+            return f"[cache miss: command ran; caching is disabled or failed]\n{text}"
+        return text
     
-    except subprocess.TimeoutExpired:
-        return f"Error: Command timed out after {timeout} seconds"
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+def resource_limits():
+    """``stream_runner.ResourceLimits`` from the agent config (None if unset)."""
+    from .stream_runner import ResourceLimits
+    
+    try:
+        from ..config import get_config
+        
+        cfg = get_config()
+        if not cfg.config or os.name != "posix":
+            return None
+        agent = cfg.config.agent
+        limits = ResourceLimits(agent.command_memory_limit_mb, agent.command_cpu_limit_s)
+    except Exception:
+        return None
+    return limits or None
+
+
+def _limit_note(result, limits) -> str:
+    """Explain a failure that was likely caused by a configured limit."""
+    import signal
+    
+    if not limits or result.returncode in (0, None):
+        return ""
+    xcpu = getattr(signal, "SIGXCPU", None)
+    usage = getattr(result, "usage", None)
+    hit_cpu = result.returncode in (-xcpu, 128 + xcpu) or (
+        result.returncode == -signal.SIGKILL
+        and usage is not None and usage.cpu_time >= limits.max_cpu_seconds
+    )
+    if limits.max_cpu_seconds and xcpu and hit_cpu:
+        return (
+            f"[killed: CPU time limit of {limits.max_cpu_seconds}s exceeded "
+            "(agent.command_cpu_limit_s)]"
+        )
+    if limits.max_memory_mb:
+        stderr = result.stderr.text().lower() if result.stderr.total else ""
+        if any(s in stderr for s in ("memoryerror", "out of memory", "cannot allocate", "bad_alloc")):
+            return (
+                f"[memory was capped at {limits.max_memory_mb} MB "
+                "(agent.command_memory_limit_mb); the failure may be caused by the cap]"
+            )
+    return ""
+
+
+def _combined_output(result) -> str:
+    """stdout, then ``[stderr] ...``, as run_command shows them."""
+    output = []
+    
+    if result.stdout.total:
+        output.append(result.stdout.text())
+    
+    if result.stderr.total:
+        output.append(f"[stderr] {result.stderr.text()}")
+    
+    return "\n".join(output)
+
+
+def run_commands(
+    commands: List[dict],
+    max_parallel: int = 4,
+    cwd: Optional[str] = None,
+    budget_tokens: Optional[int] = None,
+    on_output: Optional[Callable[[str, str, str], None]] = None,
+    on_result: Optional[Callable[[str, object], None]] = None,
+) -> str:
+    """Run independent shell commands concurrently
+    
+    Each command runs in its own fresh shell.  Results are listed in input
+    order with exit code and duration, each output compacted to an equal
+    share of *budget_tokens*.
+    
+    Args:
+        commands: ``{"command": str, "timeout": int}`` dicts (timeout
+            optional, default 60) or plain command strings
+        max_parallel: Maximum number of commands running at once
+        cwd: Working directory
+        budget_tokens: Token budget shared by all outputs (default: the
+            configured tool output budget)
+        on_output: Optional ``callback(command, stream, text)`` receiving
+            output incrementally
+        on_result: Optional ``callback(command, RunResult)`` called as each
+            command finishes
+    
+    Returns:
+        Per-command results followed by a one-line summary
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    from .output_compactor import compact_output, tool_budget
+    from .stream_runner import run_streaming
+    
+    specs = []
+    for entry in commands:
+        if isinstance(entry, str):
+            entry = {"command": entry}
+        if not isinstance(entry, dict) or not str(entry.get("command", "")).strip():
+            raise ValueError(f"Invalid command entry: {entry!r}")
+        specs.append((str(entry["command"]), int(entry.get("timeout") or 60)))
+    if not specs:
+        raise ValueError("No commands given")
+    
+    workdir = cwd or str(Path.cwd())
+    limits = resource_limits()
+    
+    def run_one(spec):
+        command, timeout = spec
+        callback = None
+        if on_output is not None:
+            def callback(stream, text):
+                on_output(command, stream, text)
+        try:
+            result = run_streaming(
+                command, timeout=timeout, cwd=workdir, on_output=callback, limits=limits,
+                spill=True,
+            )
+        except Exception as e:
+            return e
+        if on_result is not None:
+            on_result(command, result)
+        return result
+    
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(specs)))) as pool:
+        results = list(pool.map(run_one, specs))
+    wall = time.monotonic() - t0
+    
+    budget = budget_tokens if budget_tokens is not None else tool_budget("run_commands_tool")
+    # Leave room for the headers so the whole result stays within budget.
+    share = max(200, int(budget * 0.9) // len(specs)) if budget > 0 else 0
+    
+    blocks = []
+    failed = 0
+    for i, ((command, timeout), result) in enumerate(zip(specs, results), 1):
+        if isinstance(result, Exception):
+            failed += 1
+            blocks.append(f"[{i}] $ {command}\n    error: {result}")
+            continue
+        if result.timed_out:
+            failed += 1
+            status = f"timed out after {timeout}s"
+        else:
+            failed += result.returncode != 0
+            status = f"exit {result.returncode}"
+        body = compact_output(_combined_output(result).rstrip("\n"), budget_tokens=share) or "(no output)"
+        limit_note = _limit_note(result, limits)
+        if limit_note:
+            body += f"\n{limit_note}"
+        blocks.append(f"[{i}] $ {command}  ({status}, {result.duration:.1f}s)\n{body}")
+    
+    summary = (
+        f"{len(specs) - failed} of {len(specs)} command(s) succeeded "
+        f"(wall time {wall:.1f}s)"
+    )
+    return "\n\n".join(blocks + [summary])
+
+
+def _prefetch_git_context(path) -> None:
+    """Warm the git summary for a new working directory in the background."""
+    from .git_context import prefetch
+    
+    try:
+        prefetch(path)
+    except OSError:
+        pass
+
+
 def get_working_directory() -> str:
     """Get current working directory"""
     return str(Path.cwd())
@@ -82,6 +316,7 @@ def change_directory(path: str) -> str:
             return f"Error: Not a directory: {path}"
         
         os.chdir(target)
+        _prefetch_git_context(target)
         return f"Changed directory to: {target}"
     
     except Exception as e:
@@ -107,52 +342,38 @@ def get_environment_info() -> str:
     return json.dumps(info, indent=2)
 
 
-def get_git_info() -> str:
+def get_git_info(recent_commits: int = 0) -> str:
     """Get git repository information
     
+    Branch, upstream, HEAD and change counts from a single cached
+    ``git status --porcelain=v2 --branch`` (see ``git_context``).
+    
+    Args:
+        recent_commits: Also list this many recent commits (``git log
+            --oneline``, run on every call)
+    
     Returns:
         Git info as string
     """
-    try:
-        result = subprocess.run(
-            ["git", "status", "--porcelain"],
-            capture_output=True,
-            text=True,
-            cwd=Path.cwd()
-        )
-        
-        if result.returncode != 0:
-            return "Not a git repository"
-        
-        status = result.stdout.strip()
-        
-        # Get branch
-        branch_result = subprocess.run(
-            ["git", "branch", "--show-current"],
-            capture_output=True,
-            text=True,
-            cwd=Path.cwd()
-        )
-        branch = branch_result.stdout.strip() or "unknown"
-        
-        # Get recent commits
-        commits_result = subprocess.run(
-            ["git", "log", "--oneline", "-5"],
-            capture_output=True,
-            text=True,
-            cwd=Path.cwd()
-        )
-        commits = commits_result.stdout.strip()
-        
-        info = f"""Branch: {branch}
-Status: {"clean" if not status else "dirty"}
-Recent commits:
-{commits}"""
-        
-        return info
+    import subprocess
+    from .git_context import get_git_context
     
+    try:
+        info = get_git_context()
     except Exception as e:
         return f"Not a git repository: {str(e)}"
+    if recent_commits <= 0 or info.startswith("Not a git repository"):
+        return info
+    
+    try:
+        proc = subprocess.run(
+            ["git", "--no-optional-locks", "log", f"-{recent_commits}", "--oneline"],
+            capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return info
+    commits = proc.stdout.strip() if proc.returncode == 0 else ""
+    return f"{info}\nRecent commits:\n{commits or '(none)'}"
 
 
 def get_project_files(extensions: Optional[List[str]] = None) -> str:
@@ -164,23 +385,15 @@ def get_project_files(extensions: Optional[List[str]] = None) -> str:
     Returns:
         List of project files
     """
-    from .file_ops import list_directory
+    from .walker import iter_files
     
     if extensions is None:
         extensions = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.go', '.rs', '.cpp', '.c', '.h']
     
-    files = []
-    cwd = Path.cwd()
-    
-    # Common directories to ignore
-    ignore_dirs = {'.git', '__pycache__', 'node_modules', '.venv', 'venv', 'dist', 'build', '.next', 'target'}
-    
-    for ext in extensions:
-        for f in cwd.rglob(f'*{ext}'):
-            # Check if any parent should be ignored
-            if not any(part in ignore_dirs for part in f.parts):
-                rel = f.relative_to(cwd)
-                files.append(str(rel))
+    # One walk for all extensions; ignored directories (.git, node_modules,
+    # venvs, build output) and .gitignore'd paths are pruned by the walker.
+    suffixes = tuple(extensions)
+    files = [rel for rel in iter_files(Path.cwd()) if rel.endswith(suffixes)]
     
     if not files:
         return "No project files found"
@@ -0,0 +1,308 @@
+"""Long-lived bash coprocess that keeps shell state between commands.
+
+Normally every run_command call forks a new ``/bin/sh``.  Exported
+variables, ``source venv/bin/activate`` and ``cd`` are lost afterwards,
+and each call pays the shell's startup cost again.  A ShellSession keeps
+one bash process per agent session instead and writes each command to its
+stdin as::
+
+    cd -- <cwd> && eval -- '<command>' < /dev/null
+    printf '\\n<sentinel> %d %s\\n' "$?" "$PWD"; printf '\\n<sentinel>\\n' >&2
+
+Output is read until the sentinel lines show up on both streams.  They
+carry the exit code and the shell's final working directory.  ``eval``
+keeps syntax errors from killing the shell.  If a command times out, the
+whole process group is killed.  If the shell exits (``exit``, ``set -e``,
+a crash), the next command starts a fresh one.  Output goes into the same
+bounded OutputCapture buffers that stream_runner uses.
+
+Resource limits are applied to the shell when it starts and are inherited
+by every command; a call with different limits starts a fresh shell.  The
+shell's children are reaped by bash, so no per-command rusage is available
+(``SessionResult.usage`` is None).
+
+Enabled with ``agent.persistent_shell``; sessions are keyed by the agent's
+thread id and closed at exit.
+
+Public API:
+    get_session(key) -> ShellSession
+    close_sessions()
+    ShellSession
+        .run(command, timeout=60, cwd=None, on_output=None, limits=None, spill=False)
+            -> SessionResult
+        .close()
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import selectors
+import shlex
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .stream_runner import (
+    HEAD_BYTES,
+    TAIL_BYTES,
+    OutputCallback,
+    OutputCapture,
+    ResourceLimits,
+    RunResult,
+    _Throttle,
+)
+
+_READ_SIZE = 64 * 1024
+
+
+@dataclass
+class SessionResult(RunResult):
+    cwd: Optional[str] = None      # shell's $PWD after the command
+    restarted: bool = False        # the shell died and will be restarted
+
+
+class _SentinelStream:
+    """Feeds one pipe into an OutputCapture until the sentinel line."""
+
+    def __init__(self, name: str, marker: bytes, capture: OutputCapture,
+                 throttle: Optional[_Throttle]) -> None:
+        self.name = name
+        self.marker = marker
+        self.capture = capture
+        self.throttle = throttle
+        self.carry = b""
+        self.trailer: Optional[bytes] = None  # text after the marker, once seen
+        self.done = False
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self.capture.feed(data)
+            if self.throttle is not None:
+                self.throttle.feed(data)
+
+    def feed(self, data: bytes) -> None:
+        if self.trailer is not None:
+            self.trailer += data
+        else:
+            buf = self.carry + data
+            idx = buf.find(self.marker)
+            if idx < 0:
+                keep = len(self.marker) - 1
+                self._emit(buf[:-keep] if len(buf) > keep else b"")
+                self.carry = buf[-keep:] if len(buf) > keep else buf
+                return
+            self._emit(buf[:idx])
+            self.carry = b""
+            self.trailer = buf[idx + len(self.marker):]
+        if b"\n" in self.trailer:
+            self.done = True
+
+    def finish(self) -> None:
+        """Flush held-back bytes (the shell died before the sentinel)."""
+        if self.trailer is None:
+            self._emit(self.carry)
+            self.carry = b""
+        self.capture.close()
+        if self.throttle is not None:
+            self.throttle.flush(final=True)
+
+
+class ShellSession:
+    """One persistent bash process; commands run one at a time."""
+
+    def __init__(self, shell: str = "bash") -> None:
+        self.shell = shell
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._token = f"__commandor_{uuid.uuid4().hex}__"
+        self.cwd: Optional[str] = None
+        self.restarts = 0
+        self._limits: Optional[ResourceLimits] = None
+
+    # ------------------------------------------------------------------
+
+    def _alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self, limits: Optional[ResourceLimits] = None) -> subprocess.Popen:
+        if self._proc is not None:
+            self.restarts += 1
+            self._kill()
+        self._proc = subprocess.Popen(
+            [self.shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        if limits:
+            try:
+                self._proc.stdin.write(f"{limits.ulimit_script()}\n".encode())
+                self._proc.stdin.flush()
+            except OSError:
+                pass  # shell already gone; the next run restarts it
+        self._limits = limits
+        return self._proc
+
+    def _kill(self) -> None:
+        proc = self._proc
+        if proc is None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (OSError, ProcessLookupError):
+            pass
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for pipe in (proc.stdin, proc.stdout, proc.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._kill()
+            self._proc = None
+
+    # ------------------------------------------------------------------
+
+    def run(
+        self,
+        command: str,
+        timeout: Optional[float] = 60,
+        cwd: Optional[str] = None,
+        on_output: Optional[OutputCallback] = None,
+        head_bytes: int = HEAD_BYTES,
+        tail_bytes: int = TAIL_BYTES,
+        limits: Optional[ResourceLimits] = None,
+        spill: bool = False,
+    ) -> SessionResult:
+        """Run *command* in the session's shell (see module docstring).
+
+        Args:
+            command:   Shell command line.
+            timeout:   Seconds before the session is killed; None waits forever.
+            cwd:       Directory to run in (the shell's own $PWD if None).
+            on_output: ``callback(stream, text)`` while the command runs.
+            limits:    ResourceLimits for the shell (restarts it if changed).
+            spill:     Stream output that doesn't fit the buffers to spill
+                       files (see stream_runner.OutputCapture).
+        """
+        with self._lock:
+            if self._alive() and (limits or None) == (self._limits or None):
+                proc = self._proc
+            else:
+                proc = self._start(limits)
+            t0 = time.monotonic()
+            out = OutputCapture(head_bytes, tail_bytes, spill)
+            err = OutputCapture(head_bytes, tail_bytes, spill)
+            streams = {}
+            for name, pipe, capture, marker in (
+                ("stdout", proc.stdout, out, f"\n{self._token} ".encode()),
+                ("stderr", proc.stderr, err, f"\n{self._token}".encode()),
+            ):
+                throttle = _Throttle(name, on_output, 0.1, 8 * 1024) if on_output else None
+                streams[pipe.fileno()] = _SentinelStream(name, marker, capture, throttle)
+
+            script = f"eval -- {shlex.quote(command)} < /dev/null"
+            if cwd:
+                script = f"cd -- {shlex.quote(cwd)} && {script}"
+            script += (
+                f"\nprintf '\\n%s %d %s\\n' {self._token} \"$?\" \"$PWD\""
+                f"; printf '\\n%s\\n' {self._token} >&2\n"
+            )
+            try:
+                proc.stdin.write(script.encode("utf-8", "surrogateescape"))
+                proc.stdin.flush()
+            except OSError:
+                pass  # shell already gone; reported below as a restart
+
+            timed_out = False
+            deadline = None if timeout is None else t0 + timeout
+            sel = selectors.DefaultSelector()
+            for fd in streams:
+                sel.register(fd, selectors.EVENT_READ)
+            try:
+                while any(not s.done for s in streams.values()):
+                    wait = None if deadline is None else deadline - time.monotonic()
+                    if wait is not None and wait <= 0:
+                        timed_out = True
+                        break
+                    for key, _ in sel.select(wait):
+                        stream = streams[key.fd]
+                        try:
+                            chunk = os.read(key.fd, _READ_SIZE)
+                        except OSError:
+                            chunk = b""
+                        if not chunk:
+                            stream.done = True
+                            sel.unregister(key.fd)
+                            continue
+                        stream.feed(chunk)
+            finally:
+                sel.close()
+                for s in streams.values():
+                    s.finish()
+
+            stdout_stream = next(s for s in streams.values() if s.name == "stdout")
+            returncode: Optional[int] = None
+            restarted = False
+            if timed_out:
+                self._kill()
+                self._proc = None
+            elif stdout_stream.trailer is not None:
+                fields = stdout_stream.trailer.split(b"\n", 1)[0].decode("utf-8", "replace")
+                rc, _, pwd = fields.partition(" ")
+                returncode = int(rc) if rc.lstrip("-").isdigit() else None
+                self.cwd = pwd or self.cwd
+            else:
+                # EOF before the sentinel: the command ended the shell.
+                restarted = True
+                try:
+                    returncode = proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    pass
+                self._kill()
+                self._proc = None
+
+            return SessionResult(
+                returncode, out, err, timed_out, time.monotonic() - t0,
+                cwd=self.cwd, restarted=restarted,
+            )
+
+
+# ---------------------------------------------------------------------------
+# Per-agent-session registry
+# ---------------------------------------------------------------------------
+
+_sessions: Dict[str, ShellSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(key: str) -> ShellSession:
+    """Return the ShellSession for *key* (an agent thread id), creating it."""
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = ShellSession()
+        return session
+
+
+def close_sessions() -> None:
+    """Kill every session's shell (registered with atexit)."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+atexit.register(close_sessions)
@@ -0,0 +1,443 @@
+"""Popen-based command runner with bounded, streaming output capture.
+
+``subprocess.run(capture_output=True)`` keeps everything a command prints.
+Here each stream is read in fixed-size chunks by a reader thread into an
+OutputCapture, which keeps the first ``head_bytes`` and a ring buffer of
+the last ``tail_bytes`` and counts everything in between as dropped.
+Memory stays constant no matter how much the command prints.  With
+``spill=True`` the capture also streams the whole output to a spill file
+(``output_compactor.open_spill``) once it starts dropping bytes, up to
+``MAX_SPILL_BYTES``, and its omission marker names the spill handle.
+
+While the command runs, an optional ``on_output(stream, text)`` callback
+receives the new output, throttled to one call per ``emit_interval`` per
+stream.  If more arrived than ``emit_max_bytes``, only the newest part is
+passed on (``emit_max_bytes=None`` passes everything).
+
+Commands run in their own process group (session) on POSIX.
+``terminate_group`` stops the command together with every child it
+spawned: SIGTERM first, SIGKILL after a grace period.
+
+On POSIX the command is reaped with ``os.wait4``, so the result carries
+its ResourceUsage: user/system CPU time and peak RSS of the shell and
+every descendant it waited for.  ``limits`` applies RLIMIT_AS (address
+space) and RLIMIT_CPU (CPU seconds) to the shell and thus to everything
+it starts, through ``ulimit`` commands run before the command line.
+
+Public API:
+    run_streaming(command, timeout=60, cwd=None, on_output=None, ...) -> RunResult
+    terminate_group(proc, grace=2.0) -> returncode
+    ResourceLimits(max_memory_mb=0, max_cpu_seconds=0)
+        .ulimit_script() -> str
+    ResourceUsage
+        user_cpu, sys_cpu, max_rss_kb, .cpu_time, .summary(duration)
+    OutputCapture(head_bytes, tail_bytes, spill=False)
+        .feed(data), .close(), .text(), .total, .dropped, .spill_handle
+    RunResult
+        returncode, stdout, stderr (OutputCapture), timed_out, duration,
+        usage (ResourceUsage or None)
+"""
+
+from __future__ import annotations
+
+import codecs
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional
+
+HEAD_BYTES = 32 * 1024
+TAIL_BYTES = 32 * 1024
+_READ_SIZE = 64 * 1024
+
+# Spilled output beyond this many bytes per stream is not written.
+MAX_SPILL_BYTES = 64 * 1024 * 1024
+
+OutputCallback = Callable[[str, str], None]
+
+
+class OutputCapture:
+    """First *head_bytes* + last *tail_bytes* of a byte stream."""
+
+    def __init__(self, head_bytes: int = HEAD_BYTES, tail_bytes: int = TAIL_BYTES,
+                 spill: bool = False) -> None:
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self._tail: Deque[bytes] = deque()
+        self._tail_len = 0
+        self.total = 0
+        self._spill = spill
+        self._spill_fh = None
+        self._spilled = 0
+        self.spill_handle: Optional[str] = None
+
+    def feed(self, data: bytes) -> None:
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        if self._spill_fh is not None:
+            self._write_spill(data)
+        elif self._spill and self.total > self.head_bytes + self.tail_bytes:
+            self._start_spill(data)
+        if self.tail_bytes <= 0:
+            return
+        if len(data) >= self.tail_bytes:
+            self._tail.clear()
+            self._tail.append(bytes(data[-self.tail_bytes:]))
+            self._tail_len = self.tail_bytes
+            return
+        self._tail.append(bytes(data))
+        self._tail_len += len(data)
+        while self._tail_len - len(self._tail[0]) >= self.tail_bytes:
+            self._tail_len -= len(self._tail.popleft())
+
+    def _start_spill(self, data: bytes) -> None:
+        """Bytes are about to be dropped: save everything so far, then stream."""
+        self._spill = False
+        try:
+            from .output_compactor import open_spill  # noqa: PLC0415
+
+            self.spill_handle, self._spill_fh = open_spill()
+        except OSError:
+            return
+        self._write_spill(bytes(self.head) + b"".join(self._tail) + data)
+
+    def _write_spill(self, data: bytes) -> None:
+        data = data[:MAX_SPILL_BYTES - self._spilled]
+        try:
+            self._spill_fh.write(data)
+        except (OSError, ValueError):
+            data = b""
+            self.close()
+        self._spilled += len(data)
+        if self._spilled >= MAX_SPILL_BYTES:
+            self.close()
+
+    def close(self) -> None:
+        """Close the spill file (if any); call once the stream has ended."""
+        fh, self._spill_fh = self._spill_fh, None
+        if fh is not None:
+            try:
+                fh.close()
+            except OSError:
+                pass
+
+    @property
+    def tail(self) -> bytes:
+        buf = b"".join(self._tail)
+        return buf[-self.tail_bytes:] if len(buf) > self.tail_bytes else buf
+
+    @property
+    def dropped(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    def text(self) -> str:
+        """Decoded output with a marker where bytes were dropped."""
+        dropped = self.dropped
+        if dropped <= 0:
+            return (bytes(self.head) + self.tail).decode("utf-8", "replace")
+        head, tail = bytes(self.head), self.tail
+        # Cut both sides at line boundaries when one is reasonably close.
+        nl = head.rfind(b"\n")
+        if nl >= len(head) // 2:
+            dropped += len(head) - nl - 1
+            head = head[:nl + 1]
+        nl = tail.find(b"\n")
+        if 0 <= nl < len(tail) // 2:
+            dropped += nl + 1
+            tail = tail[nl + 1:]
+        where = ""
+        if self.spill_handle is not None:
+            if self._spilled < self.total:
+                kept = f"first {self._spilled // (1024 * 1024):,} MB of the"
+            else:
+                kept = "complete"
+            where = f"; the {kept} stream is saved as spill handle {self.spill_handle!r}"
+        return (
+            f"{head.decode('utf-8', 'replace').rstrip(chr(10))}\n"
+            f"… [{dropped:,} bytes omitted{where}] …\n"
+            f"{tail.decode('utf-8', 'replace')}"
+        )
+
+
+@dataclass
+class ResourceLimits:
+    """Per-process caps applied to a command's shell; 0 means unlimited."""
+
+    max_memory_mb: int = 0      # RLIMIT_AS
+    max_cpu_seconds: int = 0    # RLIMIT_CPU (the process gets SIGXCPU)
+
+    def __bool__(self) -> bool:
+        return self.max_memory_mb > 0 or self.max_cpu_seconds > 0
+
+    def ulimit_script(self) -> str:
+        """``ulimit`` commands that apply the caps in a POSIX shell (or "").
+
+        Prefixed to the command line instead of a ``preexec_fn``, which is
+        unsafe in a multithreaded parent.  The limits are inherited by
+        everything the shell starts.
+        """
+        parts = []
+        if self.max_memory_mb > 0:
+            parts.append(f"ulimit -v {self.max_memory_mb * 1024}")  # KB
+        if self.max_cpu_seconds > 0:
+            # Soft limit sends SIGXCPU; the hard limit one second later SIGKILLs.
+            # (soft first: the soft limit may not exceed the hard one).
+            parts.append(f"ulimit -S -t {self.max_cpu_seconds}")
+            parts.append(f"ulimit -H -t {self.max_cpu_seconds + 1}")
+        return "; ".join(parts)
+
+
+@dataclass
+class ResourceUsage:
+    user_cpu: float     # seconds
+    sys_cpu: float      # seconds
+    max_rss_kb: int     # peak resident set size of the largest process
+
+    @property
+    def cpu_time(self) -> float:
+        return self.user_cpu + self.sys_cpu
+
+    @classmethod
+    def from_rusage(cls, ru) -> "ResourceUsage":
+        # ru_maxrss is in kilobytes on Linux but in bytes on macOS.
+        rss = ru.ru_maxrss // 1024 if sys.platform == "darwin" else ru.ru_maxrss
+        return cls(ru.ru_utime, ru.ru_stime, int(rss))
+
+    def summary(self, duration: Optional[float] = None) -> str:
+        parts = [f"{duration:.1f}s"] if duration is not None else []
+        parts.append(f"cpu {self.cpu_time:.1f}s")
+        parts.append(f"max RSS {self.max_rss_kb / 1024:,.0f} MB")
+        return " · ".join(parts)
+
+
+@dataclass
+class RunResult:
+    returncode: Optional[int]
+    stdout: OutputCapture
+    stderr: OutputCapture
+    timed_out: bool
+    duration: float
+    usage: Optional[ResourceUsage] = None
+
+
+class _Throttle:
+    """Coalesce chunks for one stream into at most one callback per interval."""
+
+    def __init__(self, stream: str, callback: OutputCallback,
+                 interval: float, max_bytes: Optional[int]) -> None:
+        self.stream = stream
+        self.callback = callback
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.pending = bytearray()
+        self.last = 0.0
+        # Chunks may end inside a multi-byte character.
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+    def feed(self, data: bytes) -> None:
+        self.pending += data
+        if self.max_bytes is not None and len(self.pending) > self.max_bytes:
+            del self.pending[:-self.max_bytes]
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: Optional[float] = None, final: bool = False) -> None:
+        if self.pending or final:
+            text = self._decoder.decode(bytes(self.pending), final)
+            self.pending.clear()
+            if text:
+                try:
+                    self.callback(self.stream, text)
+                except Exception:
+                    pass
+        self.last = now if now is not None else time.monotonic()
+
+
+def _pump(pipe, capture: OutputCapture, throttle: Optional[_Throttle]) -> None:
+    fd = pipe.fileno()
+    try:
+        while True:
+            chunk = os.read(fd, _READ_SIZE)
+            if not chunk:
+                break
+            capture.feed(chunk)
+            if throttle is not None:
+                throttle.feed(chunk)
+    except OSError:
+        pass
+    finally:
+        capture.close()
+        if throttle is not None:
+            throttle.flush(final=True)
+        pipe.close()
+
+
+def _signal_group(proc: subprocess.Popen, force: bool) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL if force else signal.SIGTERM)
+        elif force:
+            proc.kill()
+        else:
+            proc.terminate()
+    except (OSError, ProcessLookupError):
+        pass
+
+
+def terminate_group(proc: subprocess.Popen, grace: float = 2.0) -> Optional[int]:
+    """SIGTERM *proc*'s process group, then SIGKILL it after *grace* seconds.
+
+    The group is killed even if *proc* itself already exited, so children
+    it left behind don't outlive it.  Safe to call from any thread.
+    """
+    if grace > 0 and proc.poll() is None:
+        _signal_group(proc, force=False)
+        try:
+            proc.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            pass
+    _signal_group(proc, force=True)
+    try:
+        return proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        return None
+
+
+class _Reaper:
+    """Reaps a child with ``os.wait4`` on a helper thread to get its rusage.
+
+    Popen itself only uses waitpid, which discards the usage.  A Popen
+    ``poll()``/``wait()`` racing with us (``terminate_group``) gets ECHILD
+    and records exit code 0, so ``returncode`` here is authoritative.  If
+    the Popen reaps the child first, usage and returncode stay None.
+    """
+
+    def __init__(self, proc: subprocess.Popen) -> None:
+        self.proc = proc
+        self.returncode: Optional[int] = None
+        self.usage: Optional[ResourceUsage] = None
+        self.done = threading.Event()
+        threading.Thread(target=self._run, daemon=True, name="commandor-reaper").start()
+
+    def _run(self) -> None:
+        try:
+            _, status, ru = os.wait4(self.proc.pid, 0)
+        except ChildProcessError:
+            pass  # already reaped through the Popen
+        else:
+            self.returncode = self.proc.returncode = os.waitstatus_to_exitcode(status)
+            self.usage = ResourceUsage.from_rusage(ru)
+        finally:
+            self.done.set()
+
+    def wait(self, timeout: Optional[float]) -> None:
+        if not self.done.wait(timeout):
+            raise subprocess.TimeoutExpired(self.proc.args, timeout)
+        if self.proc.returncode is None:
+            self.proc.wait()
+
+
+def run_streaming(
+    command: str,
+    timeout: Optional[float] = 60,
+    cwd: Optional[str] = None,
+    on_output: Optional[OutputCallback] = None,
+    head_bytes: int = HEAD_BYTES,
+    tail_bytes: int = TAIL_BYTES,
+    emit_interval: float = 0.1,
+    emit_max_bytes: Optional[int] = 8 * 1024,
+    env: Optional[Dict[str, str]] = None,
+    executable: Optional[str] = None,
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+    kill_grace: float = 2.0,
+    limits: Optional[ResourceLimits] = None,
+    spill: bool = False,
+) -> RunResult:
+    """Run *command* through the shell, capturing bounded stdout/stderr.
+
+    Args:
+        command:        Shell command line.
+        timeout:        Seconds before the command (and its process group)
+                        is killed; None waits forever.
+        cwd:            Working directory (default: current).
+        on_output:      ``callback(stream, text)`` with stream "stdout" or
+                        "stderr", called from reader threads while running.
+        head_bytes:     Bytes kept from the start of each stream.
+        tail_bytes:     Bytes kept from the end of each stream.
+        emit_interval:  Minimum seconds between callbacks per stream.
+        emit_max_bytes: Newest bytes passed per callback (None: all).
+        env:            Environment for the command (default: inherited).
+        executable:     Shell to run the command with (default: /bin/sh).
+        on_start:       Called with the Popen right after it starts, e.g.
+                        to keep it for ``terminate_group`` (cancellation).
+        kill_grace:     Seconds between SIGTERM and SIGKILL on timeout.
+        limits:         Optional ResourceLimits for the command (POSIX only).
+        spill:          Stream output that doesn't fit the buffers to spill
+                        files (see OutputCapture).
+    """
+    t0 = time.monotonic()
+    if limits and os.name == "posix":
+        command = f"{limits.ulimit_script()}\n{command}"
+    proc = subprocess.Popen(
+        command,
+        shell=True,
+        executable=executable,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=(os.name == "posix"),
+    )
+    reaper = _Reaper(proc) if hasattr(os, "wait4") else None
+    if on_start is not None:
+        on_start(proc)
+    out = OutputCapture(head_bytes, tail_bytes, spill)
+    err = OutputCapture(head_bytes, tail_bytes, spill)
+    readers = []
+    for name, pipe, capture in (("stdout", proc.stdout, out), ("stderr", proc.stderr, err)):
+        throttle = (
+            _Throttle(name, on_output, emit_interval, emit_max_bytes)
+            if on_output is not None else None
+        )
+        t = threading.Thread(target=_pump, args=(pipe, capture, throttle), daemon=True)
+        t.start()
+        readers.append(t)
+
+    timed_out = False
+    try:
+        if reaper is not None:
+            reaper.wait(timeout)
+        else:
+            proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        terminate_group(proc, kill_grace)
+        if reaper is not None:
+            reaper.done.wait(1.0)
+    except BaseException:
+        terminate_group(proc, grace=0)
+        raise
+    finally:
+        # Background children may keep the pipes open; don't wait on them forever.
+        deadline = time.monotonic() + 2.0
+        for t in readers:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    usage = None
+    if reaper is not None and reaper.returncode is not None:
+        proc.returncode = reaper.returncode
+        usage = reaper.usage
+    return RunResult(proc.returncode, out, err, timed_out, time.monotonic() - t0, usage=usage)
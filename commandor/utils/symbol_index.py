@@ -0,0 +1,229 @@
+"""Per-project symbol index: where are functions, classes and types defined?
+
+Python files are parsed with ``ast`` (functions, methods, classes and
+module-level assignments, with qualified names such as ``Class.method``).
+Other languages use ctags-style regexes keyed by file extension.  The index
+is a ProjectIndex (see ``project_index``), so it is cached on disk under
+``~/.commandor/index/`` and refreshed incrementally by mtime/size; lookups
+are answered from an in-memory ``name -> locations`` dict.
+
+References are found with the regular search backends, narrowed by the
+trigram index, so they need no extra storage.
+
+Public API:
+    find_definitions(name, root=".") -> tuple[Path, list[Symbol]]
+        Project root and the definitions of *name* (``Class.method`` works).
+    find_references(name, root=".", limit=50) -> list[tuple[str, int, str]]
+    Symbol
+        NamedTuple(path, line, kind, qualname).
+"""
+
+from __future__ import annotations
+
+import ast
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .project_index import ProjectIndex, acquire
+from .search_backends import Match, run_search
+from .trigram_index import candidate_files
+
+# Don't parse generated/minified monsters.
+MAX_PARSED_BYTES = 2 * 1024 * 1024
+
+# Re-check file mtimes at most this often; lookups in between are pure
+# dict hits.
+REFRESH_INTERVAL = 1.0
+
+
+class Symbol(NamedTuple):
+    path: str       # relative to the project root
+    line: int       # 1-based
+    kind: str       # function, method, class, variable, type, ...
+    qualname: str   # e.g. "TerminalWidget._run_shell"
+
+
+# (name, qualname, kind, line) as stored per file
+_Def = Tuple[str, str, str, int]
+
+_JS_TAGS = [
+    ("function", r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)"),
+    ("class", r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)"),
+    ("function", r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)"),
+    ("variable", r"^(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*[:=]"),
+    ("type", r"^\s*(?:export\s+)?(?:declare\s+)?(?:interface|type|enum)\s+([A-Za-z_$][\w$]*)"),
+]
+
+_TAG_PATTERNS: Dict[str, List[Tuple[str, str]]] = {
+    ".js": _JS_TAGS, ".jsx": _JS_TAGS, ".mjs": _JS_TAGS, ".cjs": _JS_TAGS,
+    ".ts": _JS_TAGS, ".tsx": _JS_TAGS,
+    ".go": [
+        ("function", r"^func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)"),
+        ("type", r"^type\s+([A-Za-z_]\w*)"),
+        ("variable", r"^(?:var|const)\s+([A-Za-z_]\w*)"),
+    ],
+    ".rs": [
+        ("function", r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?(?:extern\s+\"[^\"]*\"\s+)?fn\s+([A-Za-z_]\w*)"),
+        ("type", r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|type|union)\s+([A-Za-z_]\w*)"),
+        ("module", r"^\s*(?:pub(?:\([^)]*\))?\s+)?mod\s+([A-Za-z_]\w*)"),
+        ("variable", r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:const|static)\s+(?:mut\s+)?([A-Za-z_]\w*)"),
+        ("macro", r"^\s*macro_rules!\s*([A-Za-z_]\w*)"),
+    ],
+    ".java": [
+        ("class", r"^\s*(?:(?:public|protected|private|abstract|final|static|sealed)\s+)*(?:class|interface|enum|record)\s+([A-Za-z_]\w*)"),
+        ("method", r"^\s+(?:(?:public|protected|private|abstract|final|static|synchronized|native)\s+)+[\w<>\[\],\s]+?\s+([A-Za-z_]\w*)\s*\("),
+    ],
+    ".kt": [
+        ("class", r"^\s*(?:\w+\s+)*(?:class|interface|object)\s+([A-Za-z_]\w*)"),
+        ("function", r"^\s*(?:\w+\s+)*fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?([A-Za-z_]\w*)"),
+    ],
+    ".c": [
+        ("function", r"^[A-Za-z_][\w\s\*]*?\b([A-Za-z_]\w*)\s*\([^;]*$"),
+        ("type", r"^\s*(?:typedef\s+)?(?:struct|union|enum)\s+([A-Za-z_]\w*)\s*\{"),
+        ("macro", r"^\s*#\s*define\s+([A-Za-z_]\w*)"),
+    ],
+    ".rb": [
+        ("method", r"^\s*def\s+(?:self\.)?([A-Za-z_]\w*[?!=]?)"),
+        ("class", r"^\s*(?:class|module)\s+([A-Z]\w*)"),
+    ],
+    ".php": [
+        ("function", r"^\s*(?:(?:public|protected|private|static|abstract|final)\s+)*function\s+&?\s*([A-Za-z_]\w*)"),
+        ("class", r"^\s*(?:(?:abstract|final)\s+)?(?:class|interface|trait|enum)\s+([A-Za-z_]\w*)"),
+    ],
+}
+for _ext in (".h", ".cc", ".cpp", ".cxx", ".hpp", ".hh"):
+    _TAG_PATTERNS[_ext] = _TAG_PATTERNS[".c"] + [
+        ("class", r"^\s*(?:template\s*<[^>]*>\s*)?(?:class|struct)\s+([A-Za-z_]\w*)\s*(?::[^{;]*)?\{"),
+        ("namespace", r"^\s*namespace\s+([A-Za-z_]\w*)"),
+    ]
+
+_COMPILED = {
+    ext: [(kind, re.compile(rx)) for kind, rx in tags]
+    for ext, tags in _TAG_PATTERNS.items()
+}
+
+_C_KEYWORDS = frozenset({"if", "for", "while", "switch", "return", "sizeof", "else"})
+
+_PY_FALLBACK = [
+    ("function", re.compile(r"^\s*(?:async\s+)?def\s+([A-Za-z_]\w*)")),
+    ("class", re.compile(r"^\s*class\s+([A-Za-z_]\w*)")),
+]
+
+
+def _python_defs(source: str) -> List[_Def]:
+    tree = ast.parse(source)
+    out: List[_Def] = []
+
+    def visit(body, prefix: str, in_class: bool) -> None:
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                qual = prefix + node.name
+                out.append((node.name, qual, "method" if in_class else "function", node.lineno))
+                visit(node.body, qual + ".", False)
+            elif isinstance(node, ast.ClassDef):
+                qual = prefix + node.name
+                out.append((node.name, qual, "class", node.lineno))
+                visit(node.body, qual + ".", True)
+            elif not prefix and isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for t in targets:
+                    if isinstance(t, ast.Name):
+                        out.append((t.id, t.id, "variable", node.lineno))
+
+    visit(tree.body, "", False)
+    return out
+
+
+def _regex_defs(source: str, tags) -> List[_Def]:
+    out: List[_Def] = []
+    for lineno, line in enumerate(source.splitlines(), 1):
+        for kind, rx in tags:
+            m = rx.match(line)
+            if m and m.group(1) not in _C_KEYWORDS:
+                out.append((m.group(1), m.group(1), kind, lineno))
+                break
+    return out
+
+
+class SymbolIndex(ProjectIndex):
+    """Definitions per source file, plus an in-memory name lookup table."""
+
+    SUFFIX = "symbols"
+    VERSION = 1
+
+    def _loaded(self) -> None:
+        by_name: Dict[str, List[Symbol]] = {}
+        for rel, (_m, _s, defs) in self.files.items():
+            for name, qual, kind, line in defs:
+                by_name.setdefault(name, []).append(Symbol(rel, line, kind, qual))
+        for syms in by_name.values():
+            syms.sort()
+        self.by_name = by_name
+
+    def _wanted(self, rel: str) -> bool:
+        ext = os.path.splitext(rel)[1].lower()
+        return ext == ".py" or ext in _COMPILED
+
+    def _extract(self, path: str, st: os.stat_result) -> Tuple[_Def, ...]:
+        if st.st_size > MAX_PARSED_BYTES:
+            return ()
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                source = fh.read()
+        except (OSError, UnicodeDecodeError):
+            return ()
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".py":
+            try:
+                return tuple(_python_defs(source))
+            except (SyntaxError, ValueError, RecursionError):
+                return tuple(_regex_defs(source, _PY_FALLBACK))
+        return tuple(_regex_defs(source, _COMPILED[ext]))
+
+    def lookup(self, name: str) -> List[Symbol]:
+        """Definitions whose name (or ``Class.member`` qualname) is *name*."""
+        short = name.rsplit(".", 1)[-1]
+        syms = self.by_name.get(short, [])
+        if "." in name:
+            syms = [s for s in syms if s.qualname == name or s.qualname.endswith("." + name)]
+        return syms
+
+
+def _scan_definitions(name: str, root: Path) -> List[Symbol]:
+    """Index-free fallback: grep for common definition keywords."""
+    short = re.escape(name.rsplit(".", 1)[-1])
+    pattern = (
+        r"(?:\b(?:def|class|function|fn|func|type|struct|enum|trait|interface|"
+        r"module|namespace|const|let|var)\s+\*?\s*(?:\([^)]*\)\s*)?)" + short + r"\b"
+    )
+    out = []
+    for path, line, _text in run_search(pattern, root, max_matches=50):
+        rel = os.path.relpath(path, root)
+        out.append(Symbol(rel, line, "definition", name))
+    return out
+
+
+def find_definitions(name: str, root=".") -> Tuple[Path, List[Symbol]]:
+    """Return ``(project_root, definitions of name)`` under *root*.
+
+    Falls back to a keyword grep (rooted at *root*) while the index is
+    being built.
+    """
+    root = Path(root).resolve()
+    index = acquire(SymbolIndex, root, min_interval=REFRESH_INTERVAL)
+    if index is None:
+        return root, _scan_definitions(name, root)
+    prefix = os.path.relpath(root, index.root)
+    prefix = "" if prefix == "." else prefix + os.sep
+    return index.root, [s for s in index.lookup(name) if s.path.startswith(prefix)]
+
+
+def find_references(name: str, root=".", limit: int = 50) -> List[Match]:
+    """Return ``(path, line, text)`` for whole-word occurrences of *name*."""
+    root = Path(root).resolve()
+    short = name.rsplit(".", 1)[-1]
+    regex = re.compile(r"\b" + re.escape(short) + r"\b")
+    files: Optional[List[Path]] = candidate_files(root, regex)
+    return run_search(regex.pattern, root, "*", files, max_matches=limit)
@@ -0,0 +1,202 @@
+"""Persistent trigram index used to narrow grep searches to candidate files.
+
+Each project root gets one index file under ``~/.commandor/index/`` (see
+``project_index``).  For every file the index stores its ``(mtime_ns, size)``
+and a trigram *signature*: a small bitset with one bit set per distinct
+(lower-cased) byte trigram in the file.  A regex search first extracts the
+literal runs the pattern requires, then keeps only the files whose
+signature contains every trigram of those runs.  Signatures can report
+false positives but never false negatives, so the real regex scan that
+follows stays authoritative.
+
+Public API:
+    candidate_files(root, regex) -> list[Path] | None
+        Refresh the index for *root* from file mtimes/sizes and return the
+        files that may match the compiled *regex*.  Returns None when the
+        pattern has no usable literal, or when the index is missing or stale
+        — callers then fall back to a full scan (a rebuild is started in the
+        background).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import List, Optional
+
+from .project_index import ProjectIndex, acquire
+
+try:  # Python 3.11+
+    import re._parser as _sre_parse  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+# Files larger than this are never indexed — they are always candidates.
+MAX_INDEXED_BYTES = 4 * 1024 * 1024
+
+# Signature sizing: ~4 bits per distinct trigram, clamped to this range.
+_MIN_SIG_BITS = 1 << 9
+_MAX_SIG_BITS = 1 << 17
+
+_REPEATS = tuple(
+    getattr(_sre_parse, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(_sre_parse, name)
+)
+
+
+# ---------------------------------------------------------------------------
+# Trigram helpers
+# ---------------------------------------------------------------------------
+
+def _trigram_ints(data: bytes) -> set:
+    """Return the distinct trigrams of *data* (lower-cased) as 24-bit ints."""
+    grams: set = set()
+    for line in set(data.lower().split(b"\n")):
+        for i in range(len(line) - 2):
+            grams.add(line[i:i + 3])
+    return {int.from_bytes(g, "big") for g in grams}
+
+
+def _bit(gram: int, nbits: int) -> int:
+    # Fibonacci hashing, reduced with the high bits of the 32-bit product.
+    return (((gram * 0x9E3779B1) & 0xFFFFFFFF) * nbits) >> 32
+
+
+def _signature(data: bytes) -> bytes:
+    grams = _trigram_ints(data)
+    nbits = _MIN_SIG_BITS
+    while nbits < len(grams) * 4 and nbits < _MAX_SIG_BITS:
+        nbits <<= 1
+    sig = bytearray(nbits // 8)
+    for g in grams:
+        b = _bit(g, nbits)
+        sig[b >> 3] |= 1 << (b & 7)
+    return bytes(sig)
+
+
+def _sig_has_all(sig: bytes, grams: List[int]) -> bool:
+    nbits = len(sig) * 8
+    for g in grams:
+        b = _bit(g, nbits)
+        if not sig[b >> 3] & (1 << (b & 7)):
+            return False
+    return True
+
+
+def _required_literals(pattern: str) -> List[str]:
+    """Return literal runs that every match of *pattern* must contain.
+
+    Conservative: alternations, character classes and optional repeats end
+    the current run and contribute nothing.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except (re.error, TypeError, ValueError, OverflowError):
+        return [pattern]
+
+    runs: List[str] = []
+
+    def walk(items) -> None:
+        current: List[str] = []
+
+        def flush() -> None:
+            if current:
+                runs.append("".join(current))
+                current.clear()
+
+        for op, av in items:
+            if op is _sre_parse.LITERAL:
+                current.append(chr(av))
+            elif op is _sre_parse.AT:
+                continue  # anchors are zero-width; keep the run going
+            elif op is _sre_parse.SUBPATTERN:
+                flush()
+                walk(av[-1])
+            elif op in _REPEATS:
+                flush()
+                lo, _hi, body = av
+                if lo >= 1:
+                    walk(body)
+            else:
+                flush()
+        flush()
+
+    walk(parsed)
+    return runs
+
+
+def _query_trigrams(regex: "re.Pattern[str]") -> Optional[List[int]]:
+    """Trigram ints required by *regex*, or None if it has none."""
+    ignore_case = bool(regex.flags & re.IGNORECASE)
+    grams: set = set()
+    for lit in _required_literals(regex.pattern):
+        if ignore_case and not lit.isascii():
+            continue
+        raw = lit.encode("utf-8").lower()
+        for i in range(len(raw) - 2):
+            grams.add(int.from_bytes(raw[i:i + 3], "big"))
+    return sorted(grams) or None
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class TrigramIndex(ProjectIndex):
+    """Trigram signatures for every file under one project root."""
+
+    SUFFIX = "trigram"
+    VERSION = 1
+
+    def _extract(self, path: str, st: os.stat_result) -> Optional[bytes]:
+        """Signature, ``None`` if unindexed (always a candidate) or ``b""``."""
+        if st.st_size > MAX_INDEXED_BYTES:
+            return None
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        except OSError:
+            return None
+        try:
+            data.decode("utf-8")
+        except UnicodeDecodeError:
+            # Not UTF-8 text — the line scan skips it, so never a candidate.
+            return b""
+        return _signature(data)
+
+    def candidates(self, grams: List[int]) -> List[str]:
+        """Relative paths whose signature contains every trigram in *grams*."""
+        out = []
+        for rel, (_m, _s, sig) in self.files.items():
+            if sig is None or (sig and _sig_has_all(sig, grams)):
+                out.append(rel)
+        out.sort()
+        return out
+
+
+def candidate_files(root: Path, regex: "re.Pattern[str]") -> Optional[List[Path]]:
+    """Return files under *root* that may contain a match for *regex*.
+
+    Returns None when the caller must fall back to a full scan: the pattern
+    yields no trigrams, or the index is missing or too stale to refresh
+    inline.  In the latter two cases a rebuild is kicked off in a daemon
+    thread so later searches can use the index.
+    """
+    grams = _query_trigrams(regex)
+    if grams is None:
+        return None
+
+    root = root.resolve()
+    index = acquire(TrigramIndex, root)
+    if index is None:
+        return None
+
+    prefix = os.path.relpath(root, index.root)
+    prefix = "" if prefix == "." else prefix + os.sep
+    return [
+        index.root / rel
+        for rel in index.candidates(grams)
+        if rel.startswith(prefix)
+    ]
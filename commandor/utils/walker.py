@@ -0,0 +1,284 @@
+"""Single-pass, .gitignore-aware project walker.
+
+Shared by glob_tool, grep_tool (python backend and trigram index) and
+get_project_files_tool so that every tool sees the same set of files.
+
+Inside a git work tree the file list comes from one ``git ls-files`` call
+(tracked + untracked, minus anything git ignores).  Elsewhere — or if git is
+unavailable — an ``os.scandir`` walk is used that reads ``.gitignore`` and
+``.ignore`` files as it descends and prunes ignored directories before
+entering them.  Directories named in IGNORE_DIRS are always skipped.
+
+Public API:
+    iter_files(root, ignore_dirs=IGNORE_DIRS, use_git=True) -> Iterator[str]
+        Yield file paths relative to *root* (POSIX separators).
+    find_project_root(path) -> Path
+        Nearest ancestor containing ``.git``, else *path* itself.
+    glob_to_regex(pattern) -> re.Pattern
+        Compile a glob with ``**`` support into a regex over relative paths.
+    file_pattern_regex(pattern) -> re.Pattern
+        Like ``Path.rglob``: *pattern* may match at any depth (grep_tool).
+    IGNORE_DIRS
+        Directory names that are never descended into.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+IGNORE_DIRS = frozenset({
+    ".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv",
+    "dist", "build", ".next", "target",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox",
+})
+
+_IGNORE_FILES = (".gitignore", ".ignore")
+
+
+# ---------------------------------------------------------------------------
+# Glob / ignore-rule translation
+# ---------------------------------------------------------------------------
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore-style glob into a regex body (no anchors)."""
+    out: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            out.append("(?:/.*)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = pattern.find("]", i + 2)
+            if j == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def glob_to_regex(pattern: str) -> "re.Pattern[str]":
+    """Compile *pattern* (``*``, ``?``, ``[..]``, ``**``) for relative paths."""
+    return re.compile("^" + _translate(pattern.lstrip("/")) + "$")
+
+
+def file_pattern_regex(pattern: str) -> "re.Pattern[str]":
+    """Compile a grep_tool ``file_pattern`` for relative paths.
+
+    Matches the way ``Path.rglob(pattern)`` does: anchored at the end of the
+    path but free to start in any directory, so ``*.py`` and ``**/*.py``
+    both match ``c.py`` and ``src/*.py`` matches ``pkg/src/c.py``.  A leading
+    ``/`` anchors the pattern at the root.
+    """
+    if pattern.startswith("/"):
+        return glob_to_regex(pattern)
+    return re.compile("(?:^|.*/)" + _translate(pattern) + "$")
+
+
+class _IgnoreRules:
+    """Rules from one .gitignore/.ignore file, relative to its directory."""
+
+    def __init__(self, base: str, lines: Iterable[str]) -> None:
+        self.base = base
+        self.rules: List[Tuple["re.Pattern[str]", bool, bool]] = []
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            body = _translate(line.lstrip("/"))
+            regex = re.compile(("^" if anchored else "(?:^|.*/)") + body + "$")
+            self.rules.append((regex, negate, dir_only))
+
+    @classmethod
+    def read(cls, directory: str, base: str) -> Optional["_IgnoreRules"]:
+        lines: List[str] = []
+        for name in _IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8", errors="replace") as fh:
+                    lines.extend(fh)
+            except OSError:
+                continue
+        rules = cls(base, lines)
+        return rules if rules.rules else None
+
+    def match(self, rel: str, is_dir: bool) -> Optional[bool]:
+        """True = ignored, False = re-included by ``!``, None = no opinion."""
+        if self.base:
+            if not rel.startswith(self.base + "/"):
+                return None
+            rel = rel[len(self.base) + 1:]
+        verdict = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                verdict = not negate
+        return verdict
+
+
+def _ignored(rules: List[_IgnoreRules], rel: str, is_dir: bool) -> bool:
+    verdict = False
+    for r in rules:
+        m = r.match(rel, is_dir)
+        if m is not None:
+            verdict = m
+    return verdict
+
+
+# ---------------------------------------------------------------------------
+# Walkers
+# ---------------------------------------------------------------------------
+
+def find_project_root(path) -> Path:
+    """Return the nearest ancestor of *path* containing ``.git``, else *path*."""
+    path = Path(path).resolve()
+    for candidate in (path, *path.parents):
+        if (candidate / ".git").exists():
+            return candidate
+    return path
+
+
+def _in_git_worktree(root: Path) -> bool:
+    return (find_project_root(root) / ".git").exists()
+
+
+def _git_ls_files(root: Path) -> Optional[List[str]]:
+    """Tracked + untracked-not-ignored files under *root*, or None on failure."""
+    try:
+        proc = subprocess.run(
+            ["git", "ls-files", "-z", "-t", "-c", "-o", "-d", "--exclude-standard"],
+            cwd=str(root),
+            capture_output=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if proc.returncode != 0:
+        return None
+
+    present: List[str] = []
+    deleted = set()
+    for entry in proc.stdout.decode("utf-8", "surrogateescape").split("\0"):
+        if len(entry) < 3:
+            continue
+        tag, path = entry[0], entry[2:]
+        if tag == "R":
+            deleted.add(path)
+        else:
+            present.append(path)
+    # -c and -d both report a deleted tracked file; drop it and any duplicates.
+    return list(dict.fromkeys(p for p in present if p not in deleted))
+
+
+def _iter_git(root: Path, ignore_dirs: frozenset, listing: List[str]) -> Iterator[str]:
+    # git already applied .gitignore; layer .ignore files on top.
+    rules = []
+    for rel in listing:
+        if rel == ".ignore" or rel.endswith("/.ignore"):
+            base = rel[: -len(".ignore")].rstrip("/")
+            try:
+                with open(root / rel, "r", encoding="utf-8", errors="replace") as fh:
+                    r = _IgnoreRules(base, fh)
+            except OSError:
+                continue
+            if r.rules:
+                rules.append(r)
+    rules.sort(key=lambda r: r.base.count("/") + bool(r.base))
+
+    for rel in listing:
+        parts = rel.split("/")
+        if ignore_dirs.intersection(parts[:-1]):
+            continue
+        if rules:
+            dirs = ["/".join(parts[:k]) for k in range(1, len(parts))]
+            if any(_ignored(rules, d, True) for d in dirs) or _ignored(rules, rel, False):
+                continue
+        yield rel
+
+
+def _iter_scandir(root: Path, ignore_dirs: frozenset) -> Iterator[str]:
+    root_rules = _IgnoreRules.read(str(root), "")
+    stack: List[Tuple[str, str, List[_IgnoreRules]]] = [
+        (str(root), "", [root_rules] if root_rules else [])
+    ]
+    while stack:
+        directory, rel_dir, rules = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in ignore_dirs or _ignored(rules, rel, True):
+                    continue
+                sub_rules = _IgnoreRules.read(entry.path, rel)
+                subdirs.append((entry.path, rel, rules + [sub_rules] if sub_rules else rules))
+            elif not _ignored(rules, rel, False):
+                yield rel
+        stack.extend(reversed(subdirs))
+
+
+def iter_files(
+    root,
+    ignore_dirs: Iterable[str] = IGNORE_DIRS,
+    use_git: bool = True,
+) -> Iterator[str]:
+    """Yield every non-ignored file under *root* as a relative POSIX path.
+
+    Args:
+        root:        Directory to walk.
+        ignore_dirs: Directory names pruned wherever they appear.
+        use_git:     Use ``git ls-files`` when *root* is inside a work tree.
+    """
+    root = Path(root)
+    ignore_dirs = frozenset(ignore_dirs)
+    if use_git and _in_git_worktree(root.resolve()):
+        listing = _git_ls_files(root)
+        if listing is not None:
+            yield from _iter_git(root, ignore_dirs, listing)
+            return
+    yield from _iter_scandir(root, ignore_dirs)
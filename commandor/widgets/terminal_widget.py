@@ -1,7 +1,7 @@
 """terminal_widget.py — Unified single-pane terminal widget for Commandor.
 
 Handles:
-  - Direct shell command execution (subprocess in worker thread)
+  - Direct shell command execution (output streamed from a worker thread)
   - AI commands via /slash syntax: /agent, /chat, /ask, /plan, /assist
   - /setup interactive wizard (multi-step state machine)
   - /provider, /model, /providers, /sessions sub-commands
@@ -13,11 +13,15 @@ from __future__ import annotations
 
 import os
 import subprocess
+import threading
+import time
 import uuid
+from collections import deque
 from pathlib import Path
 from typing import Optional
 
 from rich.markdown import Markdown
+from rich.markup import escape
 from rich.panel import Panel
 from rich.rule import Rule
 from rich.text import Text
@@ -29,8 +33,10 @@ from textual.widget import Widget
 from textual.widgets import Input, RichLog, Static
 
 from ..agent_bridge import (
+    CommandOutputEvent,
     DoneEvent,
     ErrorEvent,
+    FileDiffEvent,
     PlanCreatedEvent,
     PlanItemDoneEvent,
     StatusEvent,
@@ -38,10 +44,14 @@ from ..agent_bridge import (
     TokenEvent,
     ToolCallEvent,
     ToolOutputEvent,
+    preconnect,
     stream_agent_events,
 )
 from ..config import get_config
 from ..session_manager import SessionManager
+from ..utils.diff_display import render_stored_diff
+from ..utils.git_context import prefetch as prefetch_git_context
+from ..utils.stream_runner import run_streaming, terminate_group
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -51,6 +61,22 @@ _PROVIDERS = ("gemini", "anthropic", "openai", "openrouter")
 
 _AI_CMDS = {"/agent", "/chat"}
 
+# Diff lines shown inline in the log per file change.
+_DIFF_PAGE_LINES = 120
+
+# Lines of a running command's output shown in the stream preview.
+_LIVE_OUTPUT_LINES = 15
+
+# Shell output: lines written to the log per command (the rest goes to a
+# scrollback file), lines per log write, and the drain timer period.
+_SHELL_LOG_MAX_LINES = 2000
+_SHELL_CHUNK_LINES = 200
+_SHELL_DRAIN_INTERVAL = 0.05
+_SHELL_MAX_LINE_CHARS = 2000
+# Shell commands running at least this long get a time/CPU/memory footer.
+_SHELL_REPORT_TIME = 2.0
+_SCROLLBACK_DIR = Path.home() / ".commandor" / "scrollback"
+
 _MODE_MAP = {
     "/agent": "agent",
     "/chat": "chat",
@@ -78,7 +104,7 @@ _MODEL_CTX_LIMITS: dict[str, int] = {
 }
 
 _ALL_SLASH_CMDS = sorted([
-    "/agent", "/chat", "/clear",
+    "/agent", "/cancel", "/chat", "/clear", "/diff",
     "/export", "/help", "/model", "/pipe", "/provider",
     "/providers", "/reset", "/retry", "/sessions", "/setup",
 ])
@@ -124,6 +150,8 @@ HELP_TEXT = """\
 | `/help` | Show this help |
 | `/clear` | Clear the terminal |
 | `/pipe <cmd> [pipe] <prompt>` | Pipe shell output to AI |
+| `/cancel` or `Ctrl+C` | Stop the running shell / pipe command (and its children) |
+| `/diff [page]` | Next page (or page N) of the agent's last file diff |
 | `Ctrl+L` | Clear the terminal |
 | `Ctrl+Q` | Quit |
 | `Up / Down` | Navigate command history |
@@ -139,6 +167,8 @@ HELP_TEXT = """\
 ## Shell
 Any command that doesn't start with `/` is run as a shell command.
 `cd` is handled natively and updates the prompt path.
+Output appears as it is produced; past 2,000 lines the rest of it is saved
+to a scrollback file under `~/.commandor/scrollback/`.
 
 ## Notes
 The agent decides internally whether to plan, ask clarifying questions,
@@ -150,6 +180,89 @@ Standard terminal copy (Ctrl+Shift+C / right-click) then works normally.
 """
 
 
+# ---------------------------------------------------------------------------
+# Shell output buffer
+# ---------------------------------------------------------------------------
+
+class _ShellOutput:
+    """Lines of one shell command, handed from its reader threads to the log.
+
+    Readers ``feed`` raw chunks; the UI drains whole lines with ``take`` on a
+    timer, so the log is written in bounded pieces however fast the command
+    prints.  Past ``_SHELL_LOG_MAX_LINES`` lines, output goes to a
+    scrollback file instead of the widget.
+    """
+
+    def __init__(self, cmd: str) -> None:
+        self.cmd = cmd
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, bool]] = []
+        self._partial = {"stdout": "", "stderr": ""}
+        self.shown = 0
+        self.spilled = 0
+        self.spill_path: Optional[Path] = None
+        self._spill_fh = None
+        self._spill_failed = False
+        self.footer: Optional[str] = None  # markup written after the output
+        self.done = False
+
+    def _add(self, line: str, is_err: bool) -> None:
+        # Progress bars redraw with \r; keep what the terminal would show.
+        line = line.rstrip("\r").rsplit("\r", 1)[-1]
+        if self.shown < _SHELL_LOG_MAX_LINES:
+            if len(line) > _SHELL_MAX_LINE_CHARS:
+                line = line[:_SHELL_MAX_LINE_CHARS] + "…"
+            self._pending.append((line, is_err))
+            self.shown += 1
+            return
+        if self._spill_fh is None and not self._spill_failed:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(self):x}.log"
+            try:
+                _SCROLLBACK_DIR.mkdir(parents=True, exist_ok=True)
+                self._spill_fh = open(_SCROLLBACK_DIR / name, "w", encoding="utf-8")
+                self._spill_fh.write(f"$ {self.cmd}\n")
+                self.spill_path = _SCROLLBACK_DIR / name
+            except OSError:
+                self._spill_failed = True
+        if self._spill_fh is not None:
+            self._spill_fh.write(line + "\n")
+        self.spilled += 1
+
+    def feed(self, stream: str, text: str) -> None:
+        with self._lock:
+            lines = (self._partial[stream] + text).split("\n")
+            partial = lines.pop()
+            if len(partial) > _SHELL_MAX_LINE_CHARS * 4:
+                lines.append(partial)
+                partial = ""
+            self._partial[stream] = partial
+            for line in lines:
+                self._add(line, stream == "stderr")
+
+    def finish(self, footer: Optional[str] = None) -> None:
+        with self._lock:
+            for stream, partial in self._partial.items():
+                if partial:
+                    self._add(partial, stream == "stderr")
+            self._partial = {"stdout": "", "stderr": ""}
+            if self._spill_fh is not None:
+                self._spill_fh.close()
+                self._spill_fh = None
+            self.footer = footer
+            self.done = True
+
+    def take(self, max_lines: int) -> list[tuple[str, bool]]:
+        with self._lock:
+            batch = self._pending[:max_lines]
+            del self._pending[:max_lines]
+            return batch
+
+    @property
+    def drained(self) -> bool:
+        with self._lock:
+            return self.done and not self._pending
+
+
 # ---------------------------------------------------------------------------
 # TerminalWidget
 # ---------------------------------------------------------------------------
@@ -160,6 +273,7 @@ class TerminalWidget(Widget):
     BINDINGS = [
         Binding("up", "history_prev", "Previous command", priority=True, show=False),
         Binding("down", "history_next", "Next command", priority=True, show=False),
+        Binding("ctrl+c", "cancel_command", "Cancel command", priority=True, show=False),
     ]
 
     def __init__(
@@ -193,8 +307,14 @@ class TerminalWidget(Widget):
         # Streaming state
         self._stream_tokens: list[str] = []
         self._think_tokens: list[str] = []
+        self._live_output: deque[str] = deque(maxlen=_LIVE_OUTPUT_LINES)
         self._ai_worker = None
 
+        # Running shell / pipe commands, for /cancel and Ctrl+C
+        self._fg_lock = threading.Lock()
+        self._fg_procs: list[subprocess.Popen] = []
+        self._fg_cancelled: set[int] = set()
+
         # Context / retry / export state
         self._last_ai_task: Optional[str] = None
         self._last_ai_mode: str = "agent"
@@ -206,6 +326,10 @@ class TerminalWidget(Widget):
         self._plan_items: list = []
         self._plan_done: set = set()
 
+        # Last file diff shown (path, old_hash, new_hash) and its page, for /diff
+        self._last_diff: Optional[tuple[str, str, str]] = None
+        self._last_diff_page: int = 0
+
     # ------------------------------------------------------------------
     # Compose
     # ------------------------------------------------------------------
@@ -226,6 +350,9 @@ class TerminalWidget(Widget):
         self._update_status_bar()
         self._show_welcome()
         self.query_one("#cmd-input").focus()
+        # Warm the git summary so the first agent prompt doesn't wait on git.
+        prefetch_git_context(self._cwd)
+        self._preconnect()
 
     # ------------------------------------------------------------------
     # Prompt helpers
@@ -437,6 +564,12 @@ class TerminalWidget(Widget):
         elif cmd == "/pipe":
             self._cmd_pipe(arg, log)
 
+        elif cmd == "/cancel":
+            self._cmd_cancel(log)
+
+        elif cmd == "/diff":
+            self._cmd_diff(arg, log)
+
         elif cmd.startswith("/"):
             log.write(Text(f"  Unknown command: {cmd}  (try /help)", style="#cc2200"))
 
@@ -462,47 +595,146 @@ class TerminalWidget(Widget):
             if os.path.isdir(target):
                 self._cwd = target
                 self._refresh_prompt()
+                prefetch_git_context(target)
             else:
                 log.write(Text(f"  cd: {target}: No such directory", style="#cc2200"))
             return
 
+        out = _ShellOutput(cmd)
+        timer = self.set_interval(_SHELL_DRAIN_INTERVAL, lambda: self._drain_shell(out, timer))
         self.run_worker(
-            lambda: self._exec_shell(cmd),
+            lambda: self._exec_shell(cmd, out),
             thread=True,
             exclusive=False,
             name="shell",
         )
 
-    def _exec_shell(self, cmd: str) -> None:
-        """Run shell command in worker thread; write output via call_from_thread."""
+    def _exec_shell(self, cmd: str, out: _ShellOutput) -> None:
+        """Run shell command in worker thread; output is streamed into *out*."""
         env = os.environ.copy()
         env["FORCE_COLOR"] = "1"
         env["TERM"] = "xterm-256color"
         shell = os.environ.get("SHELL", "/bin/bash")
 
+        footer = None
+        started: list[subprocess.Popen] = []
         try:
-            result = subprocess.run(
+            result = run_streaming(
                 cmd,
-                shell=True,
-                executable=shell,
+                timeout=300,
                 cwd=self._cwd,
+                on_output=out.feed,
+                emit_interval=0,
+                emit_max_bytes=None,
                 env=env,
-                capture_output=True,
-                text=True,
-                timeout=300,
-            )
-            if result.stdout:
-                self.app.call_from_thread(self._write_ansi, result.stdout, False)
-            if result.stderr:
-                self.app.call_from_thread(self._write_ansi, result.stderr, True)
-        except subprocess.TimeoutExpired:
-            self.app.call_from_thread(
-                self._write_markup, "[#cc2200]  Command timed out (300s limit)[/#cc2200]"
+                executable=shell,
+                on_start=lambda proc: (started.append(proc), self._fg_started(proc)),
             )
+            if started and self._fg_finished(started[0]):
+                footer = "[#cc2200]  Cancelled[/#cc2200]"
+            elif result.timed_out:
+                footer = "[#cc2200]  Command timed out (300s limit)[/#cc2200]"
+            elif result.usage is not None and result.duration >= _SHELL_REPORT_TIME:
+                footer = f"[#7a6b4a]  {result.usage.summary(result.duration)}[/#7a6b4a]"
         except Exception as exc:
-            self.app.call_from_thread(
-                self._write_markup, f"[#cc2200]  Error: {exc}[/#cc2200]"
+            if started:
+                self._fg_finished(started[0])
+            footer = f"[#cc2200]  Error: {escape(str(exc))}[/#cc2200]"
+        out.finish(footer)
+
+    # -- foreground command tracking (cancellation) --------------------
+
+    def _fg_started(self, proc: subprocess.Popen) -> None:
+        with self._fg_lock:
+            self._fg_procs.append(proc)
+
+    def _fg_finished(self, proc: subprocess.Popen) -> bool:
+        """Forget *proc*; return True if it was stopped by a cancel."""
+        with self._fg_lock:
+            if proc in self._fg_procs:
+                self._fg_procs.remove(proc)
+            cancelled = proc.pid in self._fg_cancelled
+            self._fg_cancelled.discard(proc.pid)
+            return cancelled
+
+    def _cancel_foreground(self) -> int:
+        """SIGTERM→SIGKILL every running shell/pipe command's process group.
+
+        Termination runs on helper threads, so neither the UI nor the
+        workers wait for it; each worker returns as soon as its command's
+        pipes close.  Returns the number of commands cancelled.
+        """
+        with self._fg_lock:
+            procs = [p for p in self._fg_procs if p.pid not in self._fg_cancelled]
+            self._fg_cancelled.update(p.pid for p in procs)
+        for proc in procs:
+            threading.Thread(
+                target=terminate_group, args=(proc,), daemon=True, name="cancel"
+            ).start()
+        return len(procs)
+
+    def check_action(self, action: str, parameters: tuple) -> bool | None:
+        # Ctrl+C only means "cancel" while a command runs; otherwise it falls
+        # through to the default (copy) behaviour.
+        if action == "cancel_command":
+            with self._fg_lock:
+                return bool(self._fg_procs)
+        return True
+
+    def action_cancel_command(self) -> None:
+        n = self._cancel_foreground()
+        if n:
+            self._write_markup(f"[#cc2200]  ^C  stopping {n} command{'s' if n > 1 else ''}…[/#cc2200]")
+
+    def _cmd_cancel(self, log: RichLog) -> None:
+        n = self._cancel_foreground()
+        if n:
+            log.write(Text(f"  Stopping {n} running command{'s' if n > 1 else ''}…", style="#cc2200"))
+        else:
+            log.write(Text("  No shell command is running.", style="#7a6b4a"))
+
+    def _cmd_diff(self, arg: str, log: RichLog) -> None:
+        if self._last_diff is None:
+            log.write(Text("  No file diff to show yet.", style="#7a6b4a"))
+            return
+        if arg:
+            if not arg.isdigit() or int(arg) < 1:
+                log.write(Text("  Usage: /diff [page]", style="#cc2200"))
+                return
+            page = int(arg) - 1
+        else:
+            page = self._last_diff_page + 1
+        panel = render_stored_diff(
+            *self._last_diff, page=page, page_size=_DIFF_PAGE_LINES,
+            more_hint="/diff for the next page",
+        )
+        if panel is not None:
+            self._last_diff_page = page
+            log.write(panel)
+
+    def _drain_shell(self, out: _ShellOutput, timer) -> None:  # noqa: ANN001
+        """Timer callback: move buffered lines of a shell command into the log."""
+        batch = out.take(_SHELL_CHUNK_LINES)
+        # One write per run of same-stream lines
+        start = 0
+        for i in range(1, len(batch) + 1):
+            if i == len(batch) or batch[i][1] != batch[start][1]:
+                text = "\n".join(line for line, _ in batch[start:i])
+                if i == len(batch):
+                    text = text.rstrip()
+                if text:
+                    self._write_ansi(text, batch[start][1])
+                start = i
+        if not out.drained:
+            return
+        timer.stop()
+        if out.spilled:
+            where = f" — full output in {out.spill_path}" if out.spill_path else ""
+            self._write_markup(
+                f"[#7a6b4a]  … {out.spilled:,} more lines not shown{escape(where)}[/#7a6b4a]"
             )
+        if out.footer:
+            self._write_markup(out.footer)
 
     def _write_ansi(self, text: str, is_err: bool = False) -> None:
         log = self.query_one("#log", RichLog)
@@ -589,6 +821,7 @@ class TerminalWidget(Widget):
             model=self._model,
             thread_id=self._session_id,
             session_name=self._session_name,
+            on_live_event=lambda ev: self.app.call_from_thread(self._on_ai_event, ev),
         ):
             self.app.call_from_thread(self._on_ai_event, event)
 
@@ -626,7 +859,22 @@ class TerminalWidget(Widget):
                 )
             )
 
+        elif isinstance(event, CommandOutputEvent):
+            # Sliding window over the running command's output
+            if self._live_output and not self._live_output[-1].endswith("\n"):
+                event_text = self._live_output.pop() + event.text
+            else:
+                event_text = event.text
+            self._live_output.extend(
+                line[-500:] for line in event_text.splitlines(keepends=True)
+            )
+            visible = Text.from_ansi("".join(self._live_output).rstrip("\n"))
+            visible.stylize("#7a6b4a")
+            preview.display = True
+            preview.update(visible)
+
         elif isinstance(event, ToolOutputEvent):
+            self._live_output.clear()
             snippet = event.content[:200].replace("\n", "  ")
             log.write(
                 Text.from_markup(
@@ -636,6 +884,15 @@ class TerminalWidget(Widget):
                 )
             )
 
+        elif isinstance(event, FileDiffEvent):
+            self._last_diff = (event.path, event.old_hash, event.new_hash)
+            self._last_diff_page = 0
+            panel = render_stored_diff(
+                *self._last_diff, page_size=_DIFF_PAGE_LINES, more_hint="/diff for the next page"
+            )
+            if panel is not None:
+                log.write(panel)
+
         elif isinstance(event, PlanCreatedEvent):
             self._plan_items = list(event.items)
             self._plan_done = set()
@@ -720,6 +977,17 @@ class TerminalWidget(Widget):
                 parts.append(f"ctx:{tok_str}")
             if m.get("condensations"):
                 parts.append(f"condensed:{m['condensations']}x")
+            if m.get("cache_read_tokens") or m.get("cache_write_tokens"):
+                parts.append(
+                    f"cache:r{m.get('cache_read_tokens', 0)}/w{m.get('cache_write_tokens', 0)}"
+                )
+            if m.get("commands"):
+                cmd_str = f"cmds:{len(m['commands'])} {m['command_wall']:.1f}s"
+                if "command_cpu" in m:
+                    cmd_str += f" cpu:{m['command_cpu']:.1f}s"
+                if "command_peak_rss_kb" in m:
+                    cmd_str += f" rss:{m['command_peak_rss_kb'] / 1024:.0f}M"
+                parts.append(cmd_str)
             metrics_str = "  ·  ".join(parts)
             log.write(Rule(
                 f"  [#d4a017]✓ done[/#d4a017]  [#7a6b4a]{metrics_str}[/#7a6b4a]  ",
@@ -765,6 +1033,14 @@ class TerminalWidget(Widget):
             return
         self._provider = name
         log.write(Text(f"  ✓ Provider set to: {name}", style="#d4a017"))
+        self._preconnect()
+
+    def _preconnect(self) -> None:
+        """Build the active model and open its API connection in the background."""
+        threading.Thread(
+            target=preconnect, args=(self._provider, self._model),
+            daemon=True, name="commandor-preconnect",
+        ).start()
 
     def _cmd_model(self, arg: str, log: RichLog) -> None:
         if not arg:
@@ -913,41 +1189,40 @@ class TerminalWidget(Widget):
 
     def _work_pipe(self, shell_cmd: str, ai_prompt: str) -> None:
         shell = os.environ.get("SHELL", "/bin/bash")
+        started: list[subprocess.Popen] = []
+
+        def _note(message: str, style: str) -> None:
+            self.app.call_from_thread(
+                lambda: self.query_one("#log", RichLog).write(Text(message, style=style))
+            )
+
         try:
-            result = subprocess.run(
+            result = run_streaming(
                 shell_cmd,
-                shell=True,
-                executable=shell,
-                cwd=self._cwd,
-                capture_output=True,
-                text=True,
                 timeout=60,
+                cwd=self._cwd,
+                executable=shell,
+                on_start=lambda proc: (started.append(proc), self._fg_started(proc)),
             )
-            output = (result.stdout + result.stderr).strip()
+            if started and self._fg_finished(started[0]):
+                _note("  /pipe: cancelled", "#cc2200")
+                return
+            if result.timed_out:
+                _note("  /pipe: command timed out (60s)", "#cc2200")
+                return
+            output = (result.stdout.text() + result.stderr.text()).strip()
             if not output:
-                self.app.call_from_thread(
-                    lambda: self.query_one("#log", RichLog).write(
-                        Text("  /pipe: command produced no output", style="#7a6b4a")
-                    )
-                )
+                _note("  /pipe: command produced no output", "#7a6b4a")
                 return
             lines = output.split("\n")
             if len(lines) > 200:
                 output = "\n".join(lines[:200]) + f"\n… ({len(lines) - 200} more lines truncated)"
             task = f"{ai_prompt}\n\n```\n$ {shell_cmd}\n{output}\n```"
             self.app.call_from_thread(self._run_ai, task, "agent")
-        except subprocess.TimeoutExpired:
-            self.app.call_from_thread(
-                lambda: self.query_one("#log", RichLog).write(
-                    Text("  /pipe: command timed out (60s)", style="#cc2200")
-                )
-            )
         except Exception as exc:
-            self.app.call_from_thread(
-                lambda: self.query_one("#log", RichLog).write(
-                    Text(f"  /pipe error: {exc}", style="#cc2200")
-                )
-            )
+            if started:
+                self._fg_finished(started[0])
+            _note(f"  /pipe error: {exc}", "#cc2200")
 
     # ------------------------------------------------------------------
     # /setup wizard (state machine)
@@ -22,7 +22,7 @@ setup(
         "google-genai>=1.0.0",
         "anthropic>=0.40.0",
         "openai>=1.0.0",
-        "httpx>=0.27.0",
+        "httpx[http2]>=0.27.0",
         "rich>=13.0.0",
         "pyyaml>=6.0",
         "python-dotenv>=1.0.0",